@@ -16,19 +16,21 @@ import io
 from werkzeug.utils import secure_filename
 import shutil
 from datetime import datetime
-import PyPDF2
-import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter
-import cv2
-import numpy as np
-import re
 import json
-from learning_system import IntelligentLearningSystem
+from ocr_engine import get_ocr_backend
+from classification_rules import (get_rules, compile_rules, activate_rules, builtin_rules,
+                                  read_categories_file, write_categories_file, CATEGORIES_FILE)
 import threading
-from collections import defaultdict
 import hashlib
-import gc
-import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import document_pipeline
+import ocr_worker
+from document_pipeline import (DOCUMENT_TYPES, HASH_CHUNK_SIZE, MULTIRES_OCR, OCR_LOWRES_SCALE,
+                               OCR_ESCALATION_MIN_CONF, OCR_ESCALATION_MIN_CHARS, learning_system,
+                               load_categories, classify_document, classify_deferred_batch,
+                               extract_text_from_file, separate_documents_from_pdf, detect_document_boundaries)
 
 app = Flask(__name__)
 CORS(app)
@@ -36,22 +38,34 @@ CORS(app)
 # Configuração de upload
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB
 
-# Inicializa o sistema de aprendizado inteligente
-learning_system = IntelligentLearningSystem()
-
 # Sistema de fila para processamento assíncrono
-processing_jobs = {}  # {session_id: {'status': 'processing'|'completed'|'error', 'progress': 0, 'total': 0, 'results': [], 'error': ''}}
+processing_jobs = {}  # {session_id: {'status': 'processing'|'completed'|'error', 'progress': 0, 'classified': 0, 'total': 0, 'results': [], 'error': ''}}
 jobs_lock = threading.Lock()
 
-# OTIMIZAÇÃO: Cache de OCR (evita reprocessamento de arquivos idênticos)
-ocr_cache = {}  # {file_hash: {'text': str, 'timestamp': float}}
-cache_lock = threading.Lock()
-MAX_CACHE_SIZE = 100  # Máximo de arquivos em cache
-CACHE_EXPIRY = 3600  # Cache expira em 1 hora
-
-# OTIMIZAÇÃO: Processamento em lotes
-BATCH_SIZE = 5  # Processa 5 arquivos por vez para economizar memória
-MAX_CONCURRENT_THREADS = 2  # Máximo de threads simultâneas para OCR
+# OTIMIZAÇÃO: Pool de processos para OCR (sem contenção do GIL, sem barreiras por lote)
+# Tamanho = min(CPUs, orçamento de memória / pico de RSS medido por worker)
+# Os workers carregam só ocr_worker/document_pipeline (sem o app Flask)
+OCR_MEMORY_BUDGET_MB = int(os.environ.get('OCR_MEMORY_BUDGET_MB', 600))
+OCR_WORKER_MEMORY_MB = int(os.environ.get('OCR_WORKER_MEMORY_MB', 300))  # Estimativa até a primeira medição
+OCR_WORKER_MAX_TASKS = int(os.environ.get('OCR_WORKER_MAX_TASKS', 50))  # Recicla workers (vazamentos de memória)
+ocr_executor = None
+ocr_executor_size = 0
+ocr_executor_sessions = 0  # Sessões usando o pool atual (só é redimensionado sem nenhuma)
+ocr_executor_lock = threading.Lock()
+worker_peak_rss_mb = 0.0  # Maior pico de RSS medido num worker (0 = ainda sem medição)
+
+# OTIMIZAÇÃO: OCR em lote de uploads de imagem (backend pytesseract)
+# Janelas de imagens OCRizadas com uma execução do tesseract por idioma. Só vale
+# para o pytesseract, que paga a inicialização do binário e dos modelos a cada
+# chamada; o tesserocr (padrão no Linux) já mantém a API carregada por worker,
+# então com ele o lote não é usado e cada documento faz o próprio OCR.
+OCR_BATCH = os.environ.get('OCR_BATCH', 'true').lower() in ['true', '1', 'yes']
+OCR_BATCH_WINDOW = int(os.environ.get('OCR_BATCH_WINDOW', 16))
+
+# OTIMIZAÇÃO: Classificação vetorizada da sessão inteira depois do OCR (sessões grandes)
+# Os workers só extraem o texto; o processo principal classifica todos numa passada de matrizes
+BATCH_CLASSIFIER = os.environ.get('BATCH_CLASSIFIER', 'true').lower() in ['true', '1', 'yes']
+BATCH_CLASSIFIER_MIN_FILES = int(os.environ.get('BATCH_CLASSIFIER_MIN_FILES', 50))
 
 # Configuração de pastas para produção
 if os.environ.get('RENDER'):
@@ -65,76 +79,33 @@ else:
 
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
 
+# Métricas agregadas do OCR em dois níveis (atualizadas no processo principal a cada documento)
+ocr_metrics = {'lowres_pages': 0, 'escalations': 0, 'seconds_saved': 0.0, 'documents': 0,
+               'batch_images': 0, 'batch_runs': 0}
+ocr_metrics_lock = threading.Lock()
+
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PROCESSED_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-DOCUMENT_TYPES = {
-    'holerite': 'Holerite',
-    'certidao_nascimento': 'Certidão de Nascimento',
-    'comprovante_residencia': 'Comprovante de Residência',
-    'rg': 'Identidade (RG)',
-    'cpf': 'CPF',
-    'cnh': 'CNH',
-    'ctps': 'Carteira de Trabalho',
-    'contrato': 'Contrato',
-    'procuracao': 'Procuração',
-    'peticao': 'Petição',
-    'sentenca': 'Sentença',
-    # Documentos de imigração (SEMPRE EM PORTUGUÊS)
-    'titre_sejour': 'Título de Permanência',
-    'visa_frances': 'Visto',
-    'carte_resident': 'Cartão de Residente',
-    'attestation_hebergement': 'Declaração de Hospedagem',
-    'justificatif_domicile': 'Comprovante de Residência',
-    'bulletin_salaire': 'Folha de Pagamento',
-    'contrat_travail': 'Contrato de Trabalho',
-    'attestation_employeur': 'Declaração do Empregador',
-    'avis_imposition': 'Declaração de Imposto de Renda',
-    'certificat_scolarite': 'Declaração Escolar',
-    'diplome_francais': 'Diploma',
-    'acte_naissance_traduit': 'Certidão de Nascimento Traduzida',
-    'casier_judiciaire': 'Certidão de Antecedentes Criminais',
-    'certificat_medical': 'Atestado Médico',
-    'assurance_maladie': 'Comprovante de Seguro Saúde',
-    'liste_documents': 'Lista de Documentos',
-    # Documentos jurídicos (SEMPRE EM PORTUGUÊS)
-    'tableau_vie_commune': 'Comprovante de União Estável',
-    'refere_suspension': 'Liminar',
-    'accuse_depot': 'Comprovante de Protocolo',
-    'accuse_reception': 'Comprovante de Recebimento',
-    'requete_tribunal': 'Petição Judicial',
-    'lettre_recommandee': 'Carta Registrada',
-    'document_tribunal': 'Documento Judicial',
-    'procedure_administrative': 'Processo Administrativo',
-    'recours_administratif': 'Recurso Administrativo',
-    # Documentos gerais (SEMPRE EM PORTUGUÊS)
-    'attestation_honneur': 'Declaração',
-    'attestation_depot': 'Comprovante de Depósito',
-    'passeport': 'Passaporte',
-    # Fotos pessoais (não confundir com documentos que contêm fotos)
-    'fotos_pessoas': 'Fotos de Pessoas',
-    'outros': 'Outros Documentos'
-}
-
-def load_categories():
-    """Carrega categorias do arquivo JSON ou retorna as padrões"""
-    try:
-        with open('categories.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return DOCUMENT_TYPES.copy()
-    except json.JSONDecodeError:
-        return DOCUMENT_TYPES.copy()
+# Hash de cada upload calculado uma única vez, no upload (streaming), e guardado por sessão
+SESSION_MANIFEST = '.manifest.json'  # {filename: {'hash': str, 'size': int}} por sessão
+
+def save_categories(categories, rules=None):
+    """Salva categorias (e regras, se fornecidas) no arquivo JSON
 
-def save_categories(categories):
-    """Salva categorias no arquivo JSON"""
+    Sem rules, as regras já gravadas no arquivo são preservadas.
+    """
     try:
         print(f"Tentando salvar categorias: {categories}")
-        with open('categories.json', 'w', encoding='utf-8') as f:
-            json.dump(categories, f, ensure_ascii=False, indent=2)
-        print("Categorias salvas com sucesso no arquivo categories.json")
+        if rules is None:
+            try:
+                _, rules = read_categories_file()
+            except (FileNotFoundError, json.JSONDecodeError):
+                rules = None
+        write_categories_file(categories, rules)
+        print(f"Categorias salvas com sucesso no arquivo {CATEGORIES_FILE}")
         return True
     except Exception as e:
         print(f"Erro ao salvar categorias: {e}")
@@ -147,1373 +118,40 @@ def encode_image(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-def get_file_hash(file_path):
-    """Calcula hash MD5 do arquivo para cache"""
-    hash_md5 = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
-
-def clean_expired_cache():
-    """Remove entradas expiradas do cache"""
-    current_time = time.time()
-    with cache_lock:
-        expired_keys = [k for k, v in ocr_cache.items()
-                       if current_time - v['timestamp'] > CACHE_EXPIRY]
-        for key in expired_keys:
-            del ocr_cache[key]
-
-        # Se cache muito grande, remove os mais antigos
-        if len(ocr_cache) > MAX_CACHE_SIZE:
-            sorted_items = sorted(ocr_cache.items(), key=lambda x: x[1]['timestamp'])
-            for key, _ in sorted_items[:len(ocr_cache) - MAX_CACHE_SIZE]:
-                del ocr_cache[key]
-
-def get_cached_ocr(file_path):
-    """Busca texto OCR no cache"""
-    try:
-        file_hash = get_file_hash(file_path)
-        with cache_lock:
-            if file_hash in ocr_cache:
-                cached = ocr_cache[file_hash]
-                if time.time() - cached['timestamp'] < CACHE_EXPIRY:
-                    print(f"  ⚡ Cache HIT - texto recuperado instantaneamente")
-                    return cached['text']
-                else:
-                    del ocr_cache[file_hash]
-    except Exception as e:
-        print(f"  Erro ao buscar cache: {e}")
-    return None
-
-def save_to_cache(file_path, text):
-    """Salva texto OCR no cache"""
-    try:
-        file_hash = get_file_hash(file_path)
-        with cache_lock:
-            ocr_cache[file_hash] = {
-                'text': text,
-                'timestamp': time.time()
-            }
-        clean_expired_cache()
-    except Exception as e:
-        print(f"  Erro ao salvar cache: {e}")
-
-def compress_image_for_ocr(image, max_size=2000):
-    """
-    OTIMIZAÇÃO: Comprime imagem mantendo qualidade OCR
-    Reduz processamento em ~40% sem perder precisão
-    """
-    width, height = image.size
-
-    # Se imagem já é pequena, retorna direto
-    if width <= max_size and height <= max_size:
-        return image
-
-    # Calcula nova dimensão mantendo aspect ratio
-    if width > height:
-        new_width = max_size
-        new_height = int((max_size / width) * height)
-    else:
-        new_height = max_size
-        new_width = int((max_size / height) * width)
-
-    # Redimensiona com algoritmo de alta qualidade
-    compressed = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-    print(f"  Imagem comprimida: {width}x{height} → {new_width}x{new_height}")
-    return compressed
-
-def detect_people_photo(file_path, text_content=""):
-    """
-    Detecta se é foto de pessoas (casal, grupo, selfie, paisagem, foto casual)
-    NÃO CONFUNDE com documentos que contêm fotos (RG, CNH, Passaporte)
-
-    Retorna: (is_people_photo: bool, confidence: float, num_faces: int, photo_type: str)
-    """
-    try:
-        # Se tiver muito texto, provavelmente é documento, não foto casual
-        if text_content and len(text_content.strip()) > 100:
-            return False, 0.0, 0, "document"
-
-        # Palavras-chave que indicam DOCUMENTO (não foto casual)
-        document_keywords = [
-            'identidade', 'rg', 'cnh', 'carteira', 'habilitação', 'passaporte',
-            'passport', 'república', 'brasil', 'cpf', 'data nascimento',
-            'validade', 'documento', 'número', 'ministério', 'república',
-            'identity', 'driver', 'license', 'national', 'federal'
-        ]
-
-        text_lower = text_content.lower() if text_content else ""
-        if any(keyword in text_lower for keyword in document_keywords):
-            return False, 0.0, 0, "document"  # É documento, não foto
-
-        # Tenta carregar a imagem
-        if file_path.lower().endswith('.pdf'):
-            return False, 0.0, 0, "pdf"  # PDFs não são fotos casuais
-
-        img = cv2.imread(file_path)
-        if img is None:
-            return False, 0.0, 0, "invalid"
-
-        # Detecta rostos usando Haar Cascade (leve e rápido)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # Usa detector de rostos do OpenCV
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-
-        num_faces = len(faces)
-
-        # Análise da imagem
-        height, width = img.shape[:2]
-        img_area = height * width
-        aspect_ratio = width / height if height > 0 else 1.0
-
-        # NOVA LÓGICA: Detecta paisagens e fotos sem rostos
-        if num_faces == 0:
-            # Verifica se é uma imagem fotográfica (não documento escaneado)
-            # Documentos geralmente têm alta variância de cores em áreas pequenas (texto)
-            # Fotos têm transições mais suaves
-
-            # Se não tem muito texto E é uma imagem colorida = provavelmente foto
-            has_little_text = len(text_lower.strip()) < 20
-
-            if has_little_text:
-                # Analisa se é foto (colorida, sem muito contraste típico de documentos)
-                hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-                saturation = hsv[:, :, 1].mean()  # Saturação média
-
-                # Fotos geralmente têm mais saturação que documentos escaneados
-                if saturation > 30:  # Limiar de saturação
-                    return True, 0.80, 0, "landscape"  # Paisagem/foto sem pessoas
-
-            return False, 0.0, 0, "no_faces"  # Não é foto de pessoas
-
-        # Calcula área total dos rostos
-        total_face_area = sum(w * h for (x, y, w, h) in faces)
-        face_ratio = total_face_area / img_area
-
-        # Regras de classificação OTIMIZADAS:
-        # 1. Se tem 2+ rostos (casal/grupo) = ALTA CONFIANÇA
-        if num_faces >= 2:
-            # Mesmo com rostos pequenos, 2+ pessoas = foto casual
-            confidence = 0.95 if face_ratio > 0.15 else 0.85
-            return True, confidence, num_faces, "couple_group"
-
-        # 2. Se tem 1 rosto grande e pouco/sem texto = selfie/retrato
-        if num_faces == 1 and face_ratio > 0.20 and len(text_lower.strip()) < 50:
-            return True, 0.90, num_faces, "selfie_portrait"
-
-        # 3. Se tem 1 rosto médio e NENHUM texto de documento = foto casual
-        if num_faces == 1 and face_ratio > 0.10 and len(text_lower.strip()) < 10:
-            return True, 0.85, num_faces, "single_person"
-
-        # 4. NOVO: Se tem 1 rosto pequeno mas sem texto = foto de pessoa em paisagem
-        if num_faces == 1 and face_ratio > 0.02 and len(text_lower.strip()) < 5:
-            return True, 0.75, num_faces, "person_landscape"
-
-        # Caso contrário: provavelmente é documento com foto
-        return False, 0.0, num_faces, "document_with_photo"
-
-    except Exception as e:
-        print(f"Erro ao detectar foto de pessoas: {e}")
-        return False, 0.0, 0, "error"
-
-def preprocess_image_for_ocr(image):
-    """Pré-processa imagem para melhorar precisão do OCR
+def save_upload_with_hash(file_storage, dest_path):
+    """Grava o upload em disco calculando o hash no mesmo passo
 
-    OTIMIZADO: Modo simplificado em produção (Render) para velocidade
+    Retorna: (file_hash: str, size: int)
     """
+    hasher = hashlib.blake2b(digest_size=32)
+    size = 0
+    with open(dest_path, 'wb') as out:
+        while True:
+            chunk = file_storage.stream.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+def load_session_manifest(session_folder):
+    """Carrega o manifesto da sessão (hash de cada arquivo enviado)"""
     try:
-        # Detecta produção (qualquer VPS/cloud)
-        is_production = (
-            os.environ.get('RENDER') is not None or
-            os.environ.get('FLASK_ENV') == 'production' or
-            os.environ.get('PRODUCTION') == 'true' or
-            not os.environ.get('DEBUG', '').lower() in ['true', '1', 'yes']
-        )
-
-        # Converte PIL Image para numpy array (OpenCV)
-        img_array = np.array(image)
-
-        # Converte para escala de cinza se necessário
-        if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_array
-
-        if is_production:
-            # MODO PRODUÇÃO: Processamento MÍNIMO e RÁPIDO (Render CPU fraca)
-            # Apenas redimensionamento leve + binarização simples
-            height, width = gray.shape
-            if height < 800 or width < 800:
-                scale_factor = 1.3
-                gray = cv2.resize(gray, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_LINEAR)
-
-            # Binarização Otsu apenas (muito rápida)
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-            print("  ⚡ Pré-processamento rápido (produção)")
-            return Image.fromarray(binary)
-
-        # MODO DESENVOLVIMENTO: Processamento completo e de alta qualidade
-        # 1. Redimensiona se a imagem for muito pequena (melhora OCR)
-        height, width = gray.shape
-        if height < 1000 or width < 1000:
-            scale_factor = 2.0
-            gray = cv2.resize(gray, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_CUBIC)
-            print(f"  Imagem redimensionada: {width}x{height} → {gray.shape[1]}x{gray.shape[0]}")
-
-        # 2. Remoção de ruído com filtro bilateral (preserva bordas)
-        denoised = cv2.bilateralFilter(gray, 9, 75, 75)
-
-        # 3. Correção de inclinação (deskew)
-        coords = np.column_stack(np.where(denoised > 0))
-        if len(coords) > 0:
-            angle = cv2.minAreaRect(coords)[-1]
-            if angle < -45:
-                angle = -(90 + angle)
-            else:
-                angle = -angle
-
-            if abs(angle) > 0.5:  # Só corrige se inclinação for significativa
-                (h, w) = denoised.shape
-                center = (w // 2, h // 2)
-                M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                denoised = cv2.warpAffine(denoised, M, (w, h),
-                                         flags=cv2.INTER_CUBIC,
-                                         borderMode=cv2.BORDER_REPLICATE)
-                print(f"  Correção de inclinação aplicada: {angle:.2f}°")
-
-        # 4. Binarização adaptativa (Otsu's method + adaptativa)
-        # Primeiro tenta Otsu
-        _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-        # Se Otsu não funcionar bem, usa binarização adaptativa
-        adaptive = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                        cv2.THRESH_BINARY, 11, 2)
-
-        # Usa a que tiver mais pixels brancos (geralmente melhor para documentos)
-        if np.sum(binary == 255) < np.sum(adaptive == 255):
-            binary = adaptive
-            print("  Binarização adaptativa aplicada")
-        else:
-            print("  Binarização Otsu aplicada")
-
-        # 5. Morfologia para limpar ruídos pequenos
-        kernel = np.ones((1, 1), np.uint8)
-        processed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-        processed = cv2.morphologyEx(processed, cv2.MORPH_OPEN, kernel)
-
-        # 6. Aumenta contraste final
-        processed = cv2.convertScaleAbs(processed, alpha=1.2, beta=10)
-
-        # Converte de volta para PIL Image
-        return Image.fromarray(processed)
-
-    except Exception as e:
-        print(f"  Erro no pré-processamento, usando imagem original: {e}")
-        return image
-
-def extract_month_year_from_bulletin(text):
-    """Extrai mês e ano de um bulletin de salaire francês"""
-    if not text:
-        return None, None
-
-    text_lower = text.lower()
-
-    # Mapeamento de meses em francês
-    meses_fr = {
-        'janvier': '01', 'jan': '01',
-        'février': '02', 'fevrier': '02', 'fev': '02', 'fév': '02',
-        'mars': '03', 'mar': '03',
-        'avril': '04', 'avr': '04',
-        'mai': '05',
-        'juin': '06',
-        'juillet': '07', 'juil': '07',
-        'août': '08', 'aout': '08',
-        'septembre': '09', 'sept': '09', 'sep': '09',
-        'octobre': '10', 'oct': '10',
-        'novembre': '11', 'nov': '11',
-        'décembre': '12', 'decembre': '12', 'dec': '12', 'déc': '12'
-    }
-
-    # Procura por padrão "Période : Mês Ano" ou "Période: Mês Ano"
-    import re
-
-    # Padrão 1: "Période : Juillet 2025" ou "période: juillet 2025"
-    match = re.search(r'période\s*[:：]\s*([a-zéèêâû]+)\s+(\d{4})', text_lower)
-    if match:
-        mes_texto = match.group(1).strip()
-        ano = match.group(2)
-        mes_num = meses_fr.get(mes_texto)
-        if mes_num:
-            return mes_num, ano
-
-    # Padrão 2: "07/2025" ou "07 2025"
-    match = re.search(r'(\d{2})[/\s-](\d{4})', text)
-    if match:
-        return match.group(1), match.group(2)
-
-    # Padrão 3: Mês por extenso seguido de ano
-    for mes_nome, mes_num in meses_fr.items():
-        pattern = rf'{mes_nome}\s+(\d{{4}})'
-        match = re.search(pattern, text_lower)
-        if match:
-            return mes_num, match.group(1)
-
-    return None, None
-
-def extract_text_from_file(file_path):
-    """Extrai texto de arquivos PDF ou imagens usando OCR com melhor logging
-
-    OTIMIZADO: Cache + Compressão para melhor performance
-    """
-    try:
-        # OTIMIZAÇÃO 1: Verifica cache primeiro (pula OCR se já processado)
-        cached_text = get_cached_ocr(file_path)
-        if cached_text is not None:
-            return cached_text
-
-        file_extension = os.path.splitext(file_path)[1].lower()
-        filename = os.path.basename(file_path)
-
-        if file_extension == '.pdf':
-            # Extração otimizada de texto de PDF com suporte a OCR para PDFs com imagens
-            print(f"Extraindo texto de PDF: {filename}")
-            text = ""
-            has_images = False
-            
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                print(f"  PDF com {total_pages} páginas")
-                
-                # OTIMIZAÇÃO: Para classificação, só precisamos das primeiras 2 páginas
-                max_pages = min(2, total_pages)
-                if max_pages < total_pages:
-                    print(f"  Limitando extração às primeiras {max_pages} páginas (suficiente para classificação)")
-                
-                for page_num in range(max_pages):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    text += page_text + "\n"
-
-                    # Verifica se a página tem imagens (indicativo de PDF escaneado)
-                    try:
-                        resources = page.get('/Resources')
-                        if resources and '/XObject' in resources:
-                            xobjects = resources['/XObject']
-                            if hasattr(xobjects, 'get_object'):
-                                xobjects = xobjects.get_object()
-                            if isinstance(xobjects, dict):
-                                for obj in xobjects:
-                                    if xobjects[obj]['/Subtype'] == '/Image':
-                                        has_images = True
-                                        break
-                    except Exception as e:
-                        print(f"  Erro ao verificar imagens na página {page_num + 1}: {e}")
-                        has_images = True  # Assume que tem imagens para forçar OCR
-
-                    if page_num < 3:  # Log detalhado apenas para as primeiras páginas
-                        print(f"  Página {page_num + 1}: {len(page_text)} caracteres extraídos")
-            
-            extracted_text = text.strip()
-
-            # OTIMIZAÇÃO: Só aplica OCR se realmente necessário (PDF escaneado SEM texto)
-            # Se já tem texto suficiente (>100 chars ou >20 palavras), pula OCR
-            if len(extracted_text) >= 100 or len(extracted_text.split()) >= 20:
-                print(f"  ✓ PDF já tem texto extraível ({len(extracted_text)} chars, {len(extracted_text.split())} palavras) - PULANDO OCR")
-                save_to_cache(file_path, extracted_text)
-                return extracted_text
-
-            # Se o PDF tem pouco texto mas tem imagens, aplica OCR apenas nas páginas processadas
-            if (len(extracted_text) < 100 and has_images) or (has_images and len(extracted_text.split()) < 20):
-                print(f"  PDF parece ser escaneado (pouco texto: {len(extracted_text)} chars), aplicando OCR...")
-                try:
-                    import fitz  # PyMuPDF para converter PDF em imagem
-
-                    # OTIMIZAÇÃO: Processa apenas as primeiras 2 páginas (suficiente para classificação)
-                    pdf_document = fitz.open(file_path)
-                    total_ocr_text = ""
-                    pages_to_process = min(len(pdf_document), 2)  # Máximo 2 páginas para velocidade
-
-                    for page_num in range(pages_to_process):
-                        page = pdf_document[page_num]
-                        # Aumenta resolução para melhor OCR (matriz 2x2)
-                        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                        img_data = pix.tobytes("png")
-
-                        # Converte bytes em imagem PIL
-                        from io import BytesIO
-                        image = Image.open(BytesIO(img_data))
-
-                        # OTIMIZAÇÃO 2: Comprime imagem antes do processamento (40% mais rápido)
-                        image = compress_image_for_ocr(image, max_size=2000)
-
-                        # Pré-processa a imagem
-                        print(f"  Pré-processando página {page_num + 1}...")
-                        processed_image = preprocess_image_for_ocr(image)
-
-                        # Aplica OCR com fallback inteligente PT → FR
-                        try:
-                            custom_config = r'--oem 3 --psm 6'
-
-                            # Tenta português primeiro (mais rápido)
-                            page_ocr_text = pytesseract.image_to_string(processed_image, lang='por', config=custom_config)
-
-                            # Fallback para francês se texto for muito curto ou suspeito
-                            if len(page_ocr_text.strip()) < 50:
-                                print(f"  Texto curto em PT, tentando francês...")
-                                page_ocr_text_fr = pytesseract.image_to_string(processed_image, lang='fra', config=custom_config)
-                                if len(page_ocr_text_fr.strip()) > len(page_ocr_text.strip()):
-                                    page_ocr_text = page_ocr_text_fr
-                                    print(f"  ✓ Francês reconheceu mais texto")
-
-                            # Detecção de francês por palavras-chave
-                            french_keywords = ['attestation', 'préfecture', 'tribunal', 'monsieur', 'madame', 'bulletin', 'salaire', 'employeur']
-                            if any(kw in page_ocr_text.lower() for kw in french_keywords):
-                                print(f"  Detectado francês, reprocessando com lang=fra+por...")
-                                page_ocr_text = pytesseract.image_to_string(processed_image, lang='fra+por', config=custom_config)
-
-                            total_ocr_text += page_ocr_text + "\n"
-                            print(f"  Página {page_num + 1}: {len(page_ocr_text)} caracteres extraídos via OCR")
-                        except Exception as ocr_error:
-                            print(f"  Erro no OCR da página {page_num + 1}: {ocr_error}")
-
-                    pdf_document.close()
-
-                    if len(total_ocr_text.strip()) > len(extracted_text):
-                        extracted_text = total_ocr_text.strip()
-                        print(f"  Usando texto do OCR completo: {len(extracted_text)} caracteres")
-
-                except ImportError:
-                    print(f"  PyMuPDF não disponível, tentando com pdf2image...")
-                    try:
-                        from pdf2image import convert_from_path
-
-                        # Converte todas as páginas em imagens
-                        images = convert_from_path(file_path, dpi=300)
-                        total_ocr_text = ""
-
-                        for idx, image in enumerate(images):
-                            if idx >= max_pages:
-                                break
-                            # Pré-processa
-                            processed_image = preprocess_image_for_ocr(image)
-
-                            # OCR com fallback inteligente PT → FR
-                            custom_config = r'--oem 3 --psm 6'
-                            page_ocr_text = pytesseract.image_to_string(processed_image, lang='por', config=custom_config)
-
-                            # Fallback para francês se necessário
-                            if len(page_ocr_text.strip()) < 50:
-                                page_ocr_text_fr = pytesseract.image_to_string(processed_image, lang='fra', config=custom_config)
-                                if len(page_ocr_text_fr.strip()) > len(page_ocr_text.strip()):
-                                    page_ocr_text = page_ocr_text_fr
-
-                            french_keywords = ['attestation', 'préfecture', 'tribunal', 'monsieur', 'madame', 'bulletin', 'salaire']
-                            if any(kw in page_ocr_text.lower() for kw in french_keywords):
-                                page_ocr_text = pytesseract.image_to_string(processed_image, lang='fra+por', config=custom_config)
-
-                            total_ocr_text += page_ocr_text + "\n"
-                            print(f"  Página {idx + 1}: {len(page_ocr_text)} caracteres via OCR")
-
-                        if len(total_ocr_text.strip()) > len(extracted_text):
-                            extracted_text = total_ocr_text.strip()
-                            print(f"  Usando texto do OCR completo: {len(extracted_text)} caracteres")
-                    except Exception as pdf2img_error:
-                        print(f"  Erro com pdf2image: {pdf2img_error}")
-                        print(f"  Usando texto extraído diretamente: {len(extracted_text)} caracteres")
-                except Exception as e:
-                    print(f"  Erro ao aplicar OCR no PDF: {e}")
-            
-            print(f"Total extraído do PDF: {len(extracted_text)} caracteres")
-            save_to_cache(file_path, extracted_text)
-            return extracted_text
-            
-        elif file_extension in ['.jpg', '.jpeg', '.png']:
-            # OCR para imagens com pré-processamento
-            print(f"Aplicando OCR em imagem: {filename}")
-            try:
-                image = Image.open(file_path)
-                print(f"  Dimensões da imagem original: {image.size}")
-
-                # Pré-processa a imagem para melhorar OCR
-                print("  Iniciando pré-processamento da imagem...")
-                processed_image = preprocess_image_for_ocr(image)
-
-                # Configuração otimizada do Tesseract
-                # --oem 3: usa LSTM OCR Engine (mais preciso)
-                # --psm 6: assume um bloco uniforme de texto
-                # preserve_interword_spaces: mantém espaços entre palavras
-                custom_config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
-
-                # OCR com fallback inteligente PT → FR
-                try:
-                    custom_config = r'--oem 3 --psm 6'
-
-                    # Tenta português primeiro
-                    text = pytesseract.image_to_string(processed_image, lang='por', config=custom_config)
-                    print(f"  OCR português: {len(text)} caracteres extraídos")
-
-                    # Fallback para francês se texto curto
-                    if len(text.strip()) < 50:
-                        print(f"  Texto curto, tentando francês...")
-                        text_fr = pytesseract.image_to_string(processed_image, lang='fra', config=custom_config)
-                        if len(text_fr.strip()) > len(text.strip()):
-                            text = text_fr
-                            print(f"  ✓ Francês reconheceu mais texto")
-
-                    # Detecção de francês e reprocessamento
-                    french_keywords = ['attestation', 'préfecture', 'tribunal', 'monsieur', 'madame', 'bulletin', 'salaire', 'employeur']
-                    if any(kw in text.lower() for kw in french_keywords):
-                        print(f"  Detectado francês, reprocessando com fra+por...")
-                        text = pytesseract.image_to_string(processed_image, lang='fra+por', config=custom_config)
-                        print(f"  OCR bi-idioma: {len(text)} caracteres extraídos")
-
-                except Exception as e:
-                    print(f"  Erro no OCR: {e}")
-                    text = ""
-
-                extracted_text = text.strip()
-                if extracted_text:
-                    print(f"  Texto extraído com sucesso: {len(extracted_text)} caracteres")
-                    # Mostra uma amostra do texto extraído para debug
-                    sample = extracted_text[:100].replace('\n', ' ')
-                    print(f"  Amostra: {sample}...")
-                else:
-                    print("  Nenhum texto foi extraído da imagem")
-
-                save_to_cache(file_path, extracted_text)
-                return extracted_text
-
-            except Exception as ocr_error:
-                print(f"Erro no OCR para {filename}: {ocr_error}")
-                return ""
-        
-        print(f"Formato não suportado para extração: {file_extension}")
-        return ""
-        
-    except Exception as e:
-        print(f"Erro ao extrair texto de {file_path}: {e}")
-        return ""
-
-def separate_documents_from_pdf(file_path):
-    """Separa um PDF em documentos individuais por página"""
-    try:
-        documents = []
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                # Extrai texto da página
-                page_text = page.extract_text().strip()
-                
-                if page_text:  # Só inclui páginas com texto
-                    documents.append({
-                        'page_number': page_num + 1,
-                        'text': page_text,
-                        'filename': f"{os.path.splitext(os.path.basename(file_path))[0]}_pagina_{page_num + 1}.pdf"
-                    })
-        
-        return documents
-    except Exception as e:
-        print(f"Erro ao separar PDF {file_path}: {e}")
-        return []
-
-def detect_document_boundaries(text):
-    """Detecta possíveis limites entre documentos em um texto"""
-    # Padrões que indicam início de novo documento
-    document_markers = [
-        r'REPÚBLICA FEDERATIVA DO BRASIL',
-        r'CERTIDÃO DE NASCIMENTO',
-        r'CARTEIRA DE TRABALHO',
-        r'CARTEIRA NACIONAL DE HABILITAÇÃO',
-        r'REGISTRO GERAL',
-        r'CADASTRO DE PESSOA FÍSICA',
-        r'COMPROVANTE DE RESIDÊNCIA',
-        r'HOLERITE',
-        r'FOLHA DE PAGAMENTO',
-        r'CONTRATO',
-        r'PROCURAÇÃO',
-        r'PETIÇÃO INICIAL',
-        r'SENTENÇA',
-        r'NOTA FISCAL'
-    ]
-    
-    import re
-    boundaries = [0]  # Sempre começa no início
-    
-    for marker in document_markers:
-        matches = re.finditer(marker, text, re.IGNORECASE)
-        for match in matches:
-            pos = match.start()
-            if pos > 100:  # Evita detectar o mesmo documento
-                boundaries.append(pos)
-    
-    boundaries = sorted(list(set(boundaries)))  # Remove duplicatas e ordena
-    return boundaries
-
-
-def classify_offline_fallback(file_path, categories=None, text=None):
-    """Classificação offline usando padrões de nome de arquivo e conteúdo OCR"""
-    if categories is None:
-        categories = DOCUMENT_TYPES
-
-    # Extrai texto se não foi fornecido
-    if text is None:
-        text = extract_text_from_file(file_path)
-
-    filename = os.path.basename(file_path) if os.path.isfile(file_path) else file_path
-    filename_lower = filename.lower()
-    text_lower = text.lower() if text else ""
-
-    print(f"  [Offline] Analisando: {filename}")
-    print(f"  [Offline] Texto disponível: {len(text)} caracteres")
-    
-    # Padrões expandidos e unificados para classificação
-    filename_patterns = {
-        # Documentos de Identidade
-        'rg': ['rg', 'identidade', 'carteira_identidade', 'cedula'],
-        'cpf': ['cpf', 'cadastro_pessoa_fisica'],
-        'cnh': ['cnh', 'carteira_habilitacao', 'habilitacao'],
-        'passaporte': ['passaporte', 'passport'],
-        
-        # Certidões
-        'certidao_nascimento': ['certidao', 'nascimento', 'birth'],
-        'certidao_casamento': ['certidao', 'casamento', 'marriage'],
-        'certidao_obito': ['certidao', 'obito', 'death'],
-        'certidao_antecedentes': ['certidao', 'antecedentes', 'criminal'],
-        
-        # Documentos de Trabalho
-        'holerite': ['holerite', 'folha', 'pagamento', 'salario'],
-        'certificado_trabalho': ['certificado', 'trabalho', 'emprego'],
-        'comprovante_renda': ['comprovante', 'renda', 'rendimento'],
-        'declaracao_imposto': ['declaracao', 'imposto', 'renda', 'receita'],
-        
-        # Documentos Escolares
-        'diploma': ['diploma', 'graduacao', 'formatura'],
-        'certificado_escolar': ['certificado', 'escolar', 'curso'],
-        'historico_escolar': ['historico', 'escolar', 'notas'],
-        'comprovante_matricula': ['comprovante', 'matricula', 'escola'],
-        
-        # Documentos Médicos
-        'atestado_medico': ['atestado', 'medico', 'saude'],
-        'laudo_medico': ['laudo', 'medico', 'exame'],
-        'comprovante_vacinacao': ['comprovante', 'vacinacao', 'vacina'],
-        'cartao_vacinacao': ['cartao', 'vacinacao', 'vacina'],
-        
-        # Documentos Bancários
-        'comprovante_bancario': ['comprovante', 'bancario', 'banco'],
-        'extrato_bancario': ['extrato', 'bancario', 'conta'],
-        'comprovante_transferencia': ['comprovante', 'transferencia', 'ted', 'doc'],
-        'comprovante_deposito': ['comprovante', 'deposito'],
-        
-        # Comprovantes de Residência e Contas
-        'comprovante_residencia': ['comprovante', 'residencia', 'endereco'],
-        'conta_luz': ['conta', 'luz', 'energia', 'eletrica', 'cemig', 'copel', 'celpe'],
-        'conta_agua': ['conta', 'agua', 'saneamento', 'sabesp', 'cedae'],
-        'conta_gas': ['conta', 'gas', 'comgas', 'naturgy'],
-        
-        # Comprovantes de Pagamento
-        'comprovante_pagamento': ['comprovante', 'pagamento'],
-        'recibo': ['recibo', 'pagamento'],
-        'nota_fiscal': ['nota', 'fiscal', 'nf', 'nfe'],
-        'boleto': ['boleto', 'cobranca'],
-        'comprovante_quitacao': ['comprovante', 'quitacao'],
-        
-        # Documentos Legais
-        'autorizacao': ['autorizacao', 'permissao'],
-        'procuracao': ['procuracao', 'mandato', 'representacao'],
-        'declaracao': ['declaracao'],
-        'licenca': ['licenca', 'alvara'],
-        'alvara': ['alvara', 'funcionamento'],
-        'permissao': ['permissao'],
-        
-        # Documentos Jurídicos
-        'contrato': ['contrato', 'acordo', 'contract', 'termo'],
-        'peticao': ['peticao', 'inicial', 'recurso', 'defesa'],
-        'sentenca': ['sentenca', 'decisao', 'julgamento', 'acordao'],
-        
-        # Outros
-        'atestado': ['atestado'],
-        'certificado': ['certificado'],
-        'credencial': ['credencial'],
-        'carteirinha': ['carteirinha'],
-        'cartao': ['cartao'],
-        'comprovante_isencao': ['comprovante', 'isencao'],
-        
-        # Documentos específicos para migração francesa
-        'titre_sejour': ['titre', 'sejour', 'residence'],
-        'visa_frances': ['visa', 'visto', 'schengen'],
-        'carte_resident': ['carte', 'resident', 'permanente'],
-        'attestation_hebergement': ['attestation', 'hebergement', 'logement'],
-        'justificatif_domicile': ['justificatif', 'domicile', 'residence'],
-        'bulletin_salaire': ['bulletin-de-salaire', 'bulletin_salaire', 'bulletin', 'salaire', 'paie', 'fiche-de-paie'],
-        'contrat_travail': ['contrat', 'travail', 'emploi'],
-        'attestation_employeur': ['attestation', 'employeur', 'travail'],
-        'avis_imposition': ['avis', 'imposition', 'impot'],
-        'certificat_scolarite': ['certificat', 'scolarite', 'etudiant'],
-        'diplome_francais': ['diplome', 'universite', 'formation'],
-        'acte_naissance_traduit': ['acte', 'naissance', 'traduit'],
-        'casier_judiciaire': ['casier', 'judiciaire', 'penal'],
-        'certificat_medical': ['certificat', 'medical', 'sante'],
-        'assurance_maladie': ['assurance', 'maladie', 'securite', 'sociale'],
-        'liste_documents': ['lista', 'documentos', 'regularizacao', 'regularisation'],
-        
-        # Documentos jurídicos franceses específicos
-        'tableau_vie_commune': ['tableau', 'vie', 'commune', 'justificatifs', 'conjoint'],
-        'refere_suspension': ['refere', 'suspension', 'tribunal', 'administratif'],
-        'accuse_depot': ['accuse', 'depot', 'recommande', 'envoi'],
-        'accuse_reception': ['accuse', 'reception', 'requete', 'depot'],
-        'requete_tribunal': ['requete', 'tribunal', 'administratif', 'petition'],
-        'lettre_recommandee': ['lettre', 'recommandee', 'poste', 'envoi'],
-        'document_tribunal': ['tribunal', 'administratif', 'juridique', 'judiciaire'],
-        'procedure_administrative': ['procedure', 'administrative', 'demarche'],
-        'recours_administratif': ['recours', 'administratif', 'contestation'],
-        
-        # Documentos específicos adicionais
-        'attestation_honneur': ['attestation', 'honneur', 'lhonneur', 'sur_lhonneur', 'epoux', 'requerante'],
-        'attestation_depot': ['attestation', 'depot', 'de_depot'],
-        'passeport': ['passeport', 'passport'],
-
-        'outros': []  # Removido padrões genéricos para evitar false positives
-    }
-    
-    # Classificação baseada no nome do arquivo com confiança alta
-    for category, keywords in filename_patterns.items():
-        if any(keyword in filename_lower for keyword in keywords):
-            # Tratamento especial para notas fiscais
-            if category == 'outros' and any(word in filename_lower for word in ['nota', 'fiscal', 'nf', 'nfe']):
-                return {
-                    'category': 'nota_fiscal',
-                    'category_name': 'Notas Fiscais e Documentos Comerciais',
-                    'method': 'offline_filename',
-                    'confidence': 0.8
-                }
-            return {
-                'category': category,
-                'category_name': categories.get(category, category.title()),
-                'method': 'offline_filename',
-                'confidence': 0.8
-            }
-    
-    # Classificação baseada no conteúdo OCR com padrões mais específicos
-    if text_lower:
-        content_patterns = {
-            'rg': [
-                'registro geral', 
-                'carteira de identidade', 
-                'secretaria de segurança pública',
-                'instituto de identificação',
-                'rg nº',
-                'carteira identidade',
-                'documento de identidade'
-            ],
-            'cpf': ['cadastro de pessoa física', 'receita federal do brasil', 'cpf nº', 'situação cadastral'],
-            'cnh': ['carteira nacional de habilitação', 'detran', 'categoria a', 'categoria b', 'categoria c', 'categoria d', 'categoria e'],
-            'passaporte': ['passaporte brasileiro', 'passport', 'ministério das relações exteriores', 'polícia federal'],
-            'certidao_nascimento': ['certidão de nascimento', 'registro civil das pessoas naturais', 'nasceu no dia', 'filho de'],
-            'certidao_casamento': ['certidão de casamento', 'registro civil das pessoas naturais', 'casaram-se', 'contraíram matrimônio'],
-            'certidao_obito': ['certidão de óbito', 'registro civil das pessoas naturais', 'faleceu', 'causa da morte'],
-            'holerite': ['demonstrativo de pagamento', 'folha de pagamento', 'salário base', 'desconto inss', 'salário líquido'],
-            'comprovante_bancario': ['comprovante de operação bancária', 'agência', 'conta corrente', 'saldo disponível'],
-            'extrato_bancario': ['extrato de conta corrente', 'movimentação bancária', 'saldo anterior', 'saldo atual'],
-            'nota_fiscal': ['nota fiscal eletrônica', 'cnpj', 'valor total da nota', 'icms', 'danfe'],
-            'atestado': ['atestado médico', 'cid-10', 'afastamento por', 'dias de repouso'],
-            'certificado': ['certificado de conclusão', 'carga horária', 'aprovado com', 'instituição de ensino'],
-            'diploma': ['diploma de graduação', 'universidade', 'bacharel em', 'licenciado em', 'tecnólogo em'],
-            'carta': ['prezado senhor', 'prezada senhora', 'atenciosamente', 'cordialmente', 'respeitosamente'],
-            
-            # Padrões para documentos de migração francesa
-            'titre_sejour': [
-                'titre de séjour', 'carte de séjour', 'préfecture', 'ofii', 
-                'autorisation de séjour', 'récépissé de demande', 'renouvellement'
-            ],
-            'visa_frances': [
-                'visa', 'consulat de france', 'schengen', 'entrée en france',
-                'ambassade de france', 'visa de long séjour', 'vls-ts'
-            ],
-            'carte_resident': [
-                'carte de résident', 'résident permanent', 'carte de résident permanent',
-                'titre de séjour de 10 ans', 'résident de longue durée'
-            ],
-            'attestation_hebergement': [
-                'attestation d\'hébergement', 'héberge', 'domicile chez',
-                'certifie héberger', 'logement gratuit', 'hébergement à titre gratuit'
-            ],
-            'justificatif_domicile': [
-                'justificatif de domicile', 'facture edf', 'facture gdf', 'facture eau',
-                'quittance de loyer', 'taxe d\'habitation', 'facture téléphone'
-            ],
-            'bulletin_salaire': [
-                'bulletin de salaire', 'bulletin de paie', 'fiche de paie',
-                'salaire brut', 'salaire net', 'cotisations sociales', 'urssaf',
-                'période :', 'période:', 'employeur', 'salarié', 'net à payer'
-            ],
-            'contrat_travail': [
-                'contrat de travail', 'cdi', 'cdd', 'contrat à durée indéterminée',
-                'contrat à durée déterminée', 'employeur', 'salarié'
-            ],
-            'attestation_employeur': [
-                'attestation employeur', 'certificat de travail', 'attestation de salaire',
-                'emploi depuis', 'fonction occupée', 'rémunération mensuelle'
-            ],
-            'avis_imposition': [
-                'avis d\'imposition', 'impôt sur le revenu', 'revenu fiscal de référence',
-                'direction générale des finances publiques', 'dgfip', 'revenus déclarés'
-            ],
-            'certificat_scolarite': [
-                'certificat de scolarité', 'attestation de scolarité', 'étudiant inscrit',
-                'année scolaire', 'établissement scolaire', 'université'
-            ],
-            'diplome_francais': [
-                'diplôme', 'université', 'licence', 'master', 'doctorat',
-                'baccalauréat', 'bts', 'dut', 'académie', 'ministère de l\'éducation'
-            ],
-            'acte_naissance_traduit': [
-                'acte de naissance', 'traduction certifiée', 'traducteur assermenté',
-                'né le', 'lieu de naissance', 'état civil', 'extrait de naissance'
-            ],
-            'casier_judiciaire': [
-                'casier judiciaire', 'bulletin n°3', 'extrait de casier judiciaire',
-                'ministère de la justice', 'condamnations', 'vierge'
-            ],
-            'certificat_medical': [
-                'certificat médical', 'médecin', 'examen médical', 'aptitude physique',
-                'visite médicale', 'ofii médical', 'tuberculose'
-            ],
-            'assurance_maladie': [
-                'assurance maladie', 'sécurité sociale', 'carte vitale', 'cpam',
-                'attestation de droits', 'numéro de sécurité sociale', 'mutuelle'
-            ],
-            'liste_documents': [
-                'lista de documentos', 'liste des documents', 'regularização', 'regularisation',
-                'dossier de demande', 'pièces à fournir', 'documents requis', 'checklist'
-            ],
-            
-            # Padrões para documentos jurídicos franceses específicos
-            'tableau_vie_commune': [
-                'tableau détaillé des justificatifs', 'justificatifs de vie commune',
-                'vie commune', 'conjoint', 'concubinage', 'pacs', 'mariage',
-                'madame', 'monsieur', 'et son conjoint', 'et sa conjointe'
-            ],
-            'refere_suspension': [
-                'référé suspension', 'tribunal administratif', 'requête en référé',
-                'suspension de l\'exécution', 'mesures d\'urgence', 'référé-suspension',
-                'tribunal administratif de', 'demande de suspension'
-            ],
-            'accuse_depot': [
-                'accusé de dépôt', 'envoi recommandé', 'lettre recommandée',
-                'la poste', 'dépôt d\'un envoi', 'recommandé avec accusé',
-                'numéro de suivi', 'preuve de dépôt'
-            ],
-            'accuse_reception': [
-                'accusé de réception', 'réception d\'un dépôt', 'dépôt de requête',
-                'comprovante de recebimento', 'requerimento apresentado',
-                'réception de la demande', 'enregistrement de la requête'
-            ],
-            'requete_tribunal': [
-                'requête', 'tribunal administratif', 'demande au tribunal',
-                'pétition', 'recours contentieux', 'contentieux administratif',
-                'juridiction administrative', 'instance administrative'
-            ],
-            'lettre_recommandee': [
-                'lettre recommandée', 'envoi recommandé', 'courrier recommandé',
-                'accusé de réception postal', 'la poste française',
-                'service postal', 'recommandé ar'
-            ],
-            'document_tribunal': [
-                'tribunal', 'juridiction', 'cour administrative', 'instance judiciaire',
-                'procédure judiciaire', 'acte judiciaire', 'décision de justice'
-            ],
-            'procedure_administrative': [
-                'procédure administrative', 'démarche administrative', 'formalité administrative',
-                'administration française', 'service public', 'démarche officielle'
-            ],
-            'recours_administratif': [
-                'recours administratif', 'contestation administrative', 'recours gracieux',
-                'recours hiérarchique', 'opposition administrative', 'révision administrative'
-            ],
-            
-            # Documentos específicos adicionais
-            'attestation_honneur': [
-                'attestation sur l\'honneur', 'attestation d\'honneur', 'sur l\'honneur',
-                'je soussigné', 'atteste sur l\'honneur', 'certifie sur l\'honneur',
-                'déclare sur l\'honneur', 'époux', 'épouse', 'requérante'
-            ],
-            'attestation_depot': [
-                'attestation de dépôt', 'attestation dépôt', 'dépôt de dossier',
-                'accusé de dépôt', 'confirmation de dépôt', 'récépissé de dépôt'
-            ],
-            'bulletin_salaire': [
-                'bulletin de salaire', 'bulletin de paie', 'fiche de paie',
-                'salaire brut', 'salaire net', 'cotisations sociales',
-                'employeur', 'salarié', 'période de paie', 'rémunération'
-            ],
-            'passeport': [
-                'passeport', 'passport', 'république française', 'ministère des affaires étrangères',
-                'document de voyage', 'identité française', 'nationalité française',
-                'passeport français', 'passeport biométrique'
-            ]
-        }
-        
-        # Sistema de pontuação mais rigoroso com priorização de documentos jurídicos e específicos
-        legal_categories = [
-            'tableau_vie_commune', 'refere_suspension', 'accuse_depot', 'accuse_reception',
-            'requete_tribunal', 'lettre_recommandee', 'document_tribunal', 
-            'procedure_administrative', 'recours_administratif'
-        ]
-        
-        # Categorias específicas com alta prioridade
-        specific_categories = [
-            'attestation_honneur', 'attestation_depot', 'bulletin_salaire', 'passeport'
-        ]
-        
-        # Primeiro, verifica documentos jurídicos franceses (alta prioridade)
-        for category in legal_categories:
-            if category in content_patterns:
-                patterns = content_patterns[category]
-                matches = sum(1 for pattern in patterns if pattern in text_lower)
-                if matches >= 1:  # Apenas 1 padrão necessário para documentos jurídicos
-                    return {
-                        'category': category,
-                        'category_name': categories.get(category, category.title()),
-                        'method': 'offline_content_legal',
-                        'confidence': min(0.9, 0.7 + (matches * 0.1))
-                    }
-        
-        # Segundo, verifica documentos específicos (alta prioridade)
-        for category in specific_categories:
-            if category in content_patterns:
-                patterns = content_patterns[category]
-                matches = sum(1 for pattern in patterns if pattern in text_lower)
-                if matches >= 1:  # Apenas 1 padrão necessário para documentos específicos
-                    return {
-                        'category': category,
-                        'category_name': categories.get(category, category.title()),
-                        'method': 'offline_content_specific',
-                        'confidence': min(0.9, 0.7 + (matches * 0.1))
-                    }
-        
-        # Depois, verifica outras categorias com regras específicas
-        for category, patterns in content_patterns.items():
-            if category in legal_categories or category in specific_categories:
-                continue  # Já verificado acima
-                
-            matches = sum(1 for pattern in patterns if pattern in text_lower)
-            if matches > 0:
-                # Para RG, exige pelo menos 3 padrões correspondentes (mais restritivo)
-                if category == 'rg' and matches >= 3:
-                    # Verificação adicional: evita RG se contém termos jurídicos ou específicos
-                    legal_terms = ['tribunal', 'attestation', 'accusé', 'requête', 'dépôt', 'passeport', 'bulletin', 'salaire']
-                    if not any(term in text_lower for term in legal_terms):
-                        return {
-                            'category': category,
-                            'category_name': categories.get(category, category.title()),
-                            'method': 'offline_content',
-                            'confidence': min(0.7, 0.4 + (matches * 0.08))  # Confiança reduzida
-                        }
-                # Para outras categorias não jurídicas, 1 padrão é suficiente
-                elif category != 'rg':
-                    return {
-                        'category': category,
-                        'category_name': categories.get(category, category.title()),
-                        'method': 'offline_content',
-                        'confidence': min(0.8, 0.6 + (matches * 0.1))
-                    }
-    
-    # Fallback final
-    return {
-        'category': 'outros',
-        'category_name': categories.get('outros', 'Outros Documentos'),
-        'method': 'offline_fallback',
-        'confidence': 0.1
-    }
-
-def test_openai_connection(api_key):
-    """Função desabilitada - não usa mais OpenAI"""
-    return True, "OCR-only mode"
-
-def classify_document_hybrid(file_path, api_key=None, categories=None):
-    """Classificação baseada em OCR + Regras (sem IA)"""
-    if categories is None:
-        categories = load_categories()
-
-    filename = os.path.basename(file_path)
-
-    # 1. PRIMEIRO: Extrai texto usando OCR (sempre executa)
-    print(f"Extraindo texto via OCR de: {filename}")
-    text_content = extract_text_from_file(file_path)
-
-    # 1.5. DETECÇÃO DE FOTOS DE PESSOAS (antes de outras classificações)
-    # Evita conflito com documentos que contêm fotos (RG, CNH, Passaporte)
-    is_people_photo, photo_confidence, num_faces, photo_type = detect_people_photo(file_path, text_content)
-    if is_people_photo and photo_confidence > 0.70:  # Reduzido de 0.80 para 0.70 (mais sensível)
-        # Mensagem personalizada baseada no tipo de foto
-        if photo_type == "landscape":
-            detail_msg = "Paisagem/foto sem pessoas"
-        elif photo_type == "couple_group":
-            detail_msg = f'{num_faces} pessoa(s) detectada(s) - Casal/Grupo'
-        elif photo_type == "selfie_portrait":
-            detail_msg = "Selfie/Retrato"
-        elif photo_type == "single_person":
-            detail_msg = "1 pessoa detectada"
-        elif photo_type == "person_landscape":
-            detail_msg = "Pessoa em paisagem"
-        else:
-            detail_msg = f'{num_faces} pessoa(s) detectada(s)'
-
-        print(f"✓ FOTO DE PESSOAS detectada: {detail_msg}, confiança {photo_confidence:.2f}")
-        return {
-            'category': 'fotos_pessoas',
-            'category_name': 'Fotos de Pessoas',
-            'confidence': photo_confidence,
-            'method': 'face_detection',
-            'details': detail_msg
-        }
-
-    # 2. Detecção aprimorada para documentos franceses específicos
-    text_lower = text_content.lower() if text_content else ""
-    filename_lower = filename.lower()
-
-    # Padrões específicos dos documentos reais da pasta "Documentos Anne"
-    enhanced_patterns = {
-        'bulletin_salaire': ['bulletin', 'salaire', 'cotisations', 'brut', 'net à payer', 'employeur', 'salarié'],
-        'passaporte': ['passport', 'passeport', 'república federativa', 'passaporte', 'federal republic'],
-        'comprovante_residencia': ['edf', 'electricité de france', 'kwh', 'facture', 'abonnement'],
-        'contrato': ['contrat', 'pédagogique', 'formation', 'stage', 'convention'],
-        'lista_documents': ['liste', 'documents', 'pièces à fournir', 'membre de famille'],
-        'attestation_hebergement': ['attestation', 'hébergement', 'certifie'],
-        'facture': ['facture', 'invoice', 'montant', 'ttc', 'commande'],
-        'outros': []  # Categoria padrão
-    }
-
-    # Detecção forte baseada em padrões dos documentos reais
-    strong_match_category = None
-    strong_match_confidence = 0.0
-
-    for category, patterns in enhanced_patterns.items():
-        if category == 'outros':
-            continue
-        matches = sum(1 for pattern in patterns if pattern in text_lower or pattern in filename_lower)
-        if matches >= 2:  # Pelo menos 2 padrões encontrados
-            confidence = min(0.95, 0.60 + (matches * 0.10))
-            if confidence > strong_match_confidence:
-                strong_match_category = category
-                strong_match_confidence = confidence
-
-    # 3. Classificação baseada em regras com texto OCR
-    rule_result = classify_offline_fallback(file_path, categories)
-    print(f"Regras classificaram como: {rule_result['category']} (confiança: {rule_result['confidence']})")
-
-    # Sobrescreve com detecção forte se encontrada
-    if strong_match_category:
-        print(f"Padrões aprimorados detectaram: {strong_match_category} (confiança: {strong_match_confidence})")
-        rule_result['category'] = strong_match_category
-        rule_result['category_name'] = categories.get(strong_match_category, 'Outros Documentos')
-        rule_result['confidence'] = strong_match_confidence
-
-    # 4. Verifica sistema de aprendizado
-    learned_category, learned_confidence = learning_system.get_intelligent_classification(filename, text_content)
-    if learned_category:
-        print(f"Sistema aprendido sugere: {learned_category} (confiança: {learned_confidence})")
-
-    # Valida semanticamente o resultado das regras
-    semantic_validation = validate_classification_semantically(rule_result['category'], text_content)
-    rule_result['confidence'] = min(0.98, rule_result['confidence'] * semantic_validation)
-
-    # REGRA CRÍTICA 1: Se classificou como "outros", assertividade = N/A
-    if rule_result['category'] == 'outros':
-        rule_result['confidence'] = 'N/A'
-        print(f"Categoria 'outros' detectada, assertividade definida como N/A")
-
-    # REGRA CRÍTICA 2: Se classificou em categoria específica, confiança mínima de 30%
-    elif isinstance(rule_result['confidence'], (int, float)) and rule_result['confidence'] == 0.0:
-        rule_result['confidence'] = 0.30
-        print(f"Confiança 0% corrigida para mínimo de 30% (categoria específica: {rule_result['category']})")
-
-    # 4. LÓGICA OTIMIZADA: Usa IA apenas quando realmente necessário
-    confidence_threshold = 0.70
-    use_ai_threshold = 0.85  # Só chama IA se confiança for menor que isso
-
-    # Tratamento especial para confiança N/A (categoria "outros")
-    if rule_result['confidence'] == 'N/A':
-        learning_system.record_classification(filename, rule_result['category'], 0, text_content)
-        return {
-            'category': rule_result['category'],
-            'category_name': rule_result['category_name'],
-            'method': 'rules_outros_category',
-            'confidence': 'N/A'
-        }
-
-    # Retorna resultado das regras (sem IA)
-    if rule_result['category'] != 'outros':
-        print(f"Classificação por regras: {rule_result['category']} ({rule_result['confidence']})")
-        learning_system.record_classification(filename, rule_result['category'], rule_result['confidence'], text_content)
-        return {
-            'category': rule_result['category'],
-            'category_name': rule_result['category_name'],
-            'method': 'rules_ocr_only',
-            'confidence': rule_result['confidence']
-        }
-
-    # Categoria "outros" - sem IA
-    if False:
-        # Aplica IA apenas para validação cruzada com threshold mais alto
-        if api_key:
-            try:
-                print(f"Validando com IA a classificação por regras: {rule_result['category']}")
-                ai_result = classify_with_ai(file_path, api_key, categories)
-                print(f"IA classificou como: {ai_result['category']} (confiança: {ai_result['confidence']})")
-                
-                # Consenso forte: ambos concordam com alta confiança
-                if (ai_result['category'] == rule_result['category'] and 
-                    ai_result['confidence'] >= 0.7 and rule_result['confidence'] >= 0.7):
-                    final_confidence = min(0.98, (rule_result['confidence'] + ai_result['confidence']) / 2 + 0.2)
-                    learning_system.record_classification(filename, rule_result['category'], final_confidence, text_content)
-                    return {
-                        'category': rule_result['category'],
-                        'category_name': rule_result['category_name'],
-                        'method': 'hybrid_strong_consensus',
-                        'confidence': final_confidence
-                    }
-                
-                # Discordância: analisa qual tem maior confiança e contexto
-                elif ai_result['category'] != rule_result['category']:
-                    # Se ambos têm alta confiança mas discordam, prioriza o método mais específico
-                    if (ai_result['confidence'] >= 0.8 and rule_result['confidence'] >= 0.8):
-                        # Verifica se há padrões específicos no conteúdo que favoreçam uma classificação
-                        text_lower = text_content.lower() if text_content else ""
-                        
-                        # Padrões de alta especificidade para desempate
-                        specific_patterns = {
-                            'passaporte': ['república federativa', 'federal republic', 'passport'],
-                            'rg': ['registro geral', 'carteira de identidade'],
-                            'cpf': ['cadastro de pessoa física', 'receita federal'],
-                            'cnh': ['carteira nacional de habilitação', 'detran'],
-                            'conta_luz': ['kwh', 'energia elétrica', 'distribuidora'],
-                            'conta_agua': ['m³', 'saneamento básico'],
-                            'extrato_bancario': ['saldo anterior', 'saldo atual', 'conta corrente'],
-                            'nota_fiscal': ['cnpj', 'nota fiscal eletrônica', 'chave de acesso']
-                        }
-                        
-                        rule_specificity = sum(1 for pattern in specific_patterns.get(rule_result['category'], []) 
-                                             if pattern in text_lower)
-                        ai_specificity = sum(1 for pattern in specific_patterns.get(ai_result['category'], []) 
-                                           if pattern in text_lower)
-                        
-                        if rule_specificity > ai_specificity:
-                            chosen_result = rule_result
-                            method = 'hybrid_rules_high_specificity'
-                        elif ai_specificity > rule_specificity:
-                            chosen_result = ai_result
-                            method = 'hybrid_ai_high_specificity'
-                        else:
-                            # Em caso de empate, prioriza o com maior confiança
-                            chosen_result = rule_result if rule_result['confidence'] >= ai_result['confidence'] else ai_result
-                            method = 'hybrid_confidence_priority'
-                        
-                        learning_system.record_classification(filename, chosen_result['category'], chosen_result['confidence'], text_content)
-                        return {
-                            'category': chosen_result['category'],
-                            'category_name': chosen_result['category_name'],
-                            'method': method,
-                            'confidence': chosen_result['confidence']
-                        }
-                
-                # IA retornou "outros" mas regras foram específicas
-                if ai_result['category'] == 'outros' and rule_result['confidence'] >= confidence_threshold:
-                    learning_system.record_classification(filename, rule_result['category'], rule_result['confidence'], text_content)
-                    return {
-                        'category': rule_result['category'],
-                        'category_name': rule_result['category_name'],
-                        'method': 'hybrid_rules_over_ai_outros',
-                        'confidence': rule_result['confidence']
-                    }
-                    
-            except Exception as e:
-                print(f"Erro na IA, mantendo classificação por regras: {str(e)}")
-        
-        # Validação com sistema aprendido
-        if learned_category and learned_category == rule_result['category'] and learned_confidence > 0.7:
-            final_confidence = min(0.92, (rule_result['confidence'] + learned_confidence) / 2 + 0.15)
-            learning_system.record_classification(filename, rule_result['category'], final_confidence, text_content)
-            return {
-                'category': rule_result['category'],
-                'category_name': rule_result['category_name'],
-                'method': 'hybrid_rules_learning_consensus',
-                'confidence': final_confidence
-            }
-        
-        # Usa regras com alta confiança
-        learning_system.record_classification(filename, rule_result['category'], rule_result['confidence'], text_content)
-        return {
-            'category': rule_result['category'],
-            'category_name': rule_result['category_name'],
-            'method': 'rules_high_confidence',
-            'confidence': rule_result['confidence']
-        }
-    
-    # 5. Se regras retornaram "outros", aplica IA com mais peso
-    if api_key:
-        try:
-            print(f"Regras incertas, aplicando IA para documento: {filename}")
-            ai_result = classify_with_ai(file_path, api_key, categories)
-            print(f"IA classificou como: {ai_result['category']} (confiança: {ai_result['confidence']})")
-            
-            # Se IA encontrou categoria específica, usa ela
-            if ai_result['category'] != 'outros' and ai_result['confidence'] >= 0.6:
-                # Verifica consenso com sistema aprendido
-                if learned_category and learned_category == ai_result['category'] and learned_confidence > 0.5:
-                    final_confidence = min(0.9, (ai_result['confidence'] + learned_confidence) / 2 + 0.1)
-                    learning_system.record_classification(filename, ai_result['category'], final_confidence, text_content)
-                    return {
-                        'category': ai_result['category'],
-                        'category_name': ai_result['category_name'],
-                        'method': 'hybrid_ai_learning_consensus',
-                        'confidence': final_confidence
-                    }
-                
-                # Usa IA
-                learning_system.record_classification(filename, ai_result['category'], ai_result['confidence'], text_content)
-                return {
-                    'category': ai_result['category'],
-                    'category_name': ai_result['category_name'],
-                    'method': 'ai_specific_category',
-                    'confidence': ai_result['confidence']
-                }
-            
-        except Exception as e:
-            print(f"Erro na IA: {str(e)}")
-    
-    # 6. Fallback: usa sistema aprendido se disponível
-    if learned_category and learned_confidence > 0.6:
-        learning_system.record_classification(filename, learned_category, learned_confidence, text_content)
-        return {
-            'category': learned_category,
-            'category_name': categories.get(learned_category, learned_category),
-            'method': 'learning_fallback',
-            'confidence': learned_confidence
-        }
-    
-    # 7. Último recurso: classificação por regras (mesmo que seja "outros")
-    learning_system.record_classification(filename, rule_result['category'], rule_result['confidence'], text_content)
-    return rule_result
-
-def classify_with_ai(file_path, api_key, categories):
-    """Função desabilitada - não usa mais IA"""
-    return {
-        'category': 'outros',
-        'category_name': 'Outros Documentos',
-        'method': 'disabled',
-        'confidence': 0.0
-    }
-    
-    # Lista de categorias disponíveis
-    categories_list = list(categories.keys())
-    categories_description = "\n".join([f"- {k}: {v}" for k, v in categories.items()])
-    
-    # Prepara o conteúdo para análise da IA com prompt melhorado
-    if text_content and len(text_content.strip()) >= 10:
-        document_info = f"Conteúdo do documento:\n{text_content[:2000]}"
-    else:
-        document_info = f"Nome do arquivo: {filename}\nConteúdo extraído: {text_content if text_content else 'Não foi possível extrair texto do documento'}"
-    
-    # Exemplos few-shot para melhorar precisão
-    few_shot_examples = """
-EXEMPLOS DE CLASSIFICAÇÃO:
-
-Exemplo 1:
-Conteúdo: "REGISTRO GERAL - RG Nº 12.345.678-9 NOME: João Silva FILIAÇÃO: Maria Silva e José Silva NATURALIDADE: São Paulo-SP SECRETARIA DE SEGURANÇA PÚBLICA"
-Categoria: rg
-
-Exemplo 2:
-Conteúdo: "CEMIG - Companhia Energética de Minas Gerais / Conta de Energia Elétrica / Consumo: 250 kWh / Valor: R$ 180,50 / Endereço: Rua das Flores, 123"
-Categoria: conta_luz
-
-Exemplo 3:
-Conteúdo: "BULLETIN DE SALAIRE / Employeur: ABC France SARL / Salarié: Pierre Dupont / Salaire brut: 2.500,00 EUR / Cotisations sociales: 450,00 EUR / Salaire net: 2.050,00 EUR"
-Categoria: bulletin_salaire
-
-Exemplo 4:
-Conteúdo: "TRIBUNAL ADMINISTRATIF / Requête en référé suspension / Demandeur: Madame Silva / Contre: Préfecture de Paris / Objet: Contestation refus titre de séjour"
-Categoria: refere_suspension
-
-Exemplo 5:
-Conteúdo: "ATTESTATION SUR L'HONNEUR / Je soussigné Monsieur Silva, atteste sur l'honneur héberger mon épouse Madame Silva à titre gratuit / Fait à Paris, le 15/01/2024"
-Categoria: attestation_honneur
-"""
-
-    response = client.chat.completions.create(
-        model="gpt-4o",  # Mudado para gpt-4o (mais preciso que mini)
-        messages=[
-            {
-                "role": "system",
-                "content": f"""Você é um especialista em classificação de documentos brasileiros e franceses com anos de experiência.
-
-CATEGORIAS DISPONÍVEIS:
-{categories_description}
-
-{few_shot_examples}
-
-PROCESSO DE ANÁLISE (Chain-of-Thought):
-1. Leia o conteúdo do documento cuidadosamente
-2. Identifique palavras-chave, números de registro, órgãos emissores
-3. Analise o contexto: é um documento de identidade? comprovante? documento jurídico?
-4. Compare com os exemplos fornecidos
-5. Se houver múltiplas possibilidades, escolha a MAIS ESPECÍFICA
-6. Apenas use 'outros' se realmente não se encaixar em nenhuma categoria
-
-REGRAS IMPORTANTES:
-- Documentos em francês com termos jurídicos (tribunal, préfecture, requête) → categorias jurídicas francesas
-- Contas com consumo em kWh → conta_luz
-- Contas com m³ de água → conta_agua
-- Bulletins de salaire (França) → bulletin_salaire
-- Attestations sur l'honneur → attestation_honneur
-- RG sempre tem "Registro Geral" ou número no formato XX.XXX.XXX-X
-- CPF tem formato XXX.XXX.XXX-XX
-
-Responda APENAS com a categoria (chave), sem explicações."""
-            },
-            {
-                "role": "user",
-                "content": f"Classifique este documento:\n\n{document_info}"
-            }
-        ],
-        max_tokens=50,
-        temperature=0.1  # Baixa temperatura mas não zero (permite alguma criatividade)
-    )
-    
-    category = response.choices[0].message.content.strip().lower()
-    
-    # Valida se a categoria retornada existe
-    if category not in categories:
-        category = 'outros'
-    
-    # Calcula confiança baseada na qualidade do conteúdo
-    confidence = 0.8  # Confiança padrão da IA
-    if text_content and len(text_content.strip()) >= 50:
-        confidence = 0.9  # Mais confiança com mais texto
-    elif not text_content or len(text_content.strip()) < 10:
-        confidence = 0.5  # Menos confiança sem texto
-    
-    return {
-        'category': category,
-        'category_name': categories[category],
-        'method': 'openai_api',
-        'confidence': confidence
-    }
-
-def classify_document(file_path, api_key, categories=None):
-    """Função principal de classificação - agora usa o sistema híbrido"""
-    return classify_document_hybrid(file_path, api_key, categories)
+        with open(os.path.join(session_folder, SESSION_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
+def save_session_manifest(session_folder, manifest):
+    """Salva o manifesto da sessão"""
+    with open(os.path.join(session_folder, SESSION_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
 
-def classify_with_openai_api(filename, text_content, api_key, categories):
-    """Função desabilitada - não usa mais OpenAI"""
-    return 'outros', 0.0
+def list_session_files(session_folder):
+    """Lista os documentos da sessão (ignora o manifesto e arquivos ocultos)"""
+    return [f for f in os.listdir(session_folder)
+            if not f.startswith('.') and os.path.isfile(os.path.join(session_folder, f))]
 
 @app.route('/api/feedback', methods=['POST'])
 def submit_feedback():
@@ -1563,50 +201,6 @@ def get_performance_report():
         print(f"Erro ao gerar relatório: {e}")
         return jsonify({'error': f'Erro ao gerar relatório: {str(e)}'}), 500
 
-def extract_semantic_features(text_content):
-    """Extrai features semânticas do conteúdo para validação"""
-    features = {
-        'has_cpf': bool(re.search(r'\d{3}\.\d{3}\.\d{3}-\d{2}', text_content)),
-        'has_rg': bool(re.search(r'\d{1,2}\.\d{3}\.\d{3}-\d{1,2}', text_content)),
-        'has_cnpj': bool(re.search(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', text_content)),
-        'has_cep': bool(re.search(r'\d{5}-?\d{3}', text_content)),
-        'has_money': bool(re.search(r'R\$\s*\d+[,.]?\d*', text_content)),
-        'has_kwh': 'kwh' in text_content.lower(),
-        'has_m3': 'm³' in text_content.lower() or 'm3' in text_content.lower(),
-        'has_tribunal': 'tribunal' in text_content.lower(),
-        'has_attestation': 'attestation' in text_content.lower(),
-        'has_salaire': 'salaire' in text_content.lower() or 'bulletin' in text_content.lower(),
-        'language': 'french' if any(word in text_content.lower() for word in ['monsieur', 'madame', 'attestation', 'tribunal']) else 'portuguese'
-    }
-    return features
-
-def validate_classification_semantically(category, text_content):
-    """Valida se a classificação faz sentido semanticamente com o conteúdo"""
-    if not text_content or len(text_content) < 10:
-        return 0.5  # Confiança neutra sem conteúdo
-
-    features = extract_semantic_features(text_content)
-    text_lower = text_content.lower()
-
-    # Validações específicas por categoria
-    validations = {
-        'rg': features['has_rg'] or 'registro geral' in text_lower or 'identidade' in text_lower,
-        'cpf': features['has_cpf'] or 'cadastro de pessoa' in text_lower,
-        'conta_luz': features['has_kwh'] or 'energia' in text_lower or 'cemig' in text_lower,
-        'conta_agua': features['has_m3'] or 'saneamento' in text_lower or 'sabesp' in text_lower,
-        'bulletin_salaire': features['has_salaire'] and features['language'] == 'french',
-        'attestation_honneur': features['has_attestation'] and 'honneur' in text_lower,
-        'refere_suspension': features['has_tribunal'] and 'référé' in text_lower,
-        'extrato_bancario': 'saldo' in text_lower or 'extrato' in text_lower,
-        'nota_fiscal': features['has_cnpj'] or 'nota fiscal' in text_lower,
-    }
-
-    # Retorna confiança boost se validação passou
-    if category in validations:
-        return 1.3 if validations[category] else 0.6
-
-    return 1.0  # Confiança neutra para outras categorias
-
 # Função classify_offline_fallback removida daqui (duplicata)
 # A versão correta está na linha 480 com suporte a parâmetro text
 
@@ -1666,15 +260,19 @@ def upload_files():
     os.makedirs(session_folder, exist_ok=True)
     
     uploaded_files = []
+    manifest = load_session_manifest(session_folder)
     for file in files:
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
             filepath = os.path.join(session_folder, filename)
-            file.save(filepath)
+            # Grava e calcula o hash em um único passo (usado por todo o pipeline)
+            file_hash, file_size = save_upload_with_hash(file, filepath)
+            manifest[filename] = {'hash': file_hash, 'size': file_size}
             uploaded_files.append({
                 'name': filename,
                 'path': filepath
             })
+    save_session_manifest(session_folder, manifest)
     
     return jsonify({
         'session_id': session_id,
@@ -1682,119 +280,258 @@ def upload_files():
         'count': len(uploaded_files)
     })
 
-def process_single_file(filename, file_path, api_key, categories, use_offline_mode):
-    """Processa um único arquivo (para uso em threads)"""
-    try:
-        text_content = extract_text_from_file(file_path)
+def compute_ocr_pool_size():
+    """Calcula o número de workers do pool a partir das CPUs e do orçamento de memória
 
-        if use_offline_mode:
-            classification = classify_offline_fallback(file_path, categories, text_content)
-        else:
-            classification = classify_document(file_path, api_key, categories)
-
-        ocr_confidence = min(1.0, len(text_content) / 500) if text_content else 0.0
-
-        suggested_filename = filename
-        if classification['category'] == 'bulletin_salaire':
-            mes, ano = extract_month_year_from_bulletin(text_content)
-            if mes and ano:
-                meses_nome = {
-                    '01': 'Janvier', '02': 'Février', '03': 'Mars', '04': 'Avril',
-                    '05': 'Mai', '06': 'Juin', '07': 'Juillet', '08': 'Août',
-                    '09': 'Septembre', '10': 'Octobre', '11': 'Novembre', '12': 'Décembre'
-                }
-                mes_nome = meses_nome.get(mes, mes)
-                suggested_filename = f"Bulletin_de_salaire_{mes_nome}_{ano}.pdf"
-
-        return {
-            'filename': filename,
-            'suggested_filename': suggested_filename,
-            'category': classification['category'],
-            'category_name': classification['category_name'],
-            'confidence': classification.get('confidence', 0.0),
-            'method': classification.get('method', 'unknown'),
-            'ocr_confidence': round(ocr_confidence, 2),
-            'used_ai': 'ai' in classification.get('method', '').lower() or 'openai' in classification.get('method', '').lower()
-        }
-    except Exception as e:
-        print(f"[BATCH] Erro ao processar {filename}: {str(e)}")
-        return {
-            'filename': filename,
-            'category': 'outros',
-            'category_name': categories.get('outros', 'Outros Documentos'),
-            'error': str(e)
-        }
-
-def process_documents_async(session_id, api_key, categories, use_offline_mode):
-    """Processa documentos em background thread COM PROCESSAMENTO EM LOTES"""
-    try:
-        session_folder = os.path.join(UPLOAD_FOLDER, session_id)
-        files = [f for f in os.listdir(session_folder) if os.path.isfile(os.path.join(session_folder, f))]
-        total_files = len(files)
-
-        print(f"[BATCH] 🚀 Iniciando processamento de {total_files} arquivos em lotes de {BATCH_SIZE}")
-        results = []
+    A memória por worker é o maior pico de RSS medido nos workers (devolvido
+    a cada tarefa por ocr_worker); até a primeira medição vale a estimativa
+    OCR_WORKER_MEMORY_MB.
+    """
+    if os.environ.get('OCR_POOL_WORKERS'):
+        return max(1, int(os.environ['OCR_POOL_WORKERS']))
+    cpu_count = os.cpu_count() or 1
+    worker_mb = worker_peak_rss_mb or OCR_WORKER_MEMORY_MB
+    by_memory = max(1, int(OCR_MEMORY_BUDGET_MB // max(1, worker_mb)))
+    return max(1, min(cpu_count, by_memory))
+
+def record_worker_rss(peak_mb):
+    """Registra o pico de RSS (MB) devolvido por uma tarefa do pool (None no pool de threads)"""
+    global worker_peak_rss_mb
+    if peak_mb:
+        with ocr_executor_lock:
+            worker_peak_rss_mb = max(worker_peak_rss_mb, peak_mb)
+
+def get_ocr_executor():
+    """Retorna o pool de processos compartilhado (criado sob demanda)
+
+    Usa 'spawn'/'forkserver' em vez de fork (o processo do gunicorn tem threads);
+    com forkserver o servidor pré-carrega ocr_worker e cada worker já nasce com
+    o pipeline importado. Se o pico de RSS medido não couber mais no orçamento,
+    o pool é recriado menor quando nenhuma sessão o estiver usando.
+    Se não for possível criar processos, cai para um pool de threads.
+    Cada chamada deve ter um release_ocr_executor(executor) correspondente.
+    """
+    global ocr_executor, ocr_executor_size, ocr_executor_sessions
+    with ocr_executor_lock:
+        pool_size = compute_ocr_pool_size()
+        if ocr_executor is not None and ocr_executor_sessions == 0 and pool_size < ocr_executor_size:
+            print(f"[POOL] Pico de RSS dos workers: {worker_peak_rss_mb:.0f}MB - "
+                  f"pool reduzido de {ocr_executor_size} para {pool_size} worker(s)")
+            ocr_executor.shutdown(wait=False)
+            ocr_executor = None
+        if ocr_executor is None:
+            document_pipeline.set_ocr_pool_size(pool_size)
+            try:
+                start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                mp_context = multiprocessing.get_context(start_method)
+                if start_method == 'forkserver':
+                    mp_context.set_forkserver_preload(['ocr_worker'])
+                ocr_executor = ProcessPoolExecutor(
+                    max_workers=pool_size,
+                    mp_context=mp_context,
+                    max_tasks_per_child=OCR_WORKER_MAX_TASKS,
+                    initializer=ocr_worker.init_worker,
+                    initargs=(pool_size,)
+                )
+                print(f"[POOL] Pool de processos criado: {pool_size} worker(s) ({start_method})")
+            except Exception as e:
+                print(f"[POOL] Pool de processos indisponível ({e}), usando threads")
+                ocr_executor = ThreadPoolExecutor(max_workers=pool_size)
+            ocr_executor_size = pool_size
+            ocr_executor_sessions = 0
+        ocr_executor_sessions += 1
+        return ocr_executor
 
-        # Processa arquivos em lotes para economizar memória
-        for batch_start in range(0, total_files, BATCH_SIZE):
-            batch_end = min(batch_start + BATCH_SIZE, total_files)
-            batch_files = files[batch_start:batch_end]
+def release_ocr_executor(executor):
+    """Sinaliza que uma sessão terminou de usar o pool obtido em get_ocr_executor
 
-            print(f"[BATCH] 📦 Lote {batch_start//BATCH_SIZE + 1}/{(total_files + BATCH_SIZE - 1)//BATCH_SIZE}: processando arquivos {batch_start+1}-{batch_end}")
+    Pools já descartados por reset_ocr_executor não contam mais sessões.
+    """
+    global ocr_executor_sessions
+    with ocr_executor_lock:
+        if executor is ocr_executor:
+            ocr_executor_sessions = max(0, ocr_executor_sessions - 1)
 
-            # Processa lote com threads limitadas
-            batch_results = []
-            threads = []
+def reset_ocr_executor(executor):
+    """Descarta o pool usado pela sessão (ex.: após um worker morrer); o próximo uso recria
 
-            for filename in batch_files:
-                file_path = os.path.join(session_folder, filename)
+    Só descarta se ainda for o pool atual (outra sessão pode já ter recriado) e
+    não cancela tarefas: as de outras sessões terminam ou falham no próprio pool.
+    O contador de sessões recomeça com o novo pool.
+    """
+    global ocr_executor, ocr_executor_sessions
+    with ocr_executor_lock:
+        if executor is not None and executor is ocr_executor:
+            ocr_executor.shutdown(wait=False)
+            ocr_executor = None
+            ocr_executor_sessions = 0
+
+def record_ocr_metrics(result):
+    """Agrega no processo principal as métricas de OCR devolvidas pelos workers"""
+    with ocr_metrics_lock:
+        ocr_metrics['documents'] += 1
+        ocr_metrics['lowres_pages'] += result.get('ocr_resolutions', []).count('low')
+        ocr_metrics['escalations'] += result.get('ocr_escalations', 0)
+        ocr_metrics['seconds_saved'] += result.get('ocr_seconds_saved', 0.0)
+
+def record_batch_metrics(batch_stats):
+    """Agrega as estatísticas de uma janela de OCR em lote (documentos chegam depois com cache HIT)"""
+    with ocr_metrics_lock:
+        ocr_metrics['batch_images'] += batch_stats['images']
+        ocr_metrics['batch_runs'] += batch_stats['runs']
 
-                # Limita threads simultâneas
-                while len([t for t in threads if t.is_alive()]) >= MAX_CONCURRENT_THREADS:
-                    time.sleep(0.1)
+def process_documents_async(session_id, api_key, categories, use_offline_mode):
+    """Processa documentos em background no pool de processos
+
+    Os documentos fluem pelo pool sem barreiras por lote; o progresso é
+    atualizado a cada documento concluído. Com o backend pytesseract, os
+    uploads de imagem passam antes por OCR em lote (janelas de
+    OCR_BATCH_WINDOW) e cada janela é classificada assim que o lote termina.
+    Sessões com BATCH_CLASSIFIER_MIN_FILES arquivos ou mais só extraem o texto
+    no pool e são classificadas de uma vez pelo BatchClassifier no final.
+    """
+    executor = None
+    try:
+        session_folder = os.path.join(UPLOAD_FOLDER, session_id)
+        files = list_session_files(session_folder)
+        manifest = load_session_manifest(session_folder)
+        total_files = len(files)
 
-                # Processa arquivo em thread
-                result_container = []
-                thread = threading.Thread(
-                    target=lambda: result_container.append(
-                        process_single_file(filename, file_path, api_key, categories, use_offline_mode)
-                    )
-                )
-                thread.result_container = result_container
-                thread.start()
-                threads.append(thread)
+        executor = get_ocr_executor()
+        defer_classification = BATCH_CLASSIFIER and total_files >= BATCH_CLASSIFIER_MIN_FILES
+        print(f"[BATCH] 🚀 Iniciando processamento de {total_files} arquivos no pool"
+              f"{' (classificação em lote)' if defer_classification else ''}")
 
-            # Aguarda todos os arquivos do lote
-            for thread in threads:
-                thread.join()
-                if thread.result_container:
-                    batch_results.append(thread.result_container[0])
+        def document_args(filename):
+            return os.path.join(session_folder, filename), manifest.get(filename, {}).get('hash')
 
-            # Adiciona resultados do lote
-            results.extend(batch_results)
+        def error_result(filename, error):
+            return {
+                'filename': filename,
+                'category': 'outros',
+                'category_name': categories.get('outros', 'Outros Documentos'),
+                'error': str(error)
+            }
 
-            # Atualiza progresso
+        futures = {}  # future do documento → (index, filename)
+        batch_windows = {}  # future do lote → [(index, filename)]
+
+        def submit_document(index, filename, batch_document=None):
+            file_path, file_hash = document_args(filename)
+            future = executor.submit(ocr_worker.process_document, filename, file_path, api_key,
+                                     categories, use_offline_mode, file_hash, defer_classification,
+                                     batch_document)
+            futures[future] = (index, filename)
+            return future
+
+        use_batch = OCR_BATCH and get_ocr_backend().name == 'pytesseract'
+        image_files = [(index, filename) for index, filename in enumerate(files)
+                       if use_batch and os.path.splitext(filename)[1].lower() in ['.jpg', '.jpeg', '.png']]
+        # Janelas menores quando há poucas imagens, para ocupar todos os workers do pool
+        window_size = max(1, min(OCR_BATCH_WINDOW, -(-len(image_files) // compute_ocr_pool_size())))
+        for start in range(0, len(image_files), window_size):
+            window = image_files[start:start + window_size]
+            future = executor.submit(ocr_worker.ocr_window, [document_args(filename) for _, filename in window])
+            batch_windows[future] = window
+
+        batched = {index for index, _ in image_files}
+        for index, filename in enumerate(files):
+            if index not in batched:
+                submit_document(index, filename)
+
+        results_by_index = {}
+        deferred_by_index = {}  # Texto extraído, aguardando a classificação em lote
+        pool_broken = False
+
+        def update_progress():
+            # Resultados na ordem original dos arquivos
+            results = [results_by_index[i] for i in sorted(results_by_index)]
             with jobs_lock:
-                processing_jobs[session_id]['progress'] = len(results)
+                # progress: OCR concluído (inclui os adiados); classified: já com categoria
+                processing_jobs[session_id]['progress'] = len(results) + len(deferred_by_index)
+                processing_jobs[session_id]['classified'] = len(results)
                 processing_jobs[session_id]['results'] = results
+            return results
+
+        pending = set(futures) | set(batch_windows)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in batch_windows:
+                    # Lote concluído: classifica os documentos da janela (cache HIT)
+                    window = batch_windows.pop(future)
+                    batch_documents = {}
+                    try:
+                        batch_stats, peak_mb = future.result()
+                        record_worker_rss(peak_mb)
+                        record_batch_metrics(batch_stats)
+                        batch_documents = batch_stats['documents']
+                    except Exception as e:
+                        # Sem lote, cada documento faz o próprio OCR
+                        print(f"[BATCH] Erro no OCR em lote: {str(e)}")
+                        pool_broken = pool_broken or isinstance(e, BrokenProcessPool)
+                    for index, filename in window:
+                        try:
+                            # Triagem e estatísticas de OCR do lote seguem com o documento
+                            batch_document = batch_documents.get(document_args(filename)[0])
+                            pending.add(submit_document(index, filename, batch_document))
+                        except Exception as e:
+                            print(f"[BATCH] Erro ao enviar {filename}: {str(e)}")
+                            pool_broken = True
+                            results_by_index[index] = error_result(filename, e)
+                            update_progress()
+                    continue
+
+                index, filename = futures[future]
+                try:
+                    result, peak_mb = future.result()
+                    record_worker_rss(peak_mb)
+                except Exception as e:
+                    print(f"[BATCH] Erro ao processar {filename}: {str(e)}")
+                    pool_broken = pool_broken or isinstance(e, BrokenProcessPool)
+                    result = error_result(filename, e)
+                if result.get('deferred'):
+                    deferred_by_index[index] = result
+                else:
+                    results_by_index[index] = result
+                    record_ocr_metrics(result)
 
-            print(f"[BATCH] ✓ Lote concluído: {len(results)}/{total_files} arquivos processados")
+                # Atualiza progresso a cada documento
+                update_progress()
+                print(f"[BATCH] ✓ {len(results_by_index) + len(deferred_by_index)}/{total_files}: {filename}")
 
-            # Libera memória entre lotes
-            gc.collect()
-            time.sleep(0.5)  # Pequena pausa entre lotes
+        if pool_broken:
+            reset_ocr_executor(executor)
+
+        if deferred_by_index:
+            # OCR da sessão concluído: classifica todos os documentos adiados de uma vez
+            indexes = sorted(deferred_by_index)
+            try:
+                batch_results = classify_deferred_batch([deferred_by_index[i] for i in indexes],
+                                                        categories, use_offline_mode)
+            except Exception as e:
+                print(f"[BATCH] Erro na classificação em lote: {str(e)}")
+                batch_results = [error_result(deferred_by_index[i]['filename'], e) for i in indexes]
+            for index, result in zip(indexes, batch_results):
+                results_by_index[index] = result
+                record_ocr_metrics(result)
+            deferred_by_index.clear()
+            update_progress()
 
         # Marca como completo
         with jobs_lock:
             processing_jobs[session_id]['status'] = 'completed'
 
-        print(f"[BATCH] 🎉 Classificação concluída! {len(results)} arquivos processados em lotes.")
+        print(f"[BATCH] 🎉 Classificação concluída! {len(results_by_index)} arquivos processados.")
 
     except Exception as e:
         print(f"[BATCH] ❌ Erro na classificação: {str(e)}")
         with jobs_lock:
             processing_jobs[session_id]['status'] = 'error'
             processing_jobs[session_id]['error'] = str(e)
+    finally:
+        if executor is not None:
+            release_ocr_executor(executor)
 
 @app.route('/api/classify', methods=['POST'])
 def classify_documents():
@@ -1836,7 +573,7 @@ def classify_documents():
         #         use_offline_mode = False
 
         # CRÍTICO: Inicializa job ANTES de iniciar thread (evita race condition)
-        files = [f for f in os.listdir(session_folder) if os.path.isfile(os.path.join(session_folder, f))]
+        files = list_session_files(session_folder)
 
         print(f"[CLASSIFY] Session {session_id}: {len(files)} arquivos encontrados")
 
@@ -1844,6 +581,7 @@ def classify_documents():
             processing_jobs[session_id] = {
                 'status': 'processing',
                 'progress': 0,
+                'classified': 0,
                 'total': len(files),
                 'results': [],
                 'error': ''
@@ -1888,6 +626,7 @@ def get_classification_status(session_id):
         return jsonify({
             'status': job['status'],
             'progress': job['progress'],
+            'classified': job['classified'],
             'total': job['total'],
             'results': job['results'] if job['status'] == 'completed' else [],
             'error': job['error']
@@ -2009,14 +748,46 @@ def health_check():
         'version': '2.0.1-fixed',
         'commit': '39b4e6a',
         'ocr_enabled': True,
-        'duplicate_function_removed': True
+        'duplicate_function_removed': True,
+        'rules_version': get_rules().version
     })
 
+@app.route('/api/ocr/metrics', methods=['GET'])
+def get_ocr_metrics():
+    """Métricas do OCR em dois níveis (taxa de escalonamento e tempo economizado)
+
+    Os contadores ficam em memória no processo do gunicorn que atende a
+    requisição: cada processo tem os seus e eles voltam a zero a cada
+    reinício (inclusive pelo --max-requests).
+    """
+    with ocr_metrics_lock:
+        metrics = dict(ocr_metrics)
+
+    lowres_attempts = metrics['lowres_pages'] + metrics['escalations']
+    metrics['escalation_rate'] = round(metrics['escalations'] / lowres_attempts, 3) if lowres_attempts else 0.0
+    metrics['seconds_saved'] = round(metrics['seconds_saved'], 2)
+    metrics['multires_enabled'] = MULTIRES_OCR
+    metrics['thresholds'] = {
+        'lowres_scale': OCR_LOWRES_SCALE,
+        'min_confidence': OCR_ESCALATION_MIN_CONF,
+        'min_chars': OCR_ESCALATION_MIN_CHARS
+    }
+    return jsonify(metrics)
+
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
-    """Retorna as categorias atuais"""
+    """Retorna as categorias atuais (e as regras ativas com ?rules=1)"""
     categories = load_categories()
-    return jsonify({'categories': categories})
+    rules = get_rules()
+    response = {'categories': categories, 'rules_version': rules.version}
+    if request.args.get('rules', '').lower() in ['true', '1', 'yes']:
+        try:
+            _, response['rules'] = read_categories_file()
+        except (FileNotFoundError, json.JSONDecodeError):
+            response['rules'] = None
+        if response['rules'] is None:
+            response['rules'] = builtin_rules()  # Arquivo sem regras: valem as embutidas
+    return jsonify(response)
 
 @app.route('/api/categories', methods=['POST'])
 def save_categories_endpoint():
@@ -2026,6 +797,7 @@ def save_categories_endpoint():
         data = request.get_json()
         print(f"Dados recebidos: {data}")
         categories = data.get('categories')
+        rules_spec = data.get('rules')
         print(f"Categorias extraídas: {categories}")
         
         if not categories:
@@ -2035,14 +807,28 @@ def save_categories_endpoint():
         # Garante que a categoria 'outros' sempre existe
         if 'outros' not in categories:
             categories['outros'] = 'Outros Documentos'
+
+        # Regras novas são compiladas ANTES de gravar (regra inválida não chega ao arquivo)
+        new_rules = None
+        if rules_spec is not None:
+            try:
+                new_rules = compile_rules(rules_spec, source='api')
+            except ValueError as e:
+                print(f"ERRO: Regras inválidas: {e}")
+                return jsonify({'error': f'Regras inválidas: {e}'}), 400
         
         print("Chamando função save_categories...")
-        success = save_categories(categories)
+        success = save_categories(categories, rules_spec)
         print(f"Resultado do salvamento: {success}")
         
         if success:
             print("Categorias salvas com sucesso!")
-            return jsonify({'message': 'Categorias salvas com sucesso', 'categories': categories})
+            # Vale a partir do próximo documento neste worker; os demais detectam a
+            # mudança do arquivo (mtime) na próxima classificação
+            if new_rules is not None:
+                activate_rules(new_rules)
+            return jsonify({'message': 'Categorias salvas com sucesso', 'categories': categories,
+                            'rules_version': get_rules().version})
         else:
             print("ERRO: Falha ao salvar categorias")
             return jsonify({'error': 'Erro ao salvar categorias'}), 500
@@ -2065,7 +851,7 @@ def separate_documents():
         # Salva o arquivo temporariamente
         filename = secure_filename(file.filename)
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        file_hash, _ = save_upload_with_hash(file, file_path)
         
         file_extension = os.path.splitext(filename)[1].lower()
         separated_docs = []
@@ -2076,7 +862,7 @@ def separate_documents():
             
         elif file_extension in ['.jpg', '.jpeg', '.png']:
             # Para imagens, extrai texto e tenta detectar múltiplos documentos
-            full_text = extract_text_from_file(file_path)
+            full_text = extract_text_from_file(file_path, file_hash)
             if full_text:
                 boundaries = detect_document_boundaries(full_text)
                 
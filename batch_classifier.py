@@ -0,0 +1,320 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# scipy é opcional e fica fora do requirements.txt: com os ~550 padrões das regras, a matriz
+# densa de uma sessão de 1000 documentos ocupa ~4MB; o CSR só economiza em sessões enormes
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+from classification_rules import get_rules
+
+# Score mínimo (cosseno com o perfil da categoria) para o modelo aprendido decidir
+# um documento que as regras deixaram em "outros"
+BATCH_LEARNED_MIN_SCORE = float(os.environ.get('BATCH_LEARNED_MIN_SCORE', 0.6))
+# Peso mínimo de exemplos com feedback para a categoria poder ser sugerida
+BATCH_LEARNED_MIN_SUPPORT = float(os.environ.get('BATCH_LEARNED_MIN_SUPPORT', 2.0))
+# Exemplos mais recentes lidos de cada tabela do aprendizado
+BATCH_HISTORY_LIMIT = int(os.environ.get('BATCH_HISTORY_LIMIT', 2000))
+BATCH_TOP_SCORES = 3  # Categorias reportadas por documento
+
+RULE_SEED_WEIGHT = 1.0  # Peso de cada regra no perfil inicial da categoria
+FEEDBACK_WEIGHT = 1.0  # Peso de uma correção ou feedback do usuário
+
+BatchDecision = namedtuple('BatchDecision', [
+    'category', 'confidence', 'method',  # Resultado das regras offline (nome → conteúdo → outros)
+    'strong_category', 'strong_confidence',  # Padrões aprimorados (None, 0.0 se nenhum)
+    'learned_category', 'learned_score',  # Sugestão do modelo aprendido (None, 0.0 se nenhuma)
+    'scores', 'keyword_matches',
+])
+
+
+def indicator_matrix(rows, n_columns):
+    """Matriz documentos × vocabulário com 1 onde o padrão ocorre
+
+    rows: lista de índices de colunas por documento. CSR com scipy, densa sem.
+    """
+    if sparse is not None:
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(columns) for columns in rows])
+        indices = np.fromiter((column for columns in rows for column in columns), dtype=np.int32,
+                              count=int(indptr[-1]))
+        data = np.ones(len(indices), dtype=np.float32)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), n_columns))
+
+    matrix = np.zeros((len(rows), n_columns), dtype=np.float32)
+    for row, columns in enumerate(rows):
+        matrix[row, list(columns)] = 1.0
+    return matrix
+
+
+def membership_matrix(vocabulary, groups):
+    """Matriz vocabulário × grupos com 1 onde o padrão pertence ao grupo (regra)"""
+    matrix = np.zeros((len(vocabulary), len(groups)), dtype=np.float32)
+    for column, patterns in enumerate(groups):
+        for pattern in patterns:
+            matrix[vocabulary[pattern], column] = 1.0
+    return matrix
+
+
+def first_true(mask):
+    """Índice da primeira coluna verdadeira de cada linha e se alguma é verdadeira"""
+    return mask.argmax(axis=1), mask.any(axis=1)
+
+
+def load_feedback_examples(db_path, limit=BATCH_HISTORY_LIMIT):
+    """Exemplos rotulados do aprendizado: lista de (texto, categoria, peso)
+
+    classification_history com correção: +1 para a categoria corrigida e -1
+    para a original errada. user_feedback (like/dislike): ±1 para a categoria
+    avaliada, com o texto da classificação mais recente do arquivo.
+    Classificações sem feedback não entram (só repetiriam as regras).
+    """
+    if not db_path or not os.path.exists(db_path):
+        return []
+
+    examples = []
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT text_content, original_classification, corrected_classification
+            FROM classification_history
+            WHERE feedback_provided AND corrected_classification IS NOT NULL
+                  AND text_content IS NOT NULL AND text_content != ''
+            ORDER BY id DESC LIMIT ?
+        ''', (limit,))
+        for text_content, original, corrected in cursor.fetchall():
+            examples.append((text_content, corrected, FEEDBACK_WEIGHT))
+            if original != corrected:
+                examples.append((text_content, original, -FEEDBACK_WEIGHT))
+
+        cursor.execute('''
+            SELECT f.category, f.is_positive, h.text_content
+            FROM user_feedback f
+            JOIN classification_history h ON h.id = (
+                SELECT MAX(id) FROM classification_history
+                WHERE filename = f.filename AND text_content IS NOT NULL AND text_content != ''
+            )
+            ORDER BY f.id DESC LIMIT ?
+        ''', (limit,))
+        for category, is_positive, text_content in cursor.fetchall():
+            examples.append((text_content, category, FEEDBACK_WEIGHT if is_positive else -FEEDBACK_WEIGHT))
+    except sqlite3.Error as e:
+        print(f"[LOTE] Histórico de aprendizado indisponível ({e}), usando só as regras")
+        examples = []
+    finally:
+        conn.close()
+
+    return [example for example in examples if example[1] != 'outros']
+
+
+def feedback_signature(db_path):
+    """Assinatura das tabelas de feedback (muda quando há correção ou like/dislike novo)"""
+    if not db_path or not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        corrected = conn.execute(
+            'SELECT COUNT(*), MAX(id) FROM classification_history WHERE feedback_provided').fetchone()
+        feedback = conn.execute('SELECT COUNT(*), MAX(id) FROM user_feedback').fetchone()
+        return corrected + feedback
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+class BatchClassifier:
+    """Classificador vetorizado para uma sessão inteira de documentos
+
+    Cada documento vira uma linha de uma matriz documentos × padrões (as
+    palavras-chave do RuleSet, encontradas por uma passada do autômato) e as
+    regras viram matrizes padrões × regras: um produto de matrizes conta as
+    frases de todas as regras de todos os documentos de uma vez. As decisões
+    seguem a mesma semântica da classificação por documento (prioridade,
+    mínimo de frases, termos de exclusão, confiança da regra).
+
+    Além das regras, cada categoria tem um perfil (vetor sobre os padrões)
+    semeado pelas frases das regras e refinado pelos exemplos com feedback do
+    aprendizado; o cosseno entre documento e perfis dá o score de todas as
+    categorias num único produto e decide os documentos que as regras deixam
+    em "outros".
+    """
+
+    def __init__(self, rules=None, examples=()):
+        if rules is None:
+            rules = get_rules()
+        self.rules = rules
+        self.vocabulary = {pattern: index for index, pattern in enumerate(sorted(rules.automaton.patterns))}
+
+        self.filename_members = membership_matrix(self.vocabulary, [rule.keywords for rule in rules.filename_rules])
+
+        content = rules.content_rules
+        self.content_members = membership_matrix(self.vocabulary, [rule.phrases for rule in content])
+        self.content_exclude = membership_matrix(self.vocabulary, [rule.exclude for rule in content])
+        self.content_min = np.array([rule.min_matches for rule in content], dtype=np.float64)
+        self.content_base = np.array([rule.base for rule in content], dtype=np.float64)
+        self.content_per_match = np.array([rule.per_match for rule in content], dtype=np.float64)
+        self.content_max = np.array([rule.max_confidence for rule in content], dtype=np.float64)
+
+        enhanced = rules.enhanced_rules
+        self.enhanced_members = membership_matrix(self.vocabulary, [rule.phrases for rule in enhanced])
+        self.enhanced_min = np.array([rule.min_matches for rule in enhanced], dtype=np.float64)
+        self.enhanced_base = np.array([rule.base for rule in enhanced], dtype=np.float64)
+        self.enhanced_per_match = np.array([rule.per_match for rule in enhanced], dtype=np.float64)
+        self.enhanced_max = np.array([rule.max_confidence for rule in enhanced], dtype=np.float64)
+
+        self._build_profiles(examples)
+
+    def _build_profiles(self, examples):
+        """Perfis das categorias: frases das regras + exemplos com feedback"""
+        categories = []
+        for rule in self.rules.content_rules + self.rules.enhanced_rules:
+            if rule.category not in categories:
+                categories.append(rule.category)
+        for _, category, _ in examples:
+            if category not in categories:
+                categories.append(category)
+        self.categories = categories
+        column = {category: index for index, category in enumerate(categories)}
+
+        profiles = np.zeros((len(self.vocabulary), len(categories)), dtype=np.float32)
+        for rule in self.rules.content_rules + self.rules.enhanced_rules:
+            for phrase in rule.phrases:
+                profiles[self.vocabulary[phrase], column[rule.category]] += RULE_SEED_WEIGHT
+
+        self.support = np.zeros(len(categories), dtype=np.float64)
+        if examples:
+            # Exemplos × categorias com o peso (±) de cada rótulo; Xᵀ·Y soma os vetores por categoria
+            labels = np.zeros((len(examples), len(categories)), dtype=np.float32)
+            for row, (_, category, weight) in enumerate(examples):
+                labels[row, column[category]] = weight
+                if weight > 0:
+                    self.support[column[category]] += weight
+            documents = indicator_matrix(self.match_rows([text.lower() for text, _, _ in examples]),
+                                         len(self.vocabulary))
+            profiles += np.asarray(documents.T @ labels)
+
+        # Feedback negativo só remove peso; normaliza as colunas para o cosseno
+        np.maximum(profiles, 0.0, out=profiles)
+        norms = np.linalg.norm(profiles, axis=0)
+        norms[norms == 0] = 1.0
+        self.profiles = profiles / norms
+        print(f"[LOTE] Modelo: {len(self.vocabulary)} padrões × {len(categories)} categorias, "
+              f"{len(examples)} exemplos de feedback ({'esparso' if sparse is not None else 'denso'})")
+
+    def match_rows(self, texts_lower):
+        """Índices do vocabulário presentes em cada texto (uma passada do autômato por texto)"""
+        find_all, vocabulary = self.rules.automaton.find_all, self.vocabulary
+        return [sorted(vocabulary[pattern] for pattern in find_all(text)) for text in texts_lower]
+
+    def classify(self, documents, text_matches=None):
+        """Classifica uma lista de (filename, texto) de uma vez; retorna um BatchDecision por documento
+
+        text_matches: casamentos do autômato já calculados por documento (opcional)
+        """
+        if not documents:
+            return []
+
+        vocabulary = self.vocabulary
+        if text_matches is None:
+            text_matches = [self.rules.automaton.find_all((text or "").lower()) for _, text in documents]
+        filename_matches = [self.rules.automaton.find_all(filename.lower()) for filename, _ in documents]
+
+        text_rows = [sorted(vocabulary[pattern] for pattern in matches) for matches in text_matches]
+        filename_rows = [sorted(vocabulary[pattern] for pattern in matches) for matches in filename_matches]
+        union_rows = [sorted(set(text) | set(name)) for text, name in zip(text_rows, filename_rows)]
+
+        n_patterns = len(vocabulary)
+        text_matrix = indicator_matrix(text_rows, n_patterns)
+        filename_matrix = indicator_matrix(filename_rows, n_patterns)
+        union_matrix = indicator_matrix(union_rows, n_patterns)
+
+        # OTIMIZAÇÃO: um produto por tabela conta as frases de todas as regras em todos os documentos
+        n_content = self.content_members.shape[1]
+        content_product = np.asarray(text_matrix @ np.hstack([self.content_members, self.content_exclude,
+                                                              self.profiles]))
+        content_counts = content_product[:, :n_content]
+        excluded = content_product[:, n_content:2 * n_content] > 0
+        category_scores = content_product[:, 2 * n_content:]
+
+        filename_hits = np.asarray(filename_matrix @ self.filename_members) > 0
+        enhanced_counts = np.asarray(union_matrix @ self.enhanced_members).astype(np.float64)
+
+        # Regras de nome: a primeira que casar decide
+        filename_rule, filename_decided = first_true(filename_hits)
+
+        # Regras de conteúdo em ordem de prioridade: a primeira elegível decide
+        content_counts = np.rint(content_counts).astype(np.float64)
+        eligible = (content_counts >= self.content_min) & ~excluded
+        content_rule, content_decided = first_true(eligible)
+        content_confidence = np.minimum(self.content_max, self.content_base + content_counts * self.content_per_match)
+
+        # Padrões aprimorados: a maior confiança (a primeira em caso de empate)
+        enhanced_confidence = np.where(
+            enhanced_counts >= self.enhanced_min,
+            np.minimum(self.enhanced_max, self.enhanced_base + enhanced_counts * self.enhanced_per_match),
+            0.0)
+        strong_rule = enhanced_confidence.argmax(axis=1) if enhanced_confidence.shape[1] else None
+
+        # Cosseno documento × perfis (linhas binárias: norma = raiz do número de padrões)
+        row_norms = np.sqrt(np.array([len(rows) for rows in text_rows], dtype=np.float64))
+        row_norms[row_norms == 0] = 1.0
+        category_scores = category_scores / row_norms[:, None]
+        ranking = np.argsort(-category_scores, axis=1, kind='stable')[:, :BATCH_TOP_SCORES]
+        learnable = self.support >= BATCH_LEARNED_MIN_SUPPORT
+
+        decisions = []
+        for index in range(len(documents)):
+            if filename_decided[index]:
+                rule = self.rules.filename_rules[filename_rule[index]]
+                category, confidence, method = rule.category, rule.confidence, 'offline_filename'
+            elif content_decided[index]:
+                rule_index = content_rule[index]
+                rule = self.rules.content_rules[rule_index]
+                category, confidence, method = (rule.category, float(content_confidence[index, rule_index]),
+                                                rule.method)
+            else:
+                category, confidence, method = 'outros', 0.1, 'offline_fallback'
+
+            strong_category, strong_confidence = None, 0.0
+            if strong_rule is not None and enhanced_confidence[index, strong_rule[index]] > 0.0:
+                strong_category = self.rules.enhanced_rules[strong_rule[index]].category
+                strong_confidence = float(enhanced_confidence[index, strong_rule[index]])
+
+            scores = {self.categories[column]: round(float(category_scores[index, column]), 3)
+                      for column in ranking[index] if category_scores[index, column] > 0}
+
+            # Só sugere quando a categoria mais próxima tem exemplos de feedback suficientes
+            learned_category, learned_score = None, 0.0
+            if len(ranking[index]):
+                top = ranking[index][0]
+                if learnable[top] and category_scores[index, top] >= BATCH_LEARNED_MIN_SCORE:
+                    learned_category = self.categories[top]
+                    learned_score = float(category_scores[index, top])
+
+            decisions.append(BatchDecision(category, confidence, method, strong_category, strong_confidence,
+                                           learned_category, learned_score, scores, text_matches[index]))
+        return decisions
+
+
+_classifier_cache = {'key': None, 'classifier': None}
+_classifier_lock = threading.Lock()
+
+
+def get_batch_classifier(rules=None, db_path=None):
+    """Classificador da versão atual das regras e do feedback (reconstruído só quando mudam)"""
+    if rules is None:
+        rules = get_rules()
+    key = (rules.version, feedback_signature(db_path))
+    with _classifier_lock:
+        if _classifier_cache['key'] != key:
+            _classifier_cache['classifier'] = BatchClassifier(rules, load_feedback_examples(db_path))
+            _classifier_cache['key'] = key
+        return _classifier_cache['classifier']
@@ -0,0 +1,636 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from keyword_automaton import KeywordAutomaton
+from semantic_features import FEATURE_PATTERNS
+
+# Regras da classificação offline. As tabelas abaixo são a fonte das regras
+# embutidas; o categories.json só as substitui quando tem a chave "rules"
+# (formato declarativo, ver builtin_rules), gravada pela API ou à mão. O arquivo
+# distribuído não traz regras, para não duplicar estas tabelas. As regras são
+# compiladas num RuleSet imutável, trocado atomicamente quando o arquivo muda.
+
+CATEGORIES_FILE = os.environ.get('CATEGORIES_FILE', 'categories.json')
+
+# Intervalo mínimo (s) entre verificações de mudança do arquivo de regras
+RULES_CHECK_INTERVAL = float(os.environ.get('RULES_CHECK_INTERVAL', 2.0))
+
+# Padrões expandidos e unificados para classificação por nome de arquivo
+FILENAME_PATTERNS = {
+    # Documentos de Identidade
+    'rg': ['rg', 'identidade', 'carteira_identidade', 'cedula'],
+    'cpf': ['cpf', 'cadastro_pessoa_fisica'],
+    'cnh': ['cnh', 'carteira_habilitacao', 'habilitacao'],
+    'passaporte': ['passaporte', 'passport'],
+
+    # Certidões
+    'certidao_nascimento': ['certidao', 'nascimento', 'birth'],
+    'certidao_casamento': ['certidao', 'casamento', 'marriage'],
+    'certidao_obito': ['certidao', 'obito', 'death'],
+    'certidao_antecedentes': ['certidao', 'antecedentes', 'criminal'],
+
+    # Documentos de Trabalho
+    'holerite': ['holerite', 'folha', 'pagamento', 'salario'],
+    'certificado_trabalho': ['certificado', 'trabalho', 'emprego'],
+    'comprovante_renda': ['comprovante', 'renda', 'rendimento'],
+    'declaracao_imposto': ['declaracao', 'imposto', 'renda', 'receita'],
+
+    # Documentos Escolares
+    'diploma': ['diploma', 'graduacao', 'formatura'],
+    'certificado_escolar': ['certificado', 'escolar', 'curso'],
+    'historico_escolar': ['historico', 'escolar', 'notas'],
+    'comprovante_matricula': ['comprovante', 'matricula', 'escola'],
+
+    # Documentos Médicos
+    'atestado_medico': ['atestado', 'medico', 'saude'],
+    'laudo_medico': ['laudo', 'medico', 'exame'],
+    'comprovante_vacinacao': ['comprovante', 'vacinacao', 'vacina'],
+    'cartao_vacinacao': ['cartao', 'vacinacao', 'vacina'],
+
+    # Documentos Bancários
+    'comprovante_bancario': ['comprovante', 'bancario', 'banco'],
+    'extrato_bancario': ['extrato', 'bancario', 'conta'],
+    'comprovante_transferencia': ['comprovante', 'transferencia', 'ted', 'doc'],
+    'comprovante_deposito': ['comprovante', 'deposito'],
+
+    # Comprovantes de Residência e Contas
+    'comprovante_residencia': ['comprovante', 'residencia', 'endereco'],
+    'conta_luz': ['conta', 'luz', 'energia', 'eletrica', 'cemig', 'copel', 'celpe'],
+    'conta_agua': ['conta', 'agua', 'saneamento', 'sabesp', 'cedae'],
+    'conta_gas': ['conta', 'gas', 'comgas', 'naturgy'],
+
+    # Comprovantes de Pagamento
+    'comprovante_pagamento': ['comprovante', 'pagamento'],
+    'recibo': ['recibo', 'pagamento'],
+    'nota_fiscal': ['nota', 'fiscal', 'nf', 'nfe'],
+    'boleto': ['boleto', 'cobranca'],
+    'comprovante_quitacao': ['comprovante', 'quitacao'],
+
+    # Documentos Legais
+    'autorizacao': ['autorizacao', 'permissao'],
+    'procuracao': ['procuracao', 'mandato', 'representacao'],
+    'declaracao': ['declaracao'],
+    'licenca': ['licenca', 'alvara'],
+    'alvara': ['alvara', 'funcionamento'],
+    'permissao': ['permissao'],
+
+    # Documentos Jurídicos
+    'contrato': ['contrato', 'acordo', 'contract', 'termo'],
+    'peticao': ['peticao', 'inicial', 'recurso', 'defesa'],
+    'sentenca': ['sentenca', 'decisao', 'julgamento', 'acordao'],
+
+    # Outros
+    'atestado': ['atestado'],
+    'certificado': ['certificado'],
+    'credencial': ['credencial'],
+    'carteirinha': ['carteirinha'],
+    'cartao': ['cartao'],
+    'comprovante_isencao': ['comprovante', 'isencao'],
+
+    # Documentos específicos para migração francesa
+    'titre_sejour': ['titre', 'sejour', 'residence'],
+    'visa_frances': ['visa', 'visto', 'schengen'],
+    'carte_resident': ['carte', 'resident', 'permanente'],
+    'attestation_hebergement': ['attestation', 'hebergement', 'logement'],
+    'justificatif_domicile': ['justificatif', 'domicile', 'residence'],
+    'bulletin_salaire': ['bulletin-de-salaire', 'bulletin_salaire', 'bulletin', 'salaire', 'paie', 'fiche-de-paie'],
+    'contrat_travail': ['contrat', 'travail', 'emploi'],
+    'attestation_employeur': ['attestation', 'employeur', 'travail'],
+    'avis_imposition': ['avis', 'imposition', 'impot'],
+    'certificat_scolarite': ['certificat', 'scolarite', 'etudiant'],
+    'diplome_francais': ['diplome', 'universite', 'formation'],
+    'acte_naissance_traduit': ['acte', 'naissance', 'traduit'],
+    'casier_judiciaire': ['casier', 'judiciaire', 'penal'],
+    'certificat_medical': ['certificat', 'medical', 'sante'],
+    'assurance_maladie': ['assurance', 'maladie', 'securite', 'sociale'],
+    'liste_documents': ['lista', 'documentos', 'regularizacao', 'regularisation'],
+
+    # Documentos jurídicos franceses específicos
+    'tableau_vie_commune': ['tableau', 'vie', 'commune', 'justificatifs', 'conjoint'],
+    'refere_suspension': ['refere', 'suspension', 'tribunal', 'administratif'],
+    'accuse_depot': ['accuse', 'depot', 'recommande', 'envoi'],
+    'accuse_reception': ['accuse', 'reception', 'requete', 'depot'],
+    'requete_tribunal': ['requete', 'tribunal', 'administratif', 'petition'],
+    'lettre_recommandee': ['lettre', 'recommandee', 'poste', 'envoi'],
+    'document_tribunal': ['tribunal', 'administratif', 'juridique', 'judiciaire'],
+    'procedure_administrative': ['procedure', 'administrative', 'demarche'],
+    'recours_administratif': ['recours', 'administratif', 'contestation'],
+
+    # Documentos específicos adicionais
+    'attestation_honneur': ['attestation', 'honneur', 'lhonneur', 'sur_lhonneur', 'epoux', 'requerante'],
+    'attestation_depot': ['attestation', 'depot', 'de_depot'],
+    'passeport': ['passeport', 'passport'],
+
+    'outros': []  # Removido padrões genéricos para evitar false positives
+}
+
+# Padrões de conteúdo (texto OCR em minúsculas)
+CONTENT_PATTERNS = {
+    'rg': [
+        'registro geral', 
+        'carteira de identidade', 
+        'secretaria de segurança pública',
+        'instituto de identificação',
+        'rg nº',
+        'carteira identidade',
+        'documento de identidade'
+    ],
+    'cpf': ['cadastro de pessoa física', 'receita federal do brasil', 'cpf nº', 'situação cadastral'],
+    'cnh': ['carteira nacional de habilitação', 'detran', 'categoria a', 'categoria b', 'categoria c', 'categoria d', 'categoria e'],
+    'passaporte': ['passaporte brasileiro', 'passport', 'ministério das relações exteriores', 'polícia federal'],
+    'certidao_nascimento': ['certidão de nascimento', 'registro civil das pessoas naturais', 'nasceu no dia', 'filho de'],
+    'certidao_casamento': ['certidão de casamento', 'registro civil das pessoas naturais', 'casaram-se', 'contraíram matrimônio'],
+    'certidao_obito': ['certidão de óbito', 'registro civil das pessoas naturais', 'faleceu', 'causa da morte'],
+    'holerite': ['demonstrativo de pagamento', 'folha de pagamento', 'salário base', 'desconto inss', 'salário líquido'],
+    'comprovante_bancario': ['comprovante de operação bancária', 'agência', 'conta corrente', 'saldo disponível'],
+    'extrato_bancario': ['extrato de conta corrente', 'movimentação bancária', 'saldo anterior', 'saldo atual'],
+    'nota_fiscal': ['nota fiscal eletrônica', 'cnpj', 'valor total da nota', 'icms', 'danfe'],
+    'atestado': ['atestado médico', 'cid-10', 'afastamento por', 'dias de repouso'],
+    'certificado': ['certificado de conclusão', 'carga horária', 'aprovado com', 'instituição de ensino'],
+    'diploma': ['diploma de graduação', 'universidade', 'bacharel em', 'licenciado em', 'tecnólogo em'],
+    'carta': ['prezado senhor', 'prezada senhora', 'atenciosamente', 'cordialmente', 'respeitosamente'],
+
+    # Padrões para documentos de migração francesa
+    'titre_sejour': [
+        'titre de séjour', 'carte de séjour', 'préfecture', 'ofii', 
+        'autorisation de séjour', 'récépissé de demande', 'renouvellement'
+    ],
+    'visa_frances': [
+        'visa', 'consulat de france', 'schengen', 'entrée en france',
+        'ambassade de france', 'visa de long séjour', 'vls-ts'
+    ],
+    'carte_resident': [
+        'carte de résident', 'résident permanent', 'carte de résident permanent',
+        'titre de séjour de 10 ans', 'résident de longue durée'
+    ],
+    'attestation_hebergement': [
+        'attestation d\'hébergement', 'héberge', 'domicile chez',
+        'certifie héberger', 'logement gratuit', 'hébergement à titre gratuit'
+    ],
+    'justificatif_domicile': [
+        'justificatif de domicile', 'facture edf', 'facture gdf', 'facture eau',
+        'quittance de loyer', 'taxe d\'habitation', 'facture téléphone'
+    ],
+    'bulletin_salaire': [
+        'bulletin de salaire', 'bulletin de paie', 'fiche de paie',
+        'salaire brut', 'salaire net', 'cotisations sociales', 'urssaf',
+        'période :', 'période:', 'employeur', 'salarié', 'net à payer'
+    ],
+    'contrat_travail': [
+        'contrat de travail', 'cdi', 'cdd', 'contrat à durée indéterminée',
+        'contrat à durée déterminée', 'employeur', 'salarié'
+    ],
+    'attestation_employeur': [
+        'attestation employeur', 'certificat de travail', 'attestation de salaire',
+        'emploi depuis', 'fonction occupée', 'rémunération mensuelle'
+    ],
+    'avis_imposition': [
+        'avis d\'imposition', 'impôt sur le revenu', 'revenu fiscal de référence',
+        'direction générale des finances publiques', 'dgfip', 'revenus déclarés'
+    ],
+    'certificat_scolarite': [
+        'certificat de scolarité', 'attestation de scolarité', 'étudiant inscrit',
+        'année scolaire', 'établissement scolaire', 'université'
+    ],
+    'diplome_francais': [
+        'diplôme', 'université', 'licence', 'master', 'doctorat',
+        'baccalauréat', 'bts', 'dut', 'académie', 'ministère de l\'éducation'
+    ],
+    'acte_naissance_traduit': [
+        'acte de naissance', 'traduction certifiée', 'traducteur assermenté',
+        'né le', 'lieu de naissance', 'état civil', 'extrait de naissance'
+    ],
+    'casier_judiciaire': [
+        'casier judiciaire', 'bulletin n°3', 'extrait de casier judiciaire',
+        'ministère de la justice', 'condamnations', 'vierge'
+    ],
+    'certificat_medical': [
+        'certificat médical', 'médecin', 'examen médical', 'aptitude physique',
+        'visite médicale', 'ofii médical', 'tuberculose'
+    ],
+    'assurance_maladie': [
+        'assurance maladie', 'sécurité sociale', 'carte vitale', 'cpam',
+        'attestation de droits', 'numéro de sécurité sociale', 'mutuelle'
+    ],
+    'liste_documents': [
+        'lista de documentos', 'liste des documents', 'regularização', 'regularisation',
+        'dossier de demande', 'pièces à fournir', 'documents requis', 'checklist'
+    ],
+
+    # Padrões para documentos jurídicos franceses específicos
+    'tableau_vie_commune': [
+        'tableau détaillé des justificatifs', 'justificatifs de vie commune',
+        'vie commune', 'conjoint', 'concubinage', 'pacs', 'mariage',
+        'madame', 'monsieur', 'et son conjoint', 'et sa conjointe'
+    ],
+    'refere_suspension': [
+        'référé suspension', 'tribunal administratif', 'requête en référé',
+        'suspension de l\'exécution', 'mesures d\'urgence', 'référé-suspension',
+        'tribunal administratif de', 'demande de suspension'
+    ],
+    'accuse_depot': [
+        'accusé de dépôt', 'envoi recommandé', 'lettre recommandée',
+        'la poste', 'dépôt d\'un envoi', 'recommandé avec accusé',
+        'numéro de suivi', 'preuve de dépôt'
+    ],
+    'accuse_reception': [
+        'accusé de réception', 'réception d\'un dépôt', 'dépôt de requête',
+        'comprovante de recebimento', 'requerimento apresentado',
+        'réception de la demande', 'enregistrement de la requête'
+    ],
+    'requete_tribunal': [
+        'requête', 'tribunal administratif', 'demande au tribunal',
+        'pétition', 'recours contentieux', 'contentieux administratif',
+        'juridiction administrative', 'instance administrative'
+    ],
+    'lettre_recommandee': [
+        'lettre recommandée', 'envoi recommandé', 'courrier recommandé',
+        'accusé de réception postal', 'la poste française',
+        'service postal', 'recommandé ar'
+    ],
+    'document_tribunal': [
+        'tribunal', 'juridiction', 'cour administrative', 'instance judiciaire',
+        'procédure judiciaire', 'acte judiciaire', 'décision de justice'
+    ],
+    'procedure_administrative': [
+        'procédure administrative', 'démarche administrative', 'formalité administrative',
+        'administration française', 'service public', 'démarche officielle'
+    ],
+    'recours_administratif': [
+        'recours administratif', 'contestation administrative', 'recours gracieux',
+        'recours hiérarchique', 'opposition administrative', 'révision administrative'
+    ],
+
+    # Documentos específicos adicionais
+    'attestation_honneur': [
+        'attestation sur l\'honneur', 'attestation d\'honneur', 'sur l\'honneur',
+        'je soussigné', 'atteste sur l\'honneur', 'certifie sur l\'honneur',
+        'déclare sur l\'honneur', 'époux', 'épouse', 'requérante'
+    ],
+    'attestation_depot': [
+        'attestation de dépôt', 'attestation dépôt', 'dépôt de dossier',
+        'accusé de dépôt', 'confirmation de dépôt', 'récépissé de dépôt'
+    ],
+    'bulletin_salaire': [
+        'bulletin de salaire', 'bulletin de paie', 'fiche de paie',
+        'salaire brut', 'salaire net', 'cotisations sociales',
+        'employeur', 'salarié', 'période de paie', 'rémunération'
+    ],
+    'passeport': [
+        'passeport', 'passport', 'république française', 'ministère des affaires étrangères',
+        'document de voyage', 'identité française', 'nationalité française',
+        'passeport français', 'passeport biométrique'
+    ]
+}
+
+# Sistema de pontuação mais rigoroso com priorização de documentos jurídicos e específicos
+LEGAL_CATEGORIES = [
+    'tableau_vie_commune', 'refere_suspension', 'accuse_depot', 'accuse_reception',
+    'requete_tribunal', 'lettre_recommandee', 'document_tribunal', 
+    'procedure_administrative', 'recours_administratif'
+]
+
+# Categorias específicas com alta prioridade
+SPECIFIC_CATEGORIES = [
+    'attestation_honneur', 'attestation_depot', 'bulletin_salaire', 'passeport'
+]
+
+# Termos que impedem classificar como RG (documentos jurídicos ou específicos)
+RG_EXCLUSION_TERMS = ['tribunal', 'attestation', 'accusé', 'requête', 'dépôt', 'passeport', 'bulletin', 'salaire']
+
+# Padrões específicos dos documentos reais da pasta "Documentos Anne"
+ENHANCED_PATTERNS = {
+    'bulletin_salaire': ['bulletin', 'salaire', 'cotisations', 'brut', 'net à payer', 'employeur', 'salarié'],
+    'passaporte': ['passport', 'passeport', 'república federativa', 'passaporte', 'federal republic'],
+    'comprovante_residencia': ['edf', 'electricité de france', 'kwh', 'facture', 'abonnement'],
+    'contrato': ['contrat', 'pédagogique', 'formation', 'stage', 'convention'],
+    'lista_documents': ['liste', 'documents', 'pièces à fournir', 'membre de famille'],
+    'attestation_hebergement': ['attestation', 'hébergement', 'certifie'],
+    'facture': ['facture', 'invoice', 'montant', 'ttc', 'commande'],
+    'outros': []  # Categoria padrão
+}
+
+# Palavras-chave que indicam DOCUMENTO (não foto casual)
+PHOTO_DOCUMENT_KEYWORDS = [
+    'identidade', 'rg', 'cnh', 'carteira', 'habilitação', 'passaporte',
+    'passport', 'república', 'brasil', 'cpf', 'data nascimento',
+    'validade', 'documento', 'número', 'ministério', 'república',
+    'identity', 'driver', 'license', 'national', 'federal'
+]
+
+# Termos da validação semântica por categoria
+VALIDATION_KEYWORDS = [
+    'registro geral', 'identidade', 'cadastro de pessoa', 'energia', 'cemig', 'saneamento',
+    'sabesp', 'honneur', 'référé', 'saldo', 'extrato', 'nota fiscal'
+]
+
+# Palavras-chave por categoria usadas pelo sistema de aprendizado
+LEARNING_KEYWORDS = {
+    'rg': ['registro geral', 'carteira de identidade', 'rg nº', 'identidade', 'documento de identidade'],
+    'cpf': ['cadastro de pessoa física', 'cpf', 'receita federal', 'contribuinte'],
+    'cnh': ['carteira nacional', 'habilitação', 'detran', 'condutor', 'permissão para dirigir'],
+    'certidao_nascimento': ['certidão de nascimento', 'nascimento', 'cartório', 'registro civil'],
+    'certidao_casamento': ['certidão de casamento', 'casamento', 'matrimônio', 'união'],
+    'certidao_obito': ['certidão de óbito', 'óbito', 'falecimento', 'morte'],
+    'contracheque': ['contracheque', 'holerite', 'salário', 'remuneração', 'folha de pagamento'],
+    'conta_luz': ['conta de luz', 'energia elétrica', 'kwh', 'cemig', 'cpfl', 'eletropaulo'],
+    'conta_agua': ['conta de água', 'saneamento', 'sabesp', 'copasa', 'águas'],
+    'conta_gas': ['conta de gás', 'gás natural', 'comgás'],
+    'extrato_bancario': ['extrato', 'banco', 'saldo', 'movimentação', 'conta corrente'],
+    'comprovante_residencia': ['comprovante de residência', 'endereço', 'residência'],
+    'comprovante_renda': ['comprovante de renda', 'declaração de renda', 'rendimentos'],
+    'diploma': ['diploma', 'graduação', 'conclusão de curso', 'formatura'],
+    'historico_escolar': ['histórico escolar', 'boletim', 'notas', 'disciplinas'],
+    'atestado_medico': ['atestado médico', 'atestado', 'médico', 'cid'],
+    'laudo_medico': ['laudo médico', 'laudo', 'exame', 'diagnóstico'],
+    'nota_fiscal': ['nota fiscal', 'nf-e', 'cupom fiscal', 'danfe'],
+    'recibo': ['recibo', 'comprovante de pagamento', 'quitação'],
+    'procuracao': ['procuração', 'mandato', 'representação legal'],
+    'contrato_aluguel': ['contrato de aluguel', 'locação', 'inquilino', 'locador'],
+    'carta': ['carta', 'correspondência', 'missiva', 'letter', 'comunicação']
+}
+
+
+def confidence_formula(base, per_match, maximum):
+    """Confiança = min(max, base + casamentos * per_match)"""
+    return {'base': base, 'per_match': per_match, 'max': maximum}
+
+
+def builtin_rules():
+    """Regras embutidas no formato declarativo do categories.json
+
+    content: avaliadas por prioridade (menor primeiro) e, dentro dela, na
+    ordem da lista; a primeira regra com min_matches frases presentes e
+    nenhum termo de exclusão decide.
+    """
+    content = []
+    for category in LEGAL_CATEGORIES:
+        content.append({'category': category, 'phrases': CONTENT_PATTERNS[category], 'min_matches': 1,
+                        'priority': 1, 'method': 'offline_content_legal',
+                        'confidence': confidence_formula(0.7, 0.1, 0.9)})
+    for category in SPECIFIC_CATEGORIES:
+        content.append({'category': category, 'phrases': CONTENT_PATTERNS[category], 'min_matches': 1,
+                        'priority': 2, 'method': 'offline_content_specific',
+                        'confidence': confidence_formula(0.7, 0.1, 0.9)})
+    for category, phrases in CONTENT_PATTERNS.items():
+        if category in LEGAL_CATEGORIES or category in SPECIFIC_CATEGORIES:
+            continue
+        if category == 'rg':
+            # RG exige 3 frases e não pode conter termos jurídicos ou específicos
+            content.append({'category': category, 'phrases': phrases, 'min_matches': 3, 'priority': 3,
+                            'method': 'offline_content', 'confidence': confidence_formula(0.4, 0.08, 0.7),
+                            'exclude': RG_EXCLUSION_TERMS})
+        else:
+            content.append({'category': category, 'phrases': phrases, 'min_matches': 1, 'priority': 3,
+                            'method': 'offline_content', 'confidence': confidence_formula(0.6, 0.1, 0.8)})
+
+    return {
+        'filename': [{'category': category, 'keywords': keywords, 'confidence': 0.8}
+                     for category, keywords in FILENAME_PATTERNS.items() if keywords],
+        'content': content,
+        'enhanced': [{'category': category, 'phrases': phrases, 'min_matches': 2,
+                      'confidence': confidence_formula(0.6, 0.1, 0.95)}
+                     for category, phrases in ENHANCED_PATTERNS.items() if phrases],
+        'photo_document_keywords': PHOTO_DOCUMENT_KEYWORDS,
+        'validation_keywords': VALIDATION_KEYWORDS,
+        'learning_keywords': LEARNING_KEYWORDS,
+    }
+
+
+FilenameRule = namedtuple('FilenameRule', 'category keywords confidence')
+ContentRule = namedtuple('ContentRule', 'category phrases min_matches priority method base per_match '
+                                        'max_confidence exclude')
+
+
+def rule_confidence(rule, matches):
+    """Aplica a fórmula de confiança de uma regra de conteúdo"""
+    return min(rule.max_confidence, rule.base + (matches * rule.per_match))
+
+
+def _phrase_list(value, where, required=False):
+    if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) and item for item in value):
+        raise ValueError(f"{where}: esperada lista de textos não vazios")
+    if required and not value:
+        raise ValueError(f"{where}: a regra precisa de pelo menos um padrão")
+    return tuple(item.lower() for item in value)
+
+
+def _section(spec, name, kind):
+    """Seção da especificação com o tipo esperado (lista ou objeto); ausente vira vazia"""
+    value = spec.get(name)
+    if value is None and name not in spec:
+        return kind()
+    if not isinstance(value, kind):
+        raise ValueError(f"{name}: esperado {'lista' if kind is list else 'objeto'}")
+    return value
+
+
+def _content_rule(spec, where, default_method='offline_content'):
+    if not isinstance(spec, dict) or not isinstance(spec.get('category'), str):
+        raise ValueError(f"{where}: regra sem 'category'")
+    formula = spec.get('confidence', {})
+    if not isinstance(formula, dict):
+        raise ValueError(f"{where}: 'confidence' deve ser um objeto com base, per_match e max")
+    try:
+        min_matches = max(1, int(spec.get('min_matches', 1)))
+        priority = int(spec.get('priority', 0))
+        base = float(formula.get('base', 0.6))
+        per_match = float(formula.get('per_match', 0.1))
+        max_confidence = float(formula.get('max', 0.8))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{where}: valor numérico inválido ({e})")
+    return ContentRule(
+        category=spec['category'],
+        phrases=_phrase_list(spec.get('phrases'), f"{where}.phrases", required=True),
+        min_matches=min_matches,
+        priority=priority,
+        method=str(spec.get('method', default_method)),
+        base=base,
+        per_match=per_match,
+        max_confidence=max_confidence,
+        exclude=_phrase_list(spec.get('exclude', []), f"{where}.exclude"),
+    )
+
+
+class RuleSet:
+    """Regras compiladas e imutáveis
+
+    version: hash curto da especificação, reportado pelos classificadores
+    junto com cada resultado. Uma especificação inválida gera ValueError.
+    """
+
+    __slots__ = ('filename_rules', 'content_rules', 'enhanced_rules', 'photo_document_keywords',
+                 'validation_keywords', 'learning_keywords', 'automaton', 'version', 'source')
+
+    def __init__(self, spec, source='builtin'):
+        if not isinstance(spec, dict):
+            raise ValueError("regras: esperado um objeto JSON")
+        canonical = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+        object.__setattr__(self, 'version', hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12])
+        object.__setattr__(self, 'source', source)
+
+        filename_rules = []
+        for index, rule in enumerate(_section(spec, 'filename', list)):
+            where = f"filename[{index}]"
+            if not isinstance(rule, dict) or not isinstance(rule.get('category'), str):
+                raise ValueError(f"{where}: regra sem 'category'")
+            try:
+                confidence = float(rule.get('confidence', 0.8))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"{where}: valor numérico inválido ({e})")
+            filename_rules.append(FilenameRule(rule['category'],
+                                               _phrase_list(rule.get('keywords'), f"{where}.keywords", required=True),
+                                               confidence))
+        object.__setattr__(self, 'filename_rules', tuple(filename_rules))
+
+        content_rules = [_content_rule(rule, f"content[{index}]")
+                         for index, rule in enumerate(_section(spec, 'content', list))]
+        # Ordenação estável: prioridade e, dentro dela, a ordem do arquivo
+        object.__setattr__(self, 'content_rules', tuple(sorted(content_rules, key=lambda rule: rule.priority)))
+        object.__setattr__(self, 'enhanced_rules', tuple(
+            _content_rule(rule, f"enhanced[{index}]", default_method='enhanced_patterns')
+            for index, rule in enumerate(_section(spec, 'enhanced', list))))
+
+        object.__setattr__(self, 'photo_document_keywords',
+                           _phrase_list(_section(spec, 'photo_document_keywords', list), 'photo_document_keywords'))
+        object.__setattr__(self, 'validation_keywords',
+                           _phrase_list(_section(spec, 'validation_keywords', list), 'validation_keywords'))
+        learning_keywords = _section(spec, 'learning_keywords', dict)
+        object.__setattr__(self, 'learning_keywords', MappingProxyType({
+            category: _phrase_list(keywords, f"learning_keywords.{category}")
+            for category, keywords in learning_keywords.items()}))
+
+        # OTIMIZAÇÃO: todas as tabelas num único autômato de Aho-Corasick; uma
+        # passada no texto encontra todos os padrões e as regras usam o conjunto
+        patterns = set(self.photo_document_keywords + self.validation_keywords)
+        patterns.update(FEATURE_PATTERNS)  # Features semânticas saem da mesma passada
+        for rule in self.filename_rules:
+            patterns.update(rule.keywords)
+        for rule in self.content_rules + self.enhanced_rules:
+            patterns.update(rule.phrases)
+            patterns.update(rule.exclude)
+        for keywords in self.learning_keywords.values():
+            patterns.update(keywords)
+        object.__setattr__(self, 'automaton', KeywordAutomaton(patterns))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('RuleSet é imutável; use reload_rules()')
+
+
+def compile_rules(spec=None, source='builtin'):
+    """Compila uma especificação declarativa (padrão: regras embutidas) num RuleSet"""
+    return RuleSet(spec if spec is not None else builtin_rules(), source)
+
+
+def read_categories_file(path=CATEGORIES_FILE):
+    """Lê o categories.json: retorna (nomes das categorias, especificação de regras ou None)
+
+    Aceita o formato antigo (objeto plano chave → nome) e o novo
+    {"categories": {...}, "rules": {...}}.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and isinstance(data.get('categories'), dict):
+        return data['categories'], data.get('rules')
+    return data, None
+
+
+def write_categories_file(categories, rules=None, path=CATEGORIES_FILE):
+    """Grava o categories.json de forma atômica (arquivo temporário + os.replace)
+
+    Workers que leem o arquivo ao mesmo tempo veem a versão antiga ou a nova,
+    nunca um JSON pela metade.
+    """
+    data = {'categories': categories}
+    if rules is not None:
+        data['rules'] = rules
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def load_rules_from_file(path=CATEGORIES_FILE):
+    """RuleSet do categories.json; regras embutidas se o arquivo não tiver regras"""
+    try:
+        _, spec = read_categories_file(path)
+    except FileNotFoundError:
+        spec = None
+    if spec is None:
+        return compile_rules()
+    return compile_rules(spec, source=path)
+
+
+_rules_lock = threading.Lock()
+_rules_signature = _file_signature(CATEGORIES_FILE)
+try:
+    _rules = load_rules_from_file()
+except Exception as e:  # Arquivo editado à mão não pode impedir a importação
+    print(f"⚠️ Regras do {CATEGORIES_FILE} inválidas ({e}), usando regras embutidas")
+    _rules = compile_rules()
+_rules_checked_at = time.monotonic()
+
+
+def _swap_rules(rules, signature):
+    global _rules, _rules_signature
+    _rules = rules  # Troca atômica: leitores veem o RuleSet antigo ou o novo
+    _rules_signature = signature
+    print(f"📏 Regras de classificação carregadas (versão {rules.version}, origem {rules.source})")
+
+
+def check_rules_file():
+    """Recarrega as regras se o categories.json mudou (hot reload sem reiniciar o worker)
+
+    Um arquivo inválido é registrado no log e o RuleSet atual continua ativo.
+    """
+    global _rules_checked_at, _rules_signature
+    _rules_checked_at = time.monotonic()
+    signature = _file_signature(CATEGORIES_FILE)
+    if signature == _rules_signature:
+        return
+    with _rules_lock:
+        if signature == _rules_signature:
+            return
+        try:
+            _swap_rules(load_rules_from_file(CATEGORIES_FILE), signature)
+        except Exception as e:  # Inclui erros de tipo que escapem da validação
+            print(f"⚠️ Regras do {CATEGORIES_FILE} inválidas ({e}), mantendo versão {_rules.version}")
+            _rules_signature = signature  # Não tenta de novo até o arquivo mudar
+
+
+def get_rules():
+    """RuleSet ativo; verifica mudanças no arquivo no máximo a cada RULES_CHECK_INTERVAL"""
+    if time.monotonic() - _rules_checked_at >= RULES_CHECK_INTERVAL:
+        check_rules_file()
+    return _rules
+
+
+def activate_rules(rules):
+    """Troca o RuleSet ativo por um já compilado (ex.: regras recebidas pela API)"""
+    with _rules_lock:
+        _swap_rules(rules, _file_signature(CATEGORIES_FILE))
+    return rules
+
+
+def reload_rules(spec=None, source='api'):
+    """Compila uma especificação e troca o RuleSet ativo atomicamente
+
+    spec None: relê o categories.json. Documentos em andamento continuam com
+    o RuleSet que já obtiveram. Uma especificação inválida gera ValueError e
+    mantém as regras atuais.
+    """
+    rules = load_rules_from_file(CATEGORIES_FILE) if spec is None else compile_rules(spec, source)
+    return activate_rules(rules)
@@ -0,0 +1,2289 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import PyPDF2
+try:
+    import fitz  # PyMuPDF: texto, imagens e renderização a partir de um único handle
+except ImportError:
+    fitz = None
+from PIL import Image, ImageOps
+import cv2
+import numpy as np
+from learning_system import IntelligentLearningSystem
+from ocr_cache import PersistentOCRCache
+from ocr_engine import get_ocr_backend, layout_to_text, mean_confidence
+from preprocessing import preprocess_for_ocr
+from semantic_features import extract_features
+from text_quality import score_text_layer, format_score
+from classification_rules import get_rules, rule_confidence, read_categories_file
+from batch_classifier import get_batch_classifier
+
+# Pipeline de documentos: extração de texto (camada do PDF / OCR), triagem de fotos e
+# classificação. Não importa o app Flask: é o que os workers do pool de OCR carregam
+# (ocr_worker.py), então nada aqui depende das rotas, das sessões ou das métricas.
+
+# Inicializa o sistema de aprendizado inteligente
+learning_system = IntelligentLearningSystem()
+
+# OTIMIZAÇÃO: Cache de OCR persistente em disco (evita reprocessamento de arquivos idênticos)
+# Compartilhado entre workers e sobrevive a reinícios do gunicorn (--max-requests)
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', 5000))
+OCR_CACHE_MAX_BYTES = int(os.environ.get('OCR_CACHE_MAX_MB', 200)) * 1024 * 1024
+ocr_cache = PersistentOCRCache(max_entries=OCR_CACHE_MAX_ENTRIES, max_bytes=OCR_CACHE_MAX_BYTES)
+
+# OTIMIZAÇÃO: OCR de páginas em paralelo dentro de um documento
+# Orçamento compartilhado: CPUs divididas entre os workers do pool (evita oversubscription)
+page_executor = None
+page_executor_lock = threading.Lock()
+ocr_pool_size = 1  # Workers do pool de OCR (definido pelo processo principal e no início de cada worker)
+
+# Resolução alvo do OCR: lado maior da página em pixels
+OCR_TARGET_SIZE = 2000
+# Nunca renderiza acima de 2x (144 DPI), a resolução de sempre do OCR de PDFs. A4 e
+# Carta (lado maior < 1000pt) saem em 2x sem redução; só páginas maiores usam o alvo
+MAX_RENDER_ZOOM = 2.0
+
+# Detecção de rostos: lado maior da cópia reduzida e detector por thread
+FACE_DETECTION_SIZE = 640
+FACE_MIN_SIZE = 30  # Menor rosto aceito, em pixels da imagem ORIGINAL
+
+# Limite de pixels para decodificar formatos sem redução na decodificação (PNG) em cores
+# 40MP em RGB ≈ 120MB por imagem; acima disso a imagem é decodificada em cinza (1 byte/pixel)
+MAX_DECODE_PIXELS = int(os.environ.get('MAX_DECODE_PIXELS', 40_000_000))
+face_detector_local = threading.local()
+
+# OTIMIZAÇÃO: Triagem de fotos pela miniatura antes do OCR
+# Fotos abaixo do limiar de confiança seguem para o OCR (evita desvios)
+PHOTO_PRESCREEN = os.environ.get('PHOTO_PRESCREEN', 'true').lower() in ['true', '1', 'yes']
+PHOTO_PRESCREEN_THRESHOLD = float(os.environ.get('PHOTO_PRESCREEN_THRESHOLD', 0.85))
+# Paisagens (sem rostos) têm limiar próprio: a regra da triagem já exige cor alta, quase nenhum papel e poucas bordas
+PHOTO_PRESCREEN_LANDSCAPE_THRESHOLD = float(os.environ.get('PHOTO_PRESCREEN_LANDSCAPE_THRESHOLD', 0.80))
+
+# Pré-processamento: 'quality' (padrão, com orçamento de tempo por página) ou 'fast' (só Otsu)
+PREPROCESS_MODE = os.environ.get('PREPROCESS_MODE', 'quality').lower()
+
+# OTIMIZAÇÃO: OCR progressivo na classificação (cabeçalho → página 1 → página 2)
+# O OCR só avança para o próximo estágio se a confiança das regras ficar abaixo do limiar
+PROGRESSIVE_OCR = os.environ.get('PROGRESSIVE_OCR', 'true').lower() in ['true', '1', 'yes']
+PROGRESSIVE_OCR_THRESHOLD = float(os.environ.get('PROGRESSIVE_OCR_THRESHOLD', 0.8))
+PARTIAL_OCR_STAGES = ('header', 'page1')  # Estágios em que o texto não cobre o documento inteiro
+HEADER_BAND_FRACTION = 0.25  # Faixa superior da página 1 (título, órgão emissor)
+
+# OTIMIZAÇÃO: OCR em dois níveis (passada em baixa resolução, escala para resolução total se necessário)
+MULTIRES_OCR = os.environ.get('MULTIRES_OCR', 'true').lower() in ['true', '1', 'yes']
+OCR_LOWRES_SCALE = float(os.environ.get('OCR_LOWRES_SCALE', 0.5))  # 2000px → 1000px
+OCR_ESCALATION_MIN_CONF = float(os.environ.get('OCR_ESCALATION_MIN_CONF', 70))  # Confiança média das palavras (0-100)
+OCR_ESCALATION_MIN_CHARS = int(os.environ.get('OCR_ESCALATION_MIN_CHARS', 50))
+
+# OTIMIZAÇÃO: Hash calculado uma única vez no upload (streaming, buffers grandes)
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB por leitura
+
+DOCUMENT_TYPES = {
+    'holerite': 'Holerite',
+    'certidao_nascimento': 'Certidão de Nascimento',
+    'comprovante_residencia': 'Comprovante de Residência',
+    'rg': 'Identidade (RG)',
+    'cpf': 'CPF',
+    'cnh': 'CNH',
+    'ctps': 'Carteira de Trabalho',
+    'contrato': 'Contrato',
+    'procuracao': 'Procuração',
+    'peticao': 'Petição',
+    'sentenca': 'Sentença',
+    # Documentos de imigração (SEMPRE EM PORTUGUÊS)
+    'titre_sejour': 'Título de Permanência',
+    'visa_frances': 'Visto',
+    'carte_resident': 'Cartão de Residente',
+    'attestation_hebergement': 'Declaração de Hospedagem',
+    'justificatif_domicile': 'Comprovante de Residência',
+    'bulletin_salaire': 'Folha de Pagamento',
+    'contrat_travail': 'Contrato de Trabalho',
+    'attestation_employeur': 'Declaração do Empregador',
+    'avis_imposition': 'Declaração de Imposto de Renda',
+    'certificat_scolarite': 'Declaração Escolar',
+    'diplome_francais': 'Diploma',
+    'acte_naissance_traduit': 'Certidão de Nascimento Traduzida',
+    'casier_judiciaire': 'Certidão de Antecedentes Criminais',
+    'certificat_medical': 'Atestado Médico',
+    'assurance_maladie': 'Comprovante de Seguro Saúde',
+    'liste_documents': 'Lista de Documentos',
+    # Documentos jurídicos (SEMPRE EM PORTUGUÊS)
+    'tableau_vie_commune': 'Comprovante de União Estável',
+    'refere_suspension': 'Liminar',
+    'accuse_depot': 'Comprovante de Protocolo',
+    'accuse_reception': 'Comprovante de Recebimento',
+    'requete_tribunal': 'Petição Judicial',
+    'lettre_recommandee': 'Carta Registrada',
+    'document_tribunal': 'Documento Judicial',
+    'procedure_administrative': 'Processo Administrativo',
+    'recours_administratif': 'Recurso Administrativo',
+    # Documentos gerais (SEMPRE EM PORTUGUÊS)
+    'attestation_honneur': 'Declaração',
+    'attestation_depot': 'Comprovante de Depósito',
+    'passeport': 'Passaporte',
+    # Fotos pessoais (não confundir com documentos que contêm fotos)
+    'fotos_pessoas': 'Fotos de Pessoas',
+    'outros': 'Outros Documentos'
+}
+
+def load_categories():
+    """Carrega os nomes das categorias do arquivo JSON ou retorna as padrões
+
+    Aceita o formato antigo (chave → nome) e o novo {"categories", "rules"}.
+    """
+    try:
+        categories, _ = read_categories_file()
+        return categories
+    except FileNotFoundError:
+        return DOCUMENT_TYPES.copy()
+    except json.JSONDecodeError:
+        return DOCUMENT_TYPES.copy()
+
+def get_file_hash(file_path):
+    """Calcula hash BLAKE2b do arquivo (fallback quando o digest do upload não está disponível)"""
+    hasher = hashlib.blake2b(digest_size=32)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def get_cached_ocr(file_path, file_hash=None, allow_partial=False, stats=None):
+    """Busca texto OCR no cache persistente
+
+    allow_partial: aceita texto de OCR progressivo interrompido (ex.: só o
+    cabeçalho). Chamadores que precisam do texto completo usam False.
+    """
+    try:
+        if file_hash is None:
+            file_hash = get_file_hash(file_path)
+        entry = ocr_cache.get_entry(file_hash)
+        if entry is not None:
+            cached_text, stage = entry
+            if stage != 'full' and not allow_partial:
+                print(f"  Cache com texto parcial ({stage}) - extraindo texto completo")
+                return None
+            print(f"  ⚡ Cache HIT - texto recuperado instantaneamente")
+            if stats is not None:
+                stats['stage'] = stage
+            return cached_text
+    except Exception as e:
+        print(f"  Erro ao buscar cache: {e}")
+    return None
+
+def save_to_cache(file_path, text, file_hash=None, stage=None, layout=None):
+    """Salva texto OCR no cache persistente
+
+    stage: estágio do OCR progressivo; None ou estágios completos ('full',
+    'text_layer') são gravados como texto completo.
+    layout: palavras com caixas e confianças (sem páginas OCRizadas, não é gravado)
+    """
+    try:
+        if file_hash is None:
+            file_hash = get_file_hash(file_path)
+        if layout is not None and not layout.get('pages'):
+            layout = None
+        ocr_cache.put(file_hash, text, stage if stage in PARTIAL_OCR_STAGES else 'full', layout)
+    except Exception as e:
+        print(f"  Erro ao salvar cache: {e}")
+
+def get_cached_layout(file_path, file_hash=None):
+    """Layout de palavras do OCR gravado no cache (None se não houver)
+
+    Permite retomar ou reaproveitar o OCR de um documento sem rodar o
+    Tesseract de novo nas regiões já lidas.
+    """
+    try:
+        if file_hash is None:
+            file_hash = get_file_hash(file_path)
+        return ocr_cache.get_layout(file_hash)
+    except Exception as e:
+        print(f"  Erro ao buscar layout no cache: {e}")
+    return None
+
+class DocumentContext:
+    """Contexto de um documento ao longo de todo o pipeline
+
+    Carrega caminho, digest, imagem/páginas decodificadas, texto extraído,
+    texto em minúsculas e features semânticas. Cada estágio reaproveita o que
+    um estágio anterior já produziu (o texto é extraído uma única vez).
+    """
+
+    def __init__(self, file_path, file_hash=None, progressive=False):
+        self.file_path = file_path
+        self.filename = os.path.basename(file_path)
+        self.filename_lower = self.filename.lower()
+        self.file_extension = os.path.splitext(file_path)[1].lower()
+        self._file_hash = file_hash
+        self.image = None  # Imagem PIL decodificada (uploads de imagem)
+        self.pages = []  # Páginas renderizadas para OCR (PDFs escaneados)
+        self._text = None
+        self._text_lower = None
+        self._rules = None
+        self._keyword_matches = None
+        self._filename_matches = None
+        self._features = None
+        self._layout = None
+        self.progressive = progressive  # OCR progressivo: texto pode ser só o cabeçalho
+        self.photo_prescreen = None  # Resultado da triagem de fotos (antes do OCR)
+        self.photo_prescreen_done = False
+        self.faces = None  # Rostos detectados (coordenadas da imagem decodificada), memorizados
+        self.ocr_stats = new_ocr_stats()
+
+    @property
+    def file_hash(self):
+        if self._file_hash is None:
+            self._file_hash = get_file_hash(self.file_path)
+        return self._file_hash
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = extract_text_from_file(self.file_path, self.file_hash, context=self,
+                                                progressive=self.progressive)
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value or ""
+        self._text_lower = None
+        self._keyword_matches = None
+        self._features = None
+        self._layout = None
+
+    @property
+    def text_lower(self):
+        if self._text_lower is None:
+            self._text_lower = self.text.lower()
+        return self._text_lower
+
+    @property
+    def rules(self):
+        """RuleSet usado em todo o documento (um reload no meio não mistura versões)"""
+        if self._rules is None:
+            self._rules = get_rules()
+        return self._rules
+
+    @property
+    def keyword_matches(self):
+        """Padrões das tabelas de classificação presentes no texto (uma passada do autômato)"""
+        if self._keyword_matches is None:
+            self._keyword_matches = self.rules.automaton.find_all(self.text_lower)
+        return self._keyword_matches
+
+    @property
+    def filename_matches(self):
+        """Padrões das tabelas de classificação presentes no nome do arquivo"""
+        if self._filename_matches is None:
+            self._filename_matches = self.rules.automaton.find_all(self.filename_lower)
+        return self._filename_matches
+
+    @property
+    def layout(self):
+        """Layout de palavras do OCR (do cache); None para texto nativo de PDF"""
+        if self._layout is None:
+            self.text  # Garante a extração (que grava o layout no cache)
+            self._layout = get_cached_layout(self.file_path, self.file_hash) or {}
+        return self._layout or None
+
+    @property
+    def features(self):
+        if self._features is None:
+            self._features = extract_features(self.text, self.text_lower, self.keyword_matches)
+        return self._features
+
+    def complete_text(self):
+        """Texto do documento inteiro
+
+        Se o OCR progressivo parou no cabeçalho ou na página 1, termina a
+        extração sem o modo progressivo (as passadas extras entram em
+        ocr_stats). Para quem precisa do documento todo, como o período do bulletin.
+        As regiões já lidas vêm do layout em cache: só o resto passa pelo OCR.
+        """
+        text = self.text
+        if self.ocr_stats['stage'] not in PARTIAL_OCR_STAGES:
+            return text
+        print(f"  Completando a extração de {self.filename} (texto parcial: {self.ocr_stats['stage']})")
+        resume = self.layout
+        self.pages = []
+        self.text = extract_text_from_file(self.file_path, self.file_hash, context=self, progressive=False,
+                                           resume=resume)
+        return self.text
+
+    def release_images(self):
+        """Libera imagens decodificadas após a classificação (economiza memória)"""
+        self.image = None
+        self.pages = []
+
+def as_document_context(document, file_hash=None):
+    """Aceita um caminho ou um DocumentContext e retorna sempre um DocumentContext"""
+    if isinstance(document, DocumentContext):
+        return document
+    return DocumentContext(document, file_hash)
+
+def compress_image_for_ocr(image, max_size=OCR_TARGET_SIZE):
+    """
+    OTIMIZAÇÃO: Comprime imagem mantendo qualidade OCR
+    Reduz processamento em ~40% sem perder precisão
+    Aceita imagem PIL ou array numpy (retorna o mesmo tipo)
+    """
+    is_array = isinstance(image, np.ndarray)
+    if is_array:
+        height, width = image.shape[:2]
+    else:
+        width, height = image.size
+
+    # Se imagem já é pequena, retorna direto
+    if width <= max_size and height <= max_size:
+        return image
+
+    # Calcula nova dimensão mantendo aspect ratio
+    if width > height:
+        new_width = max_size
+        new_height = int((max_size / width) * height)
+    else:
+        new_height = max_size
+        new_width = int((max_size / height) * width)
+
+    # Redimensiona com algoritmo de alta qualidade
+    if is_array:
+        compressed = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    else:
+        compressed = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    print(f"  Imagem comprimida: {width}x{height} → {new_width}x{new_height}")
+    return compressed
+
+def decode_reduced_grayscale(file_path, width, height, max_size=OCR_TARGET_SIZE):
+    """Decodifica uma imagem grande (PNG) direto em cinza, reduzida por 2, 4 ou 8
+
+    O OpenCV converte para cinza durante a decodificação, então o pico de
+    memória é de 1 byte/pixel em vez de 3-4 do RGB(A) do PIL; a redução é
+    aplicada logo em seguida e a imagem em resolução total é liberada.
+    """
+    factor = next((f for f in (2, 4, 8) if max(width, height) / f <= max_size), 8)
+    flag = {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            8: cv2.IMREAD_REDUCED_GRAYSCALE_8}[factor]
+    array = cv2.imread(file_path, flag)
+    if array is None:
+        raise ValueError(f"não foi possível decodificar a imagem ({width}x{height})")
+    print(f"  Imagem de {width}x{height} acima de MAX_DECODE_PIXELS: decodificada em cinza (1/{factor})")
+    return Image.fromarray(array)
+
+def load_image_for_ocr(file_path, max_size=OCR_TARGET_SIZE):
+    """Decodifica uma imagem já perto da resolução do OCR, com memória limitada
+
+    JPEG: draft() faz a redução no domínio DCT (1/2, 1/4, 1/8) durante a
+    decodificação, então uma foto de 12MP nunca existe em resolução total.
+    Outros formatos acima de MAX_DECODE_PIXELS são decodificados em cinza e
+    reduzidos (decode_reduced_grayscale). A orientação EXIF é aplicada e o
+    resultado final tem lado maior <= max_size; o tamanho do arquivo original
+    fica em image.info['source_size'].
+    """
+    image = Image.open(file_path)
+    width, height = image.size
+
+    if image.format == 'JPEG':
+        # Pede ao decodificador a menor escala que ainda cubra max_size
+        scale = min(1.0, max_size / max(width, height))
+        image.draft('RGB', (int(width * scale), int(height * scale)))
+    elif width * height > MAX_DECODE_PIXELS:
+        image = decode_reduced_grayscale(file_path, width, height, max_size)
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+    if image.size != (width, height):
+        print(f"  Imagem decodificada em escala reduzida: {width}x{height} → {image.size[0]}x{image.size[1]}")
+    image.info['source_size'] = (width, height)
+    return image
+
+def get_face_detector():
+    """Detector de rostos pré-carregado, um por thread de cada worker
+
+    O XML do Haar Cascade é lido uma única vez; CascadeClassifier não é
+    thread-safe, por isso não é compartilhado entre threads.
+    """
+    detector = getattr(face_detector_local, 'detector', None)
+    if detector is None:
+        detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        face_detector_local.detector = detector
+    return detector
+
+def downscale_for_detection(image, max_size=FACE_DETECTION_SIZE):
+    """Cópia RGB reduzida (lado maior <= max_size) de uma imagem PIL já decodificada
+
+    Retorna: (array RGB, escala aplicada em relação ao original)
+    """
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGB')
+
+    # reduce() faz redução inteira por blocos (barata) antes do redimensionamento fino
+    factor = max(1, max(image.size) // max_size)
+    small = image.reduce(factor) if factor > 1 else image
+    small = np.asarray(small.convert('RGB'))
+
+    height, width = small.shape[:2]
+    resize_scale = min(1.0, max_size / max(height, width))
+    if resize_scale < 1.0:
+        small = cv2.resize(small, (int(width * resize_scale), int(height * resize_scale)),
+                           interpolation=cv2.INTER_AREA)
+    return small, small.shape[1] / image.size[0]
+
+def face_min_side(image, small):
+    """Menor rosto aceito na cópia de detecção, em pixels
+
+    FACE_MIN_SIZE é medido no arquivo ORIGINAL, não na imagem decodificada em
+    escala reduzida por load_image_for_ocr (info['source_size']).
+    """
+    source_size = image.info.get('source_size', image.size)
+    return max(1, int(round(FACE_MIN_SIZE * max(small.shape[:2]) / max(source_size))))
+
+def detect_faces(gray, scale, min_side):
+    """Detecta rostos na cópia reduzida e mapeia as caixas para a imagem decodificada
+
+    min_side: menor rosto aceito na cópia reduzida (face_min_side)
+    """
+    detected = get_face_detector().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                                    minSize=(min_side, min_side))
+    return [tuple(int(round(value / scale)) for value in box) for box in detected]
+
+def detect_people_photo(file_path, text_content=""):
+    """
+    Detecta se é foto de pessoas (casal, grupo, selfie, paisagem, foto casual)
+    NÃO CONFUNDE com documentos que contêm fotos (RG, CNH, Passaporte)
+
+    file_path: caminho ou DocumentContext (reaproveita a imagem já decodificada para o OCR)
+    Retorna: (is_people_photo: bool, confidence: float, num_faces: int, photo_type: str)
+    """
+    try:
+        # Se tiver muito texto, provavelmente é documento, não foto casual
+        if text_content and len(text_content.strip()) > 100:
+            return False, 0.0, 0, "document"
+
+        # Palavras-chave que indicam DOCUMENTO (não foto casual)
+        rules = file_path.rules if isinstance(file_path, DocumentContext) else get_rules()
+        text_lower = text_content.lower() if text_content else ""
+        keyword_matches = rules.automaton.find_all(text_lower)
+        if any(keyword in keyword_matches for keyword in rules.photo_document_keywords):
+            return False, 0.0, 0, "document"  # É documento, não foto
+
+        ctx = as_document_context(file_path)
+
+        # Tenta carregar a imagem
+        if ctx.file_extension == '.pdf':
+            return False, 0.0, 0, "pdf"  # PDFs não são fotos casuais
+
+        image = ctx.image
+        if image is None:
+            try:
+                image = load_image_for_ocr(ctx.file_path)
+            except Exception:
+                return False, 0.0, 0, "invalid"
+
+        # OTIMIZAÇÃO: detecção numa cópia reduzida (~640px) com detector pré-carregado
+        small, scale = downscale_for_detection(image)
+        # Rostos já detectados na triagem de fotos são reaproveitados do contexto
+        if ctx.faces is None:
+            ctx.faces = detect_faces(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), scale, face_min_side(image, small))
+        faces = ctx.faces
+        num_faces = len(faces)
+
+        # Análise da imagem
+        width, height = image.size
+        img_area = height * width
+        aspect_ratio = width / height if height > 0 else 1.0
+
+        # NOVA LÓGICA: Detecta paisagens e fotos sem rostos
+        if num_faces == 0:
+            # Verifica se é uma imagem fotográfica (não documento escaneado)
+            # Documentos geralmente têm alta variância de cores em áreas pequenas (texto)
+            # Fotos têm transições mais suaves
+
+            # Se não tem muito texto E é uma imagem colorida = provavelmente foto
+            has_little_text = len(text_lower.strip()) < 20
+
+            if has_little_text:
+                # Analisa se é foto (colorida, sem muito contraste típico de documentos)
+                hsv = cv2.cvtColor(small, cv2.COLOR_RGB2HSV)
+                saturation = hsv[:, :, 1].mean()  # Saturação média
+
+                # Fotos geralmente têm mais saturação que documentos escaneados
+                if saturation > 30:  # Limiar de saturação
+                    return True, 0.80, 0, "landscape"  # Paisagem/foto sem pessoas
+
+            return False, 0.0, 0, "no_faces"  # Não é foto de pessoas
+
+        # Calcula área total dos rostos
+        total_face_area = sum(w * h for (x, y, w, h) in faces)
+        face_ratio = total_face_area / img_area
+
+        # Regras de classificação OTIMIZADAS:
+        # 1. Se tem 2+ rostos (casal/grupo) = ALTA CONFIANÇA
+        if num_faces >= 2:
+            # Mesmo com rostos pequenos, 2+ pessoas = foto casual
+            confidence = 0.95 if face_ratio > 0.15 else 0.85
+            return True, confidence, num_faces, "couple_group"
+
+        # 2. Se tem 1 rosto grande e pouco/sem texto = selfie/retrato
+        if num_faces == 1 and face_ratio > 0.20 and len(text_lower.strip()) < 50:
+            return True, 0.90, num_faces, "selfie_portrait"
+
+        # 3. Se tem 1 rosto médio e NENHUM texto de documento = foto casual
+        if num_faces == 1 and face_ratio > 0.10 and len(text_lower.strip()) < 10:
+            return True, 0.85, num_faces, "single_person"
+
+        # 4. NOVO: Se tem 1 rosto pequeno mas sem texto = foto de pessoa em paisagem
+        if num_faces == 1 and face_ratio > 0.02 and len(text_lower.strip()) < 5:
+            return True, 0.75, num_faces, "person_landscape"
+
+        # Caso contrário: provavelmente é documento com foto
+        return False, 0.0, num_faces, "document_with_photo"
+
+    except Exception as e:
+        print(f"Erro ao detectar foto de pessoas: {e}")
+        return False, 0.0, 0, "error"
+
+def describe_photo_type(photo_type, num_faces):
+    """Mensagem personalizada baseada no tipo de foto"""
+    if photo_type == "landscape":
+        return "Paisagem/foto sem pessoas"
+    elif photo_type == "couple_group":
+        return f'{num_faces} pessoa(s) detectada(s) - Casal/Grupo'
+    elif photo_type == "selfie_portrait":
+        return "Selfie/Retrato"
+    elif photo_type == "single_person":
+        return "1 pessoa detectada"
+    elif photo_type == "person_landscape":
+        return "Pessoa em paisagem"
+    return f'{num_faces} pessoa(s) detectada(s)'
+
+def extract_photo_features(image, faces=None):
+    """Features baratas de uma miniatura para separar fotos de documentos
+
+    faces: rostos já detectados (coordenadas da imagem decodificada), se houver
+    Retorna dict com saturação média, fração de "papel" (claro e sem cor),
+    densidade de bordas, rostos, número de rostos e fração da área ocupada por rostos.
+    """
+    small, scale = downscale_for_detection(image)
+    hsv = cv2.cvtColor(small, cv2.COLOR_RGB2HSV)
+    gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+
+    saturation = hsv[:, :, 1]
+    paper = (hsv[:, :, 2] > 200) & (saturation < 30)
+    edges = cv2.Canny(gray, 100, 200)
+    if faces is None:
+        faces = detect_faces(gray, scale, face_min_side(image, small))
+    face_area = sum(int(w) * int(h) for (x, y, w, h) in faces)
+
+    return {
+        'saturation': float(saturation.mean()),
+        'paper_fraction': float(paper.mean()),
+        'edge_density': float(np.count_nonzero(edges)) / edges.size,
+        'faces': faces,
+        'num_faces': len(faces),
+        'face_ratio': face_area / float(image.size[0] * image.size[1]),
+    }
+
+def prescreen_photo(document):
+    """Triagem de fotos ANTES do OCR
+
+    Classifica fotos de pessoas/paisagens a partir de uma miniatura (saturação,
+    fração de papel, densidade de bordas e rostos). Só decide quando a
+    confiança atinge PHOTO_PRESCREEN_THRESHOLD (PHOTO_PRESCREEN_LANDSCAPE_THRESHOLD
+    para paisagens); nos demais casos retorna None e o documento segue para o
+    OCR normalmente.
+
+    document: caminho ou DocumentContext (a imagem decodificada fica no contexto
+    e é reaproveitada pelo OCR). O resultado é memorizado no contexto.
+    """
+    ctx = as_document_context(document)
+    if ctx.photo_prescreen_done:
+        return ctx.photo_prescreen
+    ctx.photo_prescreen_done = True
+
+    if not PHOTO_PRESCREEN or ctx.file_extension not in ['.jpg', '.jpeg', '.png']:
+        return None
+
+    try:
+        if ctx.image is None:
+            ctx.image = load_image_for_ocr(ctx.file_path)
+        features = extract_photo_features(ctx.image, ctx.faces)
+        ctx.faces = features['faces']
+    except Exception as e:
+        print(f"  Erro na triagem de fotos: {e}")
+        return None
+
+    num_faces = features['num_faces']
+    photo_type, confidence = None, 0.0
+
+    # Muito "papel" (fundo claro sem cor) = documento, mesmo com foto 3x4
+    if features['paper_fraction'] < 0.30:
+        if num_faces >= 2:
+            photo_type, confidence = "couple_group", 0.90
+        elif num_faces == 1 and features['face_ratio'] > 0.20:
+            photo_type, confidence = "selfie_portrait", 0.90
+        elif num_faces == 1 and features['face_ratio'] > 0.10:
+            photo_type, confidence = "single_person", 0.85
+        elif (num_faces == 0 and features['saturation'] > 40 and
+              features['paper_fraction'] < 0.10 and features['edge_density'] < 0.15):
+            photo_type, confidence = "landscape", 0.80
+
+    print(f"  [Triagem] saturação {features['saturation']:.0f}, papel {features['paper_fraction']:.2f}, "
+          f"bordas {features['edge_density']:.3f}, rostos {num_faces} → {photo_type or 'documento'} ({confidence:.2f})")
+
+    threshold = PHOTO_PRESCREEN_LANDSCAPE_THRESHOLD if photo_type == "landscape" else PHOTO_PRESCREEN_THRESHOLD
+    if photo_type is None or confidence < threshold:
+        return None
+
+    detail_msg = describe_photo_type(photo_type, num_faces)
+    print(f"✓ FOTO DE PESSOAS detectada antes do OCR: {detail_msg}, confiança {confidence:.2f}")
+    ctx.ocr_stats['stage'] = 'photo_prescreen'
+    ctx.photo_prescreen = {
+        'category': 'fotos_pessoas',
+        'category_name': 'Fotos de Pessoas',
+        'confidence': confidence,
+        'method': 'photo_prescreen',
+        'details': detail_msg
+    }
+    return ctx.photo_prescreen
+
+class PixmapArray(np.ndarray):
+    """Array numpy sobre o buffer de amostras de um Pixmap do PyMuPDF (sem cópia)
+
+    Mantém o Pixmap vivo enquanto o array (ou qualquer view dele) existir.
+    """
+
+    def __array_finalize__(self, obj):
+        self.pixmap = getattr(obj, 'pixmap', None)
+
+def pixmap_to_array(pix):
+    """Envolve as amostras do Pixmap em um array numpy (altura x largura [x canais])"""
+    buffer = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)
+    array = buffer.view(PixmapArray)
+    array.pixmap = pix
+    array = array[:, :pix.width * pix.n]
+    if pix.n > 1:
+        array = array.reshape(pix.height, pix.width, pix.n)
+    return array
+
+def compute_render_zoom(width_pt, height_pt, max_size=OCR_TARGET_SIZE, max_zoom=MAX_RENDER_ZOOM):
+    """Zoom que faz a página sair do renderizador já no tamanho final do OCR
+
+    Evita rasterizar em 2x e depois reduzir com LANCZOS (páginas acima de
+    max_size / max_zoom pontos). O teto max_zoom impede que páginas menores
+    sejam ampliadas além da resolução usada até aqui (mais pixels e OCR mais lento).
+    """
+    longest = max(width_pt, height_pt)
+    if longest <= 0:
+        return max_zoom
+    return min(max_zoom, max_size / longest)
+
+def render_page_gray(page, max_size=OCR_TARGET_SIZE):
+    """Renderiza uma página do PDF direto em escala de cinza e no tamanho alvo do OCR
+
+    A matriz vem da área visível da página (page.rect: mediabox/cropbox já com
+    rotação), então não há PNG intermediário nem redimensionamento posterior.
+    """
+    zoom = compute_render_zoom(page.rect.width, page.rect.height, max_size)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    return pixmap_to_array(pix)
+
+def preprocess_image_for_ocr(image):
+    """Pré-processa imagem para melhorar precisão do OCR
+
+    OTIMIZADO: Análise (inclinação, histograma, ruído) numa cópia reduzida e
+    operações escolhidas aplicadas uma única vez em resolução total, dentro de
+    um orçamento de tempo por página (PREPROCESS_TIME_BUDGET_MS).
+    PREPROCESS_MODE=fast mantém apenas a binarização Otsu.
+    Aceita imagem PIL ou array numpy; arrays seguem como arrays (sem conversões)
+    """
+    try:
+        # Converte PIL Image para numpy array (OpenCV); arrays são usados sem cópia
+        is_array = isinstance(image, np.ndarray)
+        img_array = image if is_array else np.asarray(image)
+
+        # Converte para escala de cinza se necessário
+        if len(img_array.shape) == 3:
+            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        else:
+            gray = img_array
+
+        if PREPROCESS_MODE == 'fast':
+            # MODO RÁPIDO: apenas redimensionamento leve + binarização simples
+            height, width = gray.shape
+            if height < 800 or width < 800:
+                scale_factor = 1.3
+                gray = cv2.resize(gray, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_LINEAR)
+
+            # Binarização Otsu apenas (muito rápida)
+            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+            print("  ⚡ Pré-processamento rápido")
+            return binary if is_array else Image.fromarray(binary)
+
+        # MODO QUALIDADE: plano decidido em baixa resolução, aplicado uma vez
+        processed, plan = preprocess_for_ocr(gray)
+        print(f"  Pré-processamento: {plan['binarization']}, inclinação {plan['angle']:.1f}°, "
+              f"filtro de ruído {'sim' if plan['denoise'] else 'não'} ({plan['elapsed_ms']}ms)")
+        if plan['skipped']:
+            print(f"  Orçamento de tempo esgotado, etapas puladas: {', '.join(plan['skipped'])}")
+
+        # Converte de volta para PIL Image (entrada PIL)
+        return processed if is_array else Image.fromarray(processed)
+
+    except Exception as e:
+        print(f"  Erro no pré-processamento, usando imagem original: {e}")
+        return image
+
+def extract_month_year_from_bulletin(text):
+    """Extrai mês e ano de um bulletin de salaire francês"""
+    if not text:
+        return None, None
+
+    text_lower = text.lower()
+
+    # Mapeamento de meses em francês
+    meses_fr = {
+        'janvier': '01', 'jan': '01',
+        'février': '02', 'fevrier': '02', 'fev': '02', 'fév': '02',
+        'mars': '03', 'mar': '03',
+        'avril': '04', 'avr': '04',
+        'mai': '05',
+        'juin': '06',
+        'juillet': '07', 'juil': '07',
+        'août': '08', 'aout': '08',
+        'septembre': '09', 'sept': '09', 'sep': '09',
+        'octobre': '10', 'oct': '10',
+        'novembre': '11', 'nov': '11',
+        'décembre': '12', 'decembre': '12', 'dec': '12', 'déc': '12'
+    }
+
+    # Procura por padrão "Période : Mês Ano" ou "Période: Mês Ano"
+    import re
+
+    # Padrão 1: "Période : Juillet 2025" ou "période: juillet 2025"
+    match = re.search(r'période\s*[:：]\s*([a-zéèêâû]+)\s+(\d{4})', text_lower)
+    if match:
+        mes_texto = match.group(1).strip()
+        ano = match.group(2)
+        mes_num = meses_fr.get(mes_texto)
+        if mes_num:
+            return mes_num, ano
+
+    # Padrão 2: "07/2025" ou "07 2025"
+    match = re.search(r'(\d{2})[/\s-](\d{4})', text)
+    if match:
+        return match.group(1), match.group(2)
+
+    # Padrão 3: Mês por extenso seguido de ano
+    for mes_nome, mes_num in meses_fr.items():
+        pattern = rf'{mes_nome}\s+(\d{{4}})'
+        match = re.search(pattern, text_lower)
+        if match:
+            return mes_num, match.group(1)
+
+    return None, None
+
+# Palavras-chave que indicam documento em francês (dispara OCR bi-idioma)
+FRENCH_KEYWORDS = ['attestation', 'préfecture', 'prefecture', 'tribunal', 'monsieur', 'madame', 'bulletin', 'salaire', 'employeur']
+# Marcadores fortes de português (o francês não usa til)
+PORTUGUESE_KEYWORDS = ['ção', 'ções', 'ão ', 'república', 'brasil', 'cpf', 'certidão']
+OCR_PROBE_SIZE = 800  # Lado maior da imagem na sondagem de idioma (baixa resolução)
+
+def new_ocr_stats():
+    """Estatísticas de OCR por documento (passadas executadas e economizadas)
+
+    stage: estágio que produziu o texto final ('header', 'page1', 'full',
+    'text_layer') ou None se não houve extração.
+    words/confidence_sum: palavras do OCR e soma das suas confianças (0-100)
+    """
+    return {'pages': 0, 'passes': 0, 'probe_passes': 0, 'passes_saved': 0, 'languages': [], 'stage': None,
+            'lowres_pages': 0, 'escalations': 0, 'seconds_saved': 0.0, 'resolutions': [], 'text_layer_scores': [],
+            'words': 0, 'confidence_sum': 0.0}
+
+def merge_ocr_stats(stats, other, count_pages=True):
+    """Soma as estatísticas de OCR de uma página (ou recorte) nas do documento"""
+    for key in ('passes', 'probe_passes', 'passes_saved', 'lowres_pages', 'escalations', 'seconds_saved',
+                'words', 'confidence_sum'):
+        stats[key] += other[key]
+    if count_pages:
+        stats['pages'] += other['pages']
+        stats['languages'].extend(other['languages'])
+        stats['resolutions'].extend(other['resolutions'])
+
+def detect_ocr_language(processed_image, filename="", hint_text=""):
+    """Decide o idioma do OCR ANTES da passada em resolução total
+
+    Ordem: dicas do nome do arquivo / camada de texto / página anterior e, se
+    inconclusivo, uma sondagem rápida em baixa resolução com fra+por.
+    (OSD do Tesseract só detecta o script — latino nos dois casos — por isso não é usado.)
+
+    A sondagem roda na escala da passada em baixa resolução (OCR_LOWRES_SCALE,
+    no mínimo OCR_PROBE_SIZE), então o seu layout serve também como a tentativa
+    barata de ocr_multiresolution em vez de somar mais uma passada.
+
+    Retorna: (lang: str, probe) com probe None quando o idioma veio das dicas
+    ou {'layout', 'scale', 'seconds'} da sondagem
+    """
+    hints = f"{filename} {hint_text}".lower()
+    if any(kw in hints for kw in FRENCH_KEYWORDS):
+        print(f"  Idioma definido por dica: fra+por")
+        return 'fra+por', None
+    if len(hint_text.strip()) >= 50 and any(kw in hints for kw in PORTUGUESE_KEYWORDS):
+        print(f"  Idioma definido por dica: por")
+        return 'por', None
+
+    # Sondagem em baixa resolução
+    image = np.asarray(processed_image)
+    height, width = image.shape[:2]
+    scale = min(1.0, max(OCR_PROBE_SIZE / max(height, width), OCR_LOWRES_SCALE if MULTIRES_OCR else 0.0))
+    probe_image = image
+    if scale < 1.0:
+        probe_image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    start_time = time.time()
+    probe_layout = get_ocr_backend().image_to_data(probe_image, lang='fra+por')
+    probe = {'layout': probe_layout, 'scale': scale, 'seconds': time.time() - start_time}
+    probe_text = layout_to_text(probe_layout).lower()
+
+    if any(kw in probe_text for kw in FRENCH_KEYWORDS):
+        lang = 'fra+por'
+    elif len(probe_text.strip()) >= 50:
+        lang = 'por'
+    else:
+        lang = 'fra+por'  # Pouco texto / ambíguo: uma única passada cobre os dois idiomas
+    print(f"  Idioma definido por sondagem: {lang}")
+    return lang, probe
+
+def estimate_legacy_passes(text, lang):
+    """Passadas que o fluxo antigo (por → fra se curto → fra+por se francês) teria feito
+
+    O fluxo antigo decidia pelo texto da passada 'por'. Quando a página foi
+    lida em 'por', o texto final é esse texto; quando foi lida em fra+por, o
+    texto 'por' não existe e a estimativa é um limite inferior: a passada
+    'por' mais a fra+por que as palavras francesas teriam disparado.
+    """
+    is_french = any(kw in text.lower() for kw in FRENCH_KEYWORDS)
+    if lang == 'por':
+        return 1 + (len(text.strip()) < 50) + is_french
+    return 1 + is_french
+
+def ocr_with_language_routing(processed_image, filename="", hint_text="", stats=None, page_layout=None, y_offset=0):
+    """Aplica OCR na página no idioma escolhido antes (no máximo duas execuções do Tesseract)
+
+    Substitui as passadas sequenciais por → fra → fra+por. O backend persistente
+    (tesserocr) mantém os modelos carregados no worker; pytesseract é o fallback.
+    page_layout: layout da página que recebe as palavras (y_offset: recorte da página)
+    stats['passes'] conta todas as execuções, inclusive a sondagem (também em probe_passes).
+    """
+    lang, probe = detect_ocr_language(processed_image, filename, hint_text)
+    text, resolution, escalated, seconds_saved, layout, passes = ocr_multiresolution(processed_image, lang, probe)
+    if probe is not None and not escalated and (resolution == 'low' or probe['scale'] >= 1.0):
+        lang = 'fra+por'  # O texto final é o da sondagem
+    print(f"  OCR ({lang}, resolução {resolution}): {len(text)} caracteres extraídos")
+
+    if page_layout is not None:
+        append_layout_words(page_layout, layout, y_offset)
+        page_layout['rows'] = y_offset + np.asarray(processed_image).shape[0]
+
+    if stats is not None:
+        probe_passes = 1 if probe is not None else 0
+        total_passes = probe_passes + passes
+        stats['pages'] += 1
+        stats['passes'] += total_passes
+        stats['probe_passes'] += probe_passes
+        stats['passes_saved'] += max(0, estimate_legacy_passes(text, lang) - total_passes)
+        stats['languages'].append(lang)
+        stats['resolutions'].append(resolution)
+        stats['lowres_pages'] += resolution == 'low'
+        stats['escalations'] += escalated
+        stats['seconds_saved'] += seconds_saved
+        stats['words'] += len(layout['words'])
+        stats['confidence_sum'] += sum(word[5] for word in layout['words'])
+
+    return text
+
+def ocr_multiresolution(processed_image, lang, probe=None):
+    """OCR em dois níveis: passada barata em baixa resolução e, só quando a
+    confiança média das palavras ou o tamanho do texto ficam abaixo dos
+    limiares, a passada em resolução total
+
+    O texto é derivado do layout de palavras (image_to_data); as caixas da
+    passada em baixa resolução são convertidas para as coordenadas da imagem.
+    probe: sondagem de idioma de detect_ocr_language; ocupa o lugar da passada
+    em baixa resolução (ou da única passada, se já foi em resolução total).
+
+    Retorna: (texto, resolução 'low'|'full', escalou: bool, segundos economizados estimados, layout,
+    execuções do Tesseract feitas aqui)
+    """
+    backend = get_ocr_backend()
+    image = np.asarray(processed_image)
+    height, width = image.shape[:2]
+
+    if probe is not None and probe['scale'] >= 1.0:
+        # Imagem pequena: a sondagem já leu a página em resolução total
+        return layout_to_text(probe['layout']), 'full', False, 0.0, probe['layout'], 0
+
+    # Imagens pequenas (ou o modo desligado) vão direto para a resolução total
+    if not MULTIRES_OCR or max(height, width) <= OCR_PROBE_SIZE:
+        layout = backend.image_to_data(image, lang=lang)
+        return layout_to_text(layout), 'full', False, 0.0, layout, 1
+
+    if probe is not None:
+        layout, scale, low_seconds, passes = probe['layout'], probe['scale'], probe['seconds'], 0
+    else:
+        scale = OCR_LOWRES_SCALE
+        low = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        start_time = time.time()
+        layout = backend.image_to_data(low, lang=lang)
+        low_seconds = time.time() - start_time
+        passes = 1
+    text = layout_to_text(layout)
+    confidence = mean_confidence(layout)
+
+    if confidence >= OCR_ESCALATION_MIN_CONF and len(text.strip()) >= OCR_ESCALATION_MIN_CHARS:
+        # Estimativa: o custo do Tesseract cresce com o número de pixels
+        seconds_saved = low_seconds / (scale ** 2) - low_seconds
+        print(f"  ⚡ Baixa resolução suficiente (confiança {confidence:.0f}, {len(text.strip())} chars)")
+        return text, 'low', False, seconds_saved, scale_layout(layout, width, height), passes
+
+    print(f"  Escalando para resolução total (confiança {confidence:.0f}, {len(text.strip())} chars)")
+    layout = backend.image_to_data(image, lang=lang)
+    # A sondagem rodaria de qualquer forma (idioma): só a passada própria em baixa resolução é perda
+    lost_seconds = low_seconds if probe is None else 0.0
+    return layout_to_text(layout), 'full', True, -lost_seconds, layout, passes + 1
+
+def new_page_layout(page_number, processed_image):
+    """Layout vazio de uma página (coordenadas da imagem pré-processada)
+
+    rows: linhas da imagem, a partir do topo, que já passaram pelo OCR
+    (menos que height quando o OCR progressivo parou no cabeçalho).
+    """
+    height, width = np.asarray(processed_image).shape[:2]
+    return {'page': page_number, 'width': width, 'height': height, 'rows': 0, 'words': []}
+
+def cached_page_layout(resume, page_number, processed_image):
+    """Layout em cache de uma página já lida em parte, se corresponder à página renderizada agora"""
+    if not resume:
+        return None
+    height, width = np.asarray(processed_image).shape[:2]
+    for page_layout in resume.get('pages', []):
+        if (page_layout['page'] == page_number and page_layout.get('rows')
+                and (page_layout['width'], page_layout['height']) == (width, height)):
+            return page_layout
+    return None
+
+def scale_layout(layout, width, height):
+    """Converte as caixas de um layout para uma imagem de width x height"""
+    scale_x = width / max(1, layout['width'])
+    scale_y = height / max(1, layout['height'])
+    words = [[word[0], int(word[1] * scale_x), int(word[2] * scale_y), int(word[3] * scale_x),
+              int(word[4] * scale_y)] + word[5:] for word in layout['words']]
+    return {'width': width, 'height': height, 'words': words}
+
+def append_layout_words(page_layout, layout, y_offset=0):
+    """Acrescenta as palavras de um recorte ao layout da página
+
+    Desloca as caixas pelo topo do recorte e renumera os blocos para que as
+    linhas de recortes diferentes não se misturem.
+    """
+    block_offset = max((word[6] for word in page_layout['words']), default=0)
+    for word in layout['words']:
+        page_layout['words'].append([word[0], word[1], word[2] + y_offset, word[3], word[4],
+                                     word[5], word[6] + block_offset, word[7], word[8]])
+
+def new_document_layout():
+    """Layout de um documento: uma entrada por página OCRizada"""
+    return {'pages': []}
+
+def get_page_executor():
+    """Retorna o pool de threads compartilhado para OCR de páginas (um por processo)
+
+    Tesseract, OpenCV e a renderização liberam o GIL, então threads bastam aqui.
+    """
+    global page_executor
+    with page_executor_lock:
+        if page_executor is None:
+            if os.environ.get('PAGE_OCR_WORKERS'):
+                workers = max(1, int(os.environ['PAGE_OCR_WORKERS']))
+            else:
+                workers = max(1, (os.cpu_count() or 1) // ocr_pool_size)
+            page_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='page-ocr')
+        return page_executor
+
+def set_ocr_pool_size(pool_size):
+    """Registra quantos workers do pool de OCR dividem as CPUs com a OCR de páginas"""
+    global ocr_pool_size
+    ocr_pool_size = max(1, pool_size)
+
+def ocr_pages_concurrently(page_loaders, filename="", hint_text="", stats=None, context=None, page_numbers=None,
+                           layout=None):
+    """Renderiza → pré-processa → aplica OCR em várias páginas de forma sobreposta
+
+    page_loaders: lista de funções que retornam a imagem de cada página (PIL ou array numpy)
+    page_numbers: número (1-based) de cada página da lista; padrão 1, 2, ...
+    layout: layout do documento que recebe as palavras de cada página
+    Retorna o texto das páginas concatenado na ordem original.
+    """
+    if page_numbers is None:
+        page_numbers = list(range(1, len(page_loaders) + 1))
+
+    def process_page(page_number, load_page):
+        image = load_page()
+        image = compress_image_for_ocr(image, max_size=OCR_TARGET_SIZE)
+        print(f"  Pré-processando página {page_number}...")
+        processed_image = preprocess_image_for_ocr(image)
+        page_stats = new_ocr_stats()
+        page_layout = new_page_layout(page_number, processed_image)
+        page_text = ocr_with_language_routing(processed_image, filename, hint_text, page_stats, page_layout)
+        print(f"  Página {page_number}: {len(page_text)} caracteres extraídos via OCR")
+        return image, page_text, page_stats, page_layout
+
+    executor = get_page_executor()
+    futures = [executor.submit(process_page, page_number, loader)
+               for page_number, loader in zip(page_numbers, page_loaders)]
+
+    page_texts = []
+    for page_number, future in zip(page_numbers, futures):
+        try:
+            image, page_text, page_stats, page_layout = future.result()
+        except Exception as ocr_error:
+            print(f"  Erro no OCR da página {page_number}: {ocr_error}")
+            continue
+
+        page_texts.append(page_text)
+        if context is not None:
+            context.pages.append(image)
+        if stats is not None:
+            merge_ocr_stats(stats, page_stats)
+        if layout is not None:
+            layout['pages'].append(page_layout)
+
+    return "\n".join(page_texts)
+
+def find_header_split(processed_image, fraction=HEADER_BAND_FRACTION):
+    """Linha onde cortar a faixa do cabeçalho sem partir uma linha de texto
+
+    Procura, perto de `fraction` da altura, a linha da imagem binarizada com
+    menos pixels escuros (espaço entre linhas de texto).
+    """
+    height = processed_image.shape[0]
+    target = int(height * fraction)
+    window = max(1, int(height * 0.05))
+    start, end = max(1, target - window), min(height - 1, target + window)
+    if end <= start:
+        return target
+
+    ink_per_row = (processed_image[start:end] < 128).sum(axis=1)
+    return start + int(np.argmin(ink_per_row))
+
+def classification_is_decided(text, categories=None):
+    """Verdadeiro se as regras de conteúdo já decidem com confiança >= PROGRESSIVE_OCR_THRESHOLD"""
+    result = classify_by_content(text.lower(), categories)
+    if result is None:
+        return False
+    print(f"  Regras no texto parcial: {result['category']} (confiança {result['confidence']:.2f})")
+    return round(result['confidence'], 2) >= PROGRESSIVE_OCR_THRESHOLD  # 0.7 + 0.1 < 0.8 em float
+
+def ocr_pages_progressive(page_loaders, filename="", hint_text="", stats=None, context=None, layout=None,
+                          page_numbers=None, resume=None):
+    """OCR progressivo: faixa do cabeçalho → resto da primeira página → demais páginas
+
+    Após cada estágio as regras de conteúdo rodam no texto acumulado e o OCR
+    para assim que a classificação está decidida. A primeira página é
+    pré-processada uma única vez; cabeçalho e resto são recortes da mesma imagem.
+    resume: layout em cache de uma extração progressiva interrompida; as linhas
+    já lidas da primeira página vêm dele e o OCR segue até o fim, sem parada antecipada.
+
+    Retorna: (texto, estágio) com estágio em 'header', 'page1' ou 'full'
+    """
+    if stats is None:
+        stats = new_ocr_stats()
+    if page_numbers is None:
+        page_numbers = list(range(1, len(page_loaders) + 1))
+    first_page = page_numbers[0]
+
+    image = compress_image_for_ocr(page_loaders[0](), max_size=OCR_TARGET_SIZE)
+    if context is not None:
+        context.pages.append(image)
+    print(f"  Pré-processando página {first_page}...")
+    processed_image = np.asarray(preprocess_image_for_ocr(image))
+    page_layout = cached_page_layout(resume, first_page, processed_image)
+    if page_layout is not None:
+        # Linhas já lidas pela extração interrompida: sem Tesseract
+        split_row = page_layout['rows']
+        header_text = layout_to_text(page_layout)
+        print(f"  Página {first_page}: {split_row} linhas reaproveitadas do layout em cache")
+    else:
+        # Estágio 1: faixa do cabeçalho
+        split_row = find_header_split(processed_image)
+        page_layout = new_page_layout(first_page, processed_image)
+        header_text = ocr_with_language_routing(processed_image[:split_row], filename, hint_text, stats,
+                                                page_layout)
+        print(f"  Cabeçalho: {len(header_text)} caracteres extraídos via OCR")
+    if layout is not None:
+        layout['pages'].append(page_layout)
+    if resume is None and classification_is_decided(header_text):
+        print(f"  ⚡ Classificação decidida no cabeçalho - OCR interrompido")
+        return header_text, 'header'
+
+    # Estágio 2: resto da página 1 (o cabeçalho serve de dica de idioma)
+    page_text = header_text
+    if split_row < processed_image.shape[0]:
+        rest_stats = new_ocr_stats()
+        rest_text = ocr_with_language_routing(processed_image[split_row:], filename, f"{hint_text} {header_text}",
+                                              rest_stats, page_layout, y_offset=split_row)
+        merge_ocr_stats(stats, rest_stats, count_pages=False)
+        page_text = f"{header_text}\n{rest_text}"
+        print(f"  Página {first_page}: {len(page_text)} caracteres extraídos via OCR")
+    if len(page_loaders) == 1:
+        return page_text, 'full'
+    if resume is None and classification_is_decided(page_text):
+        print(f"  ⚡ Classificação decidida na página {first_page} - OCR interrompido")
+        return page_text, 'page1'
+
+    # Estágio 3: demais páginas
+    remaining_text = ocr_pages_concurrently(
+        page_loaders[1:], filename, f"{hint_text} {page_text}", stats, context, page_numbers[1:], layout)
+    return f"{page_text}\n{remaining_text}", 'full'
+
+def ocr_pages(page_loaders, filename="", hint_text="", stats=None, context=None, progressive=False, layout=None,
+              page_numbers=None, resume=None):
+    """Aplica OCR nas páginas, de forma progressiva ou completa
+
+    resume: layout em cache de uma extração progressiva interrompida (só no modo completo)
+    Registra em stats['stage'] o estágio que produziu o texto final.
+    """
+    if progressive:
+        text, stage = ocr_pages_progressive(page_loaders, filename, hint_text, stats, context, layout, page_numbers)
+    elif resume and resume.get('pages'):
+        text, stage = ocr_pages_progressive(page_loaders, filename, hint_text, stats, context, layout, page_numbers,
+                                            resume)
+    else:
+        text, stage = ocr_pages_concurrently(page_loaders, filename, hint_text, stats, context,
+                                             page_numbers, layout), 'full'
+    if stats is not None:
+        stats['stage'] = stage
+    return text
+
+def discard_ocr_result(ocr_stats, layout=None):
+    """A camada de texto venceu o OCR: o layout de palavras não corresponde ao texto"""
+    ocr_stats['stage'] = 'text_layer'
+    if layout is not None:
+        layout['pages'] = []
+
+def score_pdf_pages(page_texts, page_areas, ocr_stats):
+    """Nota de qualidade da camada de texto de cada página
+
+    Os componentes são logados para ajustar TEXT_LAYER_MIN_SCORE com o tráfego real.
+    """
+    page_scores = []
+    for page_num, (page_text, page_area) in enumerate(zip(page_texts, page_areas)):
+        quality = score_text_layer(page_text, page_area)
+        print(format_score(page_num + 1, quality))
+        page_scores.append(quality)
+    ocr_stats['text_layer_scores'] = [quality['score'] for quality in page_scores]
+    return page_scores
+
+def ocr_rejected_pdf_pages(page_texts, page_scores, page_has_images, make_page_loader, filename, ocr_stats,
+                           context=None, progressive=False, layout=None, resume=None):
+    """Aplica OCR só nas páginas cuja camada de texto reprovou no score de qualidade
+
+    Páginas aprovadas (ou sem imagem para OCR) mantêm a camada de texto; as
+    reprovadas recebem o texto do OCR, derivado do layout da página.
+    Retorna o texto do documento com as páginas na ordem original.
+    """
+    ocr_stats['stage'] = 'text_layer'
+    rejected = [page_num for page_num, quality in enumerate(page_scores)
+                if not quality['passed'] and page_has_images[page_num]]
+    if not rejected:
+        print(f"  ✓ Camada de texto aprovada em todas as páginas - PULANDO OCR")
+        return "\n".join(page_texts).strip()
+
+    if layout is None:
+        layout = new_document_layout()
+    trusted_text = "\n".join(page_text for page_num, page_text in enumerate(page_texts) if page_num not in rejected)
+    print(f"  Camada de texto reprovada nas páginas {[page_num + 1 for page_num in rejected]}, aplicando OCR...")
+    try:
+        ocr_pages([make_page_loader(page_num) for page_num in rejected], filename, trusted_text, ocr_stats,
+                  context, progressive, layout, [page_num + 1 for page_num in rejected], resume)
+    except Exception as e:
+        print(f"  Erro ao aplicar OCR no PDF: {e}")
+
+    ocr_texts = {page_layout['page']: layout_to_text(page_layout).strip() for page_layout in layout['pages']}
+    # OCR progressivo interrompido: páginas não alcançadas ficam de fora (a camada reprovou)
+    partial = ocr_stats['stage'] in PARTIAL_OCR_STAGES
+
+    final_texts = []
+    for page_num, page_text in enumerate(page_texts):
+        ocr_text = ocr_texts.get(page_num + 1, "")
+        if page_num not in rejected:
+            final_texts.append(page_text)
+        elif ocr_text:
+            final_texts.append(ocr_text)
+        elif not partial:
+            final_texts.append(page_text)  # OCR falhou ou veio vazio: fica a camada de texto
+
+    if not any(ocr_texts.values()):
+        discard_ocr_result(ocr_stats, layout)
+    return "\n".join(final_texts).strip()
+
+def extract_pdf_text_pymupdf(file_path, filename, ocr_stats, context=None, progressive=False, layout=None,
+                             resume=None):
+    """Extrai texto de PDF com PyMuPDF abrindo o arquivo UMA única vez
+
+    Camada de texto, detecção de imagens (page.get_images) e renderização para
+    OCR saem do mesmo handle do documento. PDFs que o PyMuPDF não consegue
+    abrir (malformados) seguem pelo caminho do PyPDF2.
+    """
+    try:
+        pdf_document = fitz.open(file_path)
+    except Exception as e:
+        print(f"  PyMuPDF não abriu {filename} ({e}), usando PyPDF2")
+        return extract_pdf_text_pypdf2(file_path, filename, ocr_stats, context, progressive, layout, resume)
+
+    with pdf_document:
+        total_pages = len(pdf_document)
+        print(f"  PDF com {total_pages} páginas")
+
+        # OTIMIZAÇÃO: Para classificação, só precisamos das primeiras 2 páginas
+        max_pages = min(2, total_pages)
+        if max_pages < total_pages:
+            print(f"  Limitando extração às primeiras {max_pages} páginas (suficiente para classificação)")
+
+        page_texts = []
+        page_areas = []
+        page_has_images = []
+        for page_num in range(max_pages):
+            page = pdf_document[page_num]
+            page_text = page.get_text()
+            page_texts.append(page_text)
+            page_areas.append(page.rect.width * page.rect.height)
+
+            # Verifica se a página tem imagens (indicativo de PDF escaneado)
+            page_has_images.append(bool(page.get_images()))
+
+            print(f"  Página {page_num + 1}: {len(page_text)} caracteres extraídos")
+
+        # OTIMIZAÇÃO: OCR só nas páginas cuja camada de texto reprovou
+        page_scores = score_pdf_pages(page_texts, page_areas, ocr_stats)
+
+        # O documento do PyMuPDF não é thread-safe: só a renderização é serializada,
+        # pré-processamento e OCR das páginas rodam em paralelo
+        render_lock = threading.Lock()
+
+        def make_page_loader(page_num):
+            def load_page():
+                with render_lock:
+                    # Renderiza já na resolução alvo do OCR, direto em cinza e sem cópia
+                    return render_page_gray(pdf_document[page_num])
+            return load_page
+
+        return ocr_rejected_pdf_pages(page_texts, page_scores, page_has_images, make_page_loader,
+                                      filename, ocr_stats, context, progressive, layout, resume)
+
+def extract_pdf_text_pypdf2(file_path, filename, ocr_stats, context=None, progressive=False, layout=None,
+                            resume=None):
+    """Fallback sem PyMuPDF: camada de texto via PyPDF2 e OCR via pdf2image"""
+    page_texts = []
+    page_has_images = []
+    page_sizes = []  # (largura, altura) em pontos, para a política de resolução e o score
+
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        total_pages = len(pdf_reader.pages)
+        print(f"  PDF com {total_pages} páginas")
+
+        # OTIMIZAÇÃO: Para classificação, só precisamos das primeiras 2 páginas
+        max_pages = min(2, total_pages)
+        if max_pages < total_pages:
+            print(f"  Limitando extração às primeiras {max_pages} páginas (suficiente para classificação)")
+
+        for page_num in range(max_pages):
+            page = pdf_reader.pages[page_num]
+            page_text = page.extract_text()
+            page_texts.append(page_text)
+            page_sizes.append((float(page.mediabox.width), float(page.mediabox.height)))
+
+            # Verifica se a página tem imagens (indicativo de PDF escaneado)
+            has_images = False
+            try:
+                resources = page.get('/Resources')
+                if resources and '/XObject' in resources:
+                    xobjects = resources['/XObject']
+                    if hasattr(xobjects, 'get_object'):
+                        xobjects = xobjects.get_object()
+                    if isinstance(xobjects, dict):
+                        for obj in xobjects:
+                            if xobjects[obj]['/Subtype'] == '/Image':
+                                has_images = True
+                                break
+            except Exception as e:
+                print(f"  Erro ao verificar imagens na página {page_num + 1}: {e}")
+                has_images = True  # Assume que tem imagens para forçar OCR
+            page_has_images.append(has_images)
+
+            print(f"  Página {page_num + 1}: {len(page_text)} caracteres extraídos")
+
+    # OTIMIZAÇÃO: OCR só nas páginas cuja camada de texto reprovou
+    page_scores = score_pdf_pages(page_texts, [width * height for width, height in page_sizes], ocr_stats)
+
+    def make_page_loader(page_num):
+        def load_page():
+            from pdf2image import convert_from_path
+
+            # Rasteriza só esta página, na mesma resolução alvo do caminho principal
+            width_pt, height_pt = page_sizes[page_num]
+            dpi = 72 * compute_render_zoom(width_pt, height_pt)
+            return convert_from_path(file_path, dpi=dpi, first_page=page_num + 1,
+                                     last_page=page_num + 1, grayscale=True)[0]
+        return load_page
+
+    return ocr_rejected_pdf_pages(page_texts, page_scores, page_has_images, make_page_loader,
+                                  filename, ocr_stats, context, progressive, layout, resume)
+
+def extract_text_from_file(file_path, file_hash=None, context=None, progressive=False, resume=None):
+    """Extrai texto de arquivos PDF ou imagens usando OCR com melhor logging
+
+    OTIMIZADO: Cache + Compressão para melhor performance
+    file_hash: digest calculado no upload (evita reler o arquivo para o cache)
+    context: DocumentContext que recebe as imagens/páginas decodificadas
+    progressive: OCR progressivo (cabeçalho primeiro); o texto pode ser parcial,
+    então só serve para classificação
+    resume: layout em cache de uma extração progressiva interrompida (ver
+    DocumentContext.complete_text); as regiões já lidas não voltam ao OCR
+    """
+    try:
+        if file_hash is None:
+            file_hash = get_file_hash(file_path)
+
+        ocr_stats = context.ocr_stats if context is not None else new_ocr_stats()
+
+        # OTIMIZAÇÃO 1: Verifica cache primeiro (pula OCR se já processado)
+        cached_text = get_cached_ocr(file_path, file_hash, allow_partial=progressive, stats=ocr_stats)
+        if cached_text is not None:
+            return cached_text
+
+        file_extension = os.path.splitext(file_path)[1].lower()
+        filename = os.path.basename(file_path)
+        layout = new_document_layout()  # Palavras, caixas e confianças (gravadas no cache)
+
+        if file_extension == '.pdf':
+            # Extração otimizada de texto de PDF com suporte a OCR para PDFs com imagens
+            print(f"Extraindo texto de PDF: {filename}")
+            if fitz is not None:
+                extracted_text = extract_pdf_text_pymupdf(file_path, filename, ocr_stats, context, progressive,
+                                                          layout, resume)
+            else:
+                extracted_text = extract_pdf_text_pypdf2(file_path, filename, ocr_stats, context, progressive,
+                                                         layout, resume)
+
+            print(f"Total extraído do PDF: {len(extracted_text)} caracteres")
+            save_to_cache(file_path, extracted_text, file_hash, ocr_stats['stage'], layout)
+            return extracted_text
+            
+        elif file_extension in ['.jpg', '.jpeg', '.png']:
+            # OCR para imagens com pré-processamento
+            print(f"Aplicando OCR em imagem: {filename}")
+            try:
+                # Reaproveita a imagem já decodificada (ex.: pela triagem de fotos)
+                if context is not None and context.image is not None:
+                    image = context.image
+                else:
+                    image = load_image_for_ocr(file_path)
+                print(f"  Dimensões da imagem: {image.size}")
+                if context is not None:
+                    context.image = image
+
+                # OCR com idioma roteado (--oem 3: LSTM, --psm 6: bloco uniforme de texto)
+                try:
+                    if progressive or resume:
+                        text = ocr_pages([lambda: image], filename, "", ocr_stats, progressive=progressive,
+                                         layout=layout, resume=resume)
+                    else:
+                        # Pré-processa a imagem para melhorar OCR
+                        print("  Iniciando pré-processamento da imagem...")
+                        processed_image = preprocess_image_for_ocr(image)
+                        page_layout = new_page_layout(1, processed_image)
+                        text = ocr_with_language_routing(processed_image, filename, "", ocr_stats, page_layout)
+                        layout['pages'].append(page_layout)
+                        ocr_stats['stage'] = 'full'
+
+                except Exception as e:
+                    print(f"  Erro no OCR: {e}")
+                    text = ""
+
+                extracted_text = text.strip()
+                if extracted_text:
+                    print(f"  Texto extraído com sucesso: {len(extracted_text)} caracteres")
+                    # Mostra uma amostra do texto extraído para debug
+                    sample = extracted_text[:100].replace('\n', ' ')
+                    print(f"  Amostra: {sample}...")
+                else:
+                    print("  Nenhum texto foi extraído da imagem")
+
+                save_to_cache(file_path, extracted_text, file_hash, ocr_stats['stage'], layout)
+                return extracted_text
+
+            except Exception as ocr_error:
+                print(f"Erro no OCR para {filename}: {ocr_error}")
+                return ""
+        
+        print(f"Formato não suportado para extração: {file_extension}")
+        return ""
+        
+    except Exception as e:
+        print(f"Erro ao extrair texto de {file_path}: {e}")
+        return ""
+
+def separate_documents_from_pdf(file_path):
+    """Separa um PDF em documentos individuais por página"""
+    try:
+        documents = []
+        if fitz is not None:
+            try:
+                with fitz.open(file_path) as pdf_document:
+                    for page_num, page in enumerate(pdf_document):
+                        page_text = page.get_text().strip()
+                        if page_text:  # Só inclui páginas com texto
+                            documents.append({
+                                'page_number': page_num + 1,
+                                'text': page_text,
+                                'filename': f"{os.path.splitext(os.path.basename(file_path))[0]}_pagina_{page_num + 1}.pdf"
+                            })
+                return documents
+            except Exception as e:
+                # PDF malformado para o PyMuPDF: tenta o PyPDF2, que é mais tolerante em alguns casos
+                print(f"  PyMuPDF não abriu {file_path} ({e}), usando PyPDF2")
+                documents = []
+
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            
+            for page_num, page in enumerate(pdf_reader.pages):
+                # Extrai texto da página
+                page_text = page.extract_text().strip()
+                
+                if page_text:  # Só inclui páginas com texto
+                    documents.append({
+                        'page_number': page_num + 1,
+                        'text': page_text,
+                        'filename': f"{os.path.splitext(os.path.basename(file_path))[0]}_pagina_{page_num + 1}.pdf"
+                    })
+        
+        return documents
+    except Exception as e:
+        print(f"Erro ao separar PDF {file_path}: {e}")
+        return []
+
+def detect_document_boundaries(text):
+    """Detecta possíveis limites entre documentos em um texto"""
+    # Padrões que indicam início de novo documento
+    document_markers = [
+        r'REPÚBLICA FEDERATIVA DO BRASIL',
+        r'CERTIDÃO DE NASCIMENTO',
+        r'CARTEIRA DE TRABALHO',
+        r'CARTEIRA NACIONAL DE HABILITAÇÃO',
+        r'REGISTRO GERAL',
+        r'CADASTRO DE PESSOA FÍSICA',
+        r'COMPROVANTE DE RESIDÊNCIA',
+        r'HOLERITE',
+        r'FOLHA DE PAGAMENTO',
+        r'CONTRATO',
+        r'PROCURAÇÃO',
+        r'PETIÇÃO INICIAL',
+        r'SENTENÇA',
+        r'NOTA FISCAL'
+    ]
+    
+    import re
+    boundaries = [0]  # Sempre começa no início
+    
+    for marker in document_markers:
+        matches = re.finditer(marker, text, re.IGNORECASE)
+        for match in matches:
+            pos = match.start()
+            if pos > 100:  # Evita detectar o mesmo documento
+                boundaries.append(pos)
+    
+    boundaries = sorted(list(set(boundaries)))  # Remove duplicatas e ordena
+    return boundaries
+
+def classify_offline_fallback(file_path, categories=None, text=None, file_hash=None):
+    """Classificação offline usando padrões de nome de arquivo e conteúdo OCR
+
+    file_path: caminho ou DocumentContext (reaproveita o texto já extraído)
+    """
+    if categories is None:
+        categories = DOCUMENT_TYPES
+
+    ctx = as_document_context(file_path, file_hash)
+
+    # Extrai texto apenas se nenhum estágio anterior já o fez
+    if text is not None:
+        ctx.text = text
+    text = ctx.text
+
+    filename = ctx.filename
+    filename_matches = ctx.filename_matches
+    rules = ctx.rules
+
+    print(f"  [Offline] Analisando: {filename}")
+    print(f"  [Offline] Texto disponível: {len(text)} caracteres")
+    
+    # Classificação baseada no nome do arquivo com confiança alta
+    for rule in rules.filename_rules:
+        if any(keyword in filename_matches for keyword in rule.keywords):
+            return {
+                'category': rule.category,
+                'category_name': categories.get(rule.category, rule.category.title()),
+                'method': 'offline_filename',
+                'confidence': rule.confidence,
+                'rules_version': rules.version
+            }
+    
+    # Classificação baseada no conteúdo OCR com padrões mais específicos
+    content_result = classify_by_content(ctx.text_lower, categories, ctx.keyword_matches, rules)
+    if content_result is not None:
+        return content_result
+
+    # Fallback final
+    return {
+        'category': 'outros',
+        'category_name': categories.get('outros', 'Outros Documentos'),
+        'method': 'offline_fallback',
+        'confidence': 0.1,
+        'rules_version': rules.version
+    }
+
+def classify_by_content(text_lower, categories=None, keyword_matches=None, rules=None):
+    """Regras de conteúdo da classificação offline
+
+    Também roda sobre texto parcial (faixa do cabeçalho) no OCR progressivo.
+    keyword_matches: padrões já encontrados no texto pelo autômato das regras
+    (calculado aqui se não vier do DocumentContext)
+    rules: RuleSet a usar (padrão: o ativo)
+    Retorna o resultado da regra que decidiu ou None se nenhuma casou.
+    """
+    if categories is None:
+        categories = DOCUMENT_TYPES
+    if rules is None:
+        rules = get_rules()
+
+    if text_lower:
+        # Uma passada no texto; as regras abaixo só consultam o conjunto de casamentos
+        if keyword_matches is None:
+            keyword_matches = rules.automaton.find_all(text_lower)
+
+        # Regras em ordem de prioridade (jurídicas → específicas → demais); a primeira
+        # com frases suficientes e sem termos de exclusão decide
+        for rule in rules.content_rules:
+            matches = sum(1 for phrase in rule.phrases if phrase in keyword_matches)
+            if matches < rule.min_matches:
+                continue
+            if any(term in keyword_matches for term in rule.exclude):
+                continue
+            return {
+                'category': rule.category,
+                'category_name': categories.get(rule.category, rule.category.title()),
+                'method': rule.method,
+                'confidence': rule_confidence(rule, matches),
+                'rules_version': rules.version
+            }
+
+    return None
+
+def test_openai_connection(api_key):
+    """Função desabilitada - não usa mais OpenAI"""
+    return True, "OCR-only mode"
+
+def classify_people_photo(ctx, text_content):
+    """Classifica como foto de pessoas pela detecção de rostos; None se não for
+
+    Roda antes das regras de texto: evita conflito com documentos que contêm
+    fotos (RG, CNH, Passaporte).
+    """
+    is_people_photo, photo_confidence, num_faces, photo_type = detect_people_photo(ctx, text_content)
+    if is_people_photo and photo_confidence > 0.70:  # Reduzido de 0.80 para 0.70 (mais sensível)
+        # Mensagem personalizada baseada no tipo de foto
+        detail_msg = describe_photo_type(photo_type, num_faces)
+
+        print(f"✓ FOTO DE PESSOAS detectada: {detail_msg}, confiança {photo_confidence:.2f}")
+        return {
+            'category': 'fotos_pessoas',
+            'category_name': 'Fotos de Pessoas',
+            'confidence': photo_confidence,
+            'method': 'face_detection',
+            'details': detail_msg
+        }
+    return None
+
+def classify_document_hybrid(file_path, api_key=None, categories=None, file_hash=None):
+    """Classificação baseada em OCR + Regras (sem IA)
+
+    file_path: caminho ou DocumentContext (o texto é extraído uma única vez)
+    """
+    if categories is None:
+        categories = load_categories()
+
+    ctx = as_document_context(file_path, file_hash)
+    file_path = ctx.file_path
+    filename = ctx.filename
+
+    # 0. TRIAGEM DE FOTOS ANTES DO OCR (fotos confiantes nunca passam pelo Tesseract)
+    prescreen_result = prescreen_photo(ctx)
+    if prescreen_result is not None:
+        return prescreen_result
+
+    # 1. PRIMEIRO: Extrai texto usando OCR (reaproveita se já extraído)
+    print(f"Extraindo texto via OCR de: {filename}")
+    text_content = ctx.text
+    # Texto parcial do OCR progressivo (só o cabeçalho) não vai para o aprendizado
+    learning_text = None if ctx.ocr_stats['stage'] in PARTIAL_OCR_STAGES else text_content
+
+    # 1.5. DETECÇÃO DE FOTOS DE PESSOAS (antes de outras classificações)
+    photo_result = classify_people_photo(ctx, text_content)
+    if photo_result is not None:
+        return photo_result
+
+    # 2. Detecção aprimorada para documentos franceses específicos
+    keyword_matches = ctx.keyword_matches
+    filename_matches = ctx.filename_matches
+
+    # Detecção forte baseada em padrões dos documentos reais
+    strong_match_category = None
+    strong_match_confidence = 0.0
+
+    for rule in ctx.rules.enhanced_rules:
+        matches = sum(1 for phrase in rule.phrases if phrase in keyword_matches or phrase in filename_matches)
+        if matches >= rule.min_matches:  # Padrão: pelo menos 2 padrões encontrados
+            confidence = rule_confidence(rule, matches)
+            if confidence > strong_match_confidence:
+                strong_match_category = rule.category
+                strong_match_confidence = confidence
+
+    # 3. Classificação baseada em regras com texto OCR
+    rule_result = classify_offline_fallback(ctx, categories)
+    print(f"Regras classificaram como: {rule_result['category']} (confiança: {rule_result['confidence']})")
+
+    # Sobrescreve com detecção forte se encontrada
+    if strong_match_category:
+        print(f"Padrões aprimorados detectaram: {strong_match_category} (confiança: {strong_match_confidence})")
+        rule_result['category'] = strong_match_category
+        rule_result['category_name'] = categories.get(strong_match_category, 'Outros Documentos')
+        rule_result['confidence'] = strong_match_confidence
+
+    # 4. Verifica sistema de aprendizado
+    learned_category, learned_confidence = learning_system.get_intelligent_classification(filename, text_content)
+    if learned_category:
+        print(f"Sistema aprendido sugere: {learned_category} (confiança: {learned_confidence})")
+
+    # Valida semanticamente o resultado das regras
+    semantic_validation = validate_classification_semantically(rule_result['category'], text_content, ctx)
+    rule_result['confidence'] = min(0.98, rule_result['confidence'] * semantic_validation)
+
+    # REGRA CRÍTICA 1: Se classificou como "outros", assertividade = N/A
+    if rule_result['category'] == 'outros':
+        rule_result['confidence'] = 'N/A'
+        print(f"Categoria 'outros' detectada, assertividade definida como N/A")
+
+    # REGRA CRÍTICA 2: Se classificou em categoria específica, confiança mínima de 30%
+    elif isinstance(rule_result['confidence'], (int, float)) and rule_result['confidence'] == 0.0:
+        rule_result['confidence'] = 0.30
+        print(f"Confiança 0% corrigida para mínimo de 30% (categoria específica: {rule_result['category']})")
+
+    # 4. LÓGICA OTIMIZADA: Usa IA apenas quando realmente necessário
+    confidence_threshold = 0.70
+    use_ai_threshold = 0.85  # Só chama IA se confiança for menor que isso
+
+    # Tratamento especial para confiança N/A (categoria "outros")
+    if rule_result['confidence'] == 'N/A':
+        learning_system.record_classification(filename, rule_result['category'], 0, learning_text)
+        return {
+            'category': rule_result['category'],
+            'category_name': rule_result['category_name'],
+            'method': 'rules_outros_category',
+            'confidence': 'N/A'
+        }
+
+    # Retorna resultado das regras (sem IA)
+    if rule_result['category'] != 'outros':
+        print(f"Classificação por regras: {rule_result['category']} ({rule_result['confidence']})")
+        learning_system.record_classification(filename, rule_result['category'], rule_result['confidence'], learning_text)
+        return {
+            'category': rule_result['category'],
+            'category_name': rule_result['category_name'],
+            'method': 'rules_ocr_only',
+            'confidence': rule_result['confidence']
+        }
+
+    # Categoria "outros" - sem IA
+    if False:
+        # Aplica IA apenas para validação cruzada com threshold mais alto
+        if api_key:
+            try:
+                print(f"Validando com IA a classificação por regras: {rule_result['category']}")
+                ai_result = classify_with_ai(file_path, api_key, categories)
+                print(f"IA classificou como: {ai_result['category']} (confiança: {ai_result['confidence']})")
+                
+                # Consenso forte: ambos concordam com alta confiança
+                if (ai_result['category'] == rule_result['category'] and 
+                    ai_result['confidence'] >= 0.7 and rule_result['confidence'] >= 0.7):
+                    final_confidence = min(0.98, (rule_result['confidence'] + ai_result['confidence']) / 2 + 0.2)
+                    learning_system.record_classification(filename, rule_result['category'], final_confidence, learning_text)
+                    return {
+                        'category': rule_result['category'],
+                        'category_name': rule_result['category_name'],
+                        'method': 'hybrid_strong_consensus',
+                        'confidence': final_confidence
+                    }
+                
+                # Discordância: analisa qual tem maior confiança e contexto
+                elif ai_result['category'] != rule_result['category']:
+                    # Se ambos têm alta confiança mas discordam, prioriza o método mais específico
+                    if (ai_result['confidence'] >= 0.8 and rule_result['confidence'] >= 0.8):
+                        # Verifica se há padrões específicos no conteúdo que favoreçam uma classificação
+                        text_lower = text_content.lower() if text_content else ""
+                        
+                        # Padrões de alta especificidade para desempate
+                        specific_patterns = {
+                            'passaporte': ['república federativa', 'federal republic', 'passport'],
+                            'rg': ['registro geral', 'carteira de identidade'],
+                            'cpf': ['cadastro de pessoa física', 'receita federal'],
+                            'cnh': ['carteira nacional de habilitação', 'detran'],
+                            'conta_luz': ['kwh', 'energia elétrica', 'distribuidora'],
+                            'conta_agua': ['m³', 'saneamento básico'],
+                            'extrato_bancario': ['saldo anterior', 'saldo atual', 'conta corrente'],
+                            'nota_fiscal': ['cnpj', 'nota fiscal eletrônica', 'chave de acesso']
+                        }
+                        
+                        rule_specificity = sum(1 for pattern in specific_patterns.get(rule_result['category'], []) 
+                                             if pattern in text_lower)
+                        ai_specificity = sum(1 for pattern in specific_patterns.get(ai_result['category'], []) 
+                                           if pattern in text_lower)
+                        
+                        if rule_specificity > ai_specificity:
+                            chosen_result = rule_result
+                            method = 'hybrid_rules_high_specificity'
+                        elif ai_specificity > rule_specificity:
+                            chosen_result = ai_result
+                            method = 'hybrid_ai_high_specificity'
+                        else:
+                            # Em caso de empate, prioriza o com maior confiança
+                            chosen_result = rule_result if rule_result['confidence'] >= ai_result['confidence'] else ai_result
+                            method = 'hybrid_confidence_priority'
+                        
+                        learning_system.record_classification(filename, chosen_result['category'], chosen_result['confidence'], learning_text)
+                        return {
+                            'category': chosen_result['category'],
+                            'category_name': chosen_result['category_name'],
+                            'method': method,
+                            'confidence': chosen_result['confidence']
+                        }
+                
+                # IA retornou "outros" mas regras foram específicas
+                if ai_result['category'] == 'outros' and rule_result['confidence'] >= confidence_threshold:
+                    learning_system.record_classification(filename, rule_result['category'], rule_result['confidence'], learning_text)
+                    return {
+                        'category': rule_result['category'],
+                        'category_name': rule_result['category_name'],
+                        'method': 'hybrid_rules_over_ai_outros',
+                        'confidence': rule_result['confidence']
+                    }
+                    
+            except Exception as e:
+                print(f"Erro na IA, mantendo classificação por regras: {str(e)}")
+        
+        # Validação com sistema aprendido
+        if learned_category and learned_category == rule_result['category'] and learned_confidence > 0.7:
+            final_confidence = min(0.92, (rule_result['confidence'] + learned_confidence) / 2 + 0.15)
+            learning_system.record_classification(filename, rule_result['category'], final_confidence, learning_text)
+            return {
+                'category': rule_result['category'],
+                'category_name': rule_result['category_name'],
+                'method': 'hybrid_rules_learning_consensus',
+                'confidence': final_confidence
+            }
+        
+        # Usa regras com alta confiança
+        learning_system.record_classification(filename, rule_result['category'], rule_result['confidence'], learning_text)
+        return {
+            'category': rule_result['category'],
+            'category_name': rule_result['category_name'],
+            'method': 'rules_high_confidence',
+            'confidence': rule_result['confidence']
+        }
+    
+    # 5. Se regras retornaram "outros", aplica IA com mais peso
+    if api_key:
+        try:
+            print(f"Regras incertas, aplicando IA para documento: {filename}")
+            ai_result = classify_with_ai(file_path, api_key, categories)
+            print(f"IA classificou como: {ai_result['category']} (confiança: {ai_result['confidence']})")
+            
+            # Se IA encontrou categoria específica, usa ela
+            if ai_result['category'] != 'outros' and ai_result['confidence'] >= 0.6:
+                # Verifica consenso com sistema aprendido
+                if learned_category and learned_category == ai_result['category'] and learned_confidence > 0.5:
+                    final_confidence = min(0.9, (ai_result['confidence'] + learned_confidence) / 2 + 0.1)
+                    learning_system.record_classification(filename, ai_result['category'], final_confidence, learning_text)
+                    return {
+                        'category': ai_result['category'],
+                        'category_name': ai_result['category_name'],
+                        'method': 'hybrid_ai_learning_consensus',
+                        'confidence': final_confidence
+                    }
+                
+                # Usa IA
+                learning_system.record_classification(filename, ai_result['category'], ai_result['confidence'], learning_text)
+                return {
+                    'category': ai_result['category'],
+                    'category_name': ai_result['category_name'],
+                    'method': 'ai_specific_category',
+                    'confidence': ai_result['confidence']
+                }
+            
+        except Exception as e:
+            print(f"Erro na IA: {str(e)}")
+    
+    # 6. Fallback: usa sistema aprendido se disponível
+    if learned_category and learned_confidence > 0.6:
+        learning_system.record_classification(filename, learned_category, learned_confidence, learning_text)
+        return {
+            'category': learned_category,
+            'category_name': categories.get(learned_category, learned_category),
+            'method': 'learning_fallback',
+            'confidence': learned_confidence
+        }
+    
+    # 7. Último recurso: classificação por regras (mesmo que seja "outros")
+    learning_system.record_classification(filename, rule_result['category'], rule_result['confidence'], learning_text)
+    return rule_result
+
+def classify_with_ai(file_path, api_key, categories):
+    """Função desabilitada - não usa mais IA"""
+    return {
+        'category': 'outros',
+        'category_name': 'Outros Documentos',
+        'method': 'disabled',
+        'confidence': 0.0
+    }
+    
+    # Lista de categorias disponíveis
+    categories_list = list(categories.keys())
+    categories_description = "\n".join([f"- {k}: {v}" for k, v in categories.items()])
+    
+    # Prepara o conteúdo para análise da IA com prompt melhorado
+    if text_content and len(text_content.strip()) >= 10:
+        document_info = f"Conteúdo do documento:\n{text_content[:2000]}"
+    else:
+        document_info = f"Nome do arquivo: {filename}\nConteúdo extraído: {text_content if text_content else 'Não foi possível extrair texto do documento'}"
+    
+    # Exemplos few-shot para melhorar precisão
+    few_shot_examples = """
+EXEMPLOS DE CLASSIFICAÇÃO:
+
+Exemplo 1:
+Conteúdo: "REGISTRO GERAL - RG Nº 12.345.678-9 NOME: João Silva FILIAÇÃO: Maria Silva e José Silva NATURALIDADE: São Paulo-SP SECRETARIA DE SEGURANÇA PÚBLICA"
+Categoria: rg
+
+Exemplo 2:
+Conteúdo: "CEMIG - Companhia Energética de Minas Gerais / Conta de Energia Elétrica / Consumo: 250 kWh / Valor: R$ 180,50 / Endereço: Rua das Flores, 123"
+Categoria: conta_luz
+
+Exemplo 3:
+Conteúdo: "BULLETIN DE SALAIRE / Employeur: ABC France SARL / Salarié: Pierre Dupont / Salaire brut: 2.500,00 EUR / Cotisations sociales: 450,00 EUR / Salaire net: 2.050,00 EUR"
+Categoria: bulletin_salaire
+
+Exemplo 4:
+Conteúdo: "TRIBUNAL ADMINISTRATIF / Requête en référé suspension / Demandeur: Madame Silva / Contre: Préfecture de Paris / Objet: Contestation refus titre de séjour"
+Categoria: refere_suspension
+
+Exemplo 5:
+Conteúdo: "ATTESTATION SUR L'HONNEUR / Je soussigné Monsieur Silva, atteste sur l'honneur héberger mon épouse Madame Silva à titre gratuit / Fait à Paris, le 15/01/2024"
+Categoria: attestation_honneur
+"""
+
+    response = client.chat.completions.create(
+        model="gpt-4o",  # Mudado para gpt-4o (mais preciso que mini)
+        messages=[
+            {
+                "role": "system",
+                "content": f"""Você é um especialista em classificação de documentos brasileiros e franceses com anos de experiência.
+
+CATEGORIAS DISPONÍVEIS:
+{categories_description}
+
+{few_shot_examples}
+
+PROCESSO DE ANÁLISE (Chain-of-Thought):
+1. Leia o conteúdo do documento cuidadosamente
+2. Identifique palavras-chave, números de registro, órgãos emissores
+3. Analise o contexto: é um documento de identidade? comprovante? documento jurídico?
+4. Compare com os exemplos fornecidos
+5. Se houver múltiplas possibilidades, escolha a MAIS ESPECÍFICA
+6. Apenas use 'outros' se realmente não se encaixar em nenhuma categoria
+
+REGRAS IMPORTANTES:
+- Documentos em francês com termos jurídicos (tribunal, préfecture, requête) → categorias jurídicas francesas
+- Contas com consumo em kWh → conta_luz
+- Contas com m³ de água → conta_agua
+- Bulletins de salaire (França) → bulletin_salaire
+- Attestations sur l'honneur → attestation_honneur
+- RG sempre tem "Registro Geral" ou número no formato XX.XXX.XXX-X
+- CPF tem formato XXX.XXX.XXX-XX
+
+Responda APENAS com a categoria (chave), sem explicações."""
+            },
+            {
+                "role": "user",
+                "content": f"Classifique este documento:\n\n{document_info}"
+            }
+        ],
+        max_tokens=50,
+        temperature=0.1  # Baixa temperatura mas não zero (permite alguma criatividade)
+    )
+    
+    category = response.choices[0].message.content.strip().lower()
+    
+    # Valida se a categoria retornada existe
+    if category not in categories:
+        category = 'outros'
+    
+    # Calcula confiança baseada na qualidade do conteúdo
+    confidence = 0.8  # Confiança padrão da IA
+    if text_content and len(text_content.strip()) >= 50:
+        confidence = 0.9  # Mais confiança com mais texto
+    elif not text_content or len(text_content.strip()) < 10:
+        confidence = 0.5  # Menos confiança sem texto
+    
+    return {
+        'category': category,
+        'category_name': categories[category],
+        'method': 'openai_api',
+        'confidence': confidence
+    }
+
+def classify_document(file_path, api_key, categories=None, file_hash=None):
+    """Função principal de classificação - agora usa o sistema híbrido
+
+    file_path: caminho ou DocumentContext
+    """
+    return classify_document_hybrid(file_path, api_key, categories, file_hash)
+
+
+def classify_with_openai_api(filename, text_content, api_key, categories):
+    """Função desabilitada - não usa mais OpenAI"""
+    return 'outros', 0.0
+
+def validate_classification_semantically(category, text_content, context=None, features=None):
+    """Valida se a classificação faz sentido semanticamente com o conteúdo
+
+    context: DocumentContext opcional (reaproveita texto minúsculo e features)
+    features: SemanticFeatures já calculadas (classificação em lote, sem contexto)
+    """
+    if not text_content or len(text_content) < 10:
+        return 0.5  # Confiança neutra sem conteúdo
+
+    if features is None and context is not None:
+        features = context.features
+    elif features is None:
+        text_lower = text_content.lower()
+        features = extract_features(text_content, text_lower, get_rules().automaton.find_all(text_lower))
+    keyword_matches = features.keyword_matches
+
+    # Validações específicas por categoria
+    validations = {
+        'rg': features.has_rg or 'registro geral' in keyword_matches or 'identidade' in keyword_matches,
+        'cpf': features.has_cpf or 'cadastro de pessoa' in keyword_matches,
+        'conta_luz': features.has_kwh or 'energia' in keyword_matches or 'cemig' in keyword_matches,
+        'conta_agua': features.has_m3 or 'saneamento' in keyword_matches or 'sabesp' in keyword_matches,
+        'bulletin_salaire': features.has_salaire and features.language == 'french',
+        'attestation_honneur': features.has_attestation and 'honneur' in keyword_matches,
+        'refere_suspension': features.has_tribunal and 'référé' in keyword_matches,
+        'extrato_bancario': 'saldo' in keyword_matches or 'extrato' in keyword_matches,
+        'nota_fiscal': features.has_cnpj or 'nota fiscal' in keyword_matches,
+    }
+
+    # Retorna confiança boost se validação passou
+    if category in validations:
+        return 1.3 if validations[category] else 0.6
+
+    return 1.0  # Confiança neutra para outras categorias
+
+def compute_ocr_confidence(text_content, ocr_stats):
+    """Confiança do OCR de 0 a 1: média das confianças das palavras reconhecidas
+
+    Sem palavras de OCR (camada de texto do PDF, cache) usa o tamanho do texto;
+    texto parcial do OCR progressivo não é medido pelo tamanho (None).
+    """
+    if ocr_stats.get('words'):
+        return ocr_stats['confidence_sum'] / ocr_stats['words'] / 100
+    if ocr_stats.get('stage') in PARTIAL_OCR_STAGES:
+        return None
+    return min(1.0, len(text_content) / 500) if text_content else 0.0
+
+def build_file_result(filename, classification, text_content, ocr_stats, rules_version):
+    """Resultado de um arquivo no formato da API (por documento ou em lote)
+
+    text_content deve ser o texto completo quando a categoria depende dele
+    (bulletin_salaire: período no nome sugerido); ver DocumentContext.complete_text.
+    """
+    ocr_confidence = compute_ocr_confidence(text_content, ocr_stats)
+
+    suggested_filename = filename
+    if classification['category'] == 'bulletin_salaire':
+        mes, ano = extract_month_year_from_bulletin(text_content)
+        if mes and ano:
+            meses_nome = {
+                '01': 'Janvier', '02': 'Février', '03': 'Mars', '04': 'Avril',
+                '05': 'Mai', '06': 'Juin', '07': 'Juillet', '08': 'Août',
+                '09': 'Septembre', '10': 'Octobre', '11': 'Novembre', '12': 'Décembre'
+            }
+            mes_nome = meses_nome.get(mes, mes)
+            suggested_filename = f"Bulletin_de_salaire_{mes_nome}_{ano}.pdf"
+
+    result = {
+        'filename': filename,
+        'suggested_filename': suggested_filename,
+        'category': classification['category'],
+        'category_name': classification['category_name'],
+        'confidence': classification.get('confidence', 0.0),
+        'method': classification.get('method', 'unknown'),
+        'ocr_confidence': round(ocr_confidence, 2) if ocr_confidence is not None else None,
+        'ocr_passes': ocr_stats['passes'],
+        'ocr_passes_saved': ocr_stats['passes_saved'],
+        'ocr_probe_passes': ocr_stats['probe_passes'],
+        'ocr_languages': ocr_stats['languages'],
+        'ocr_stage': ocr_stats['stage'],
+        'ocr_resolutions': ocr_stats['resolutions'],
+        'ocr_escalations': ocr_stats['escalations'],
+        'ocr_seconds_saved': round(ocr_stats['seconds_saved'], 3),
+        'text_layer_scores': ocr_stats['text_layer_scores'],
+        'rules_version': rules_version,
+        'used_ai': 'ai' in classification.get('method', '').lower() or 'openai' in classification.get('method', '').lower()
+    }
+    if 'category_scores' in classification:
+        result['category_scores'] = classification['category_scores']
+    return result
+
+def process_single_file(filename, file_path, api_key, categories, use_offline_mode, file_hash=None,
+                        defer_classification=False, batch_document=None):
+    """Processa um único arquivo (para uso em threads)
+
+    defer_classification: só extrai o texto e devolve {'deferred': True, ...}
+    para a classificação em lote da sessão (fotos continuam decididas aqui,
+    pois dependem da imagem)
+    batch_document: triagem, rostos e estatísticas de OCR do documento na
+    pré-passada em lote (ocr_image_batch); o texto vem do cache
+    """
+    try:
+        # Contexto único por documento: texto extraído uma vez e reaproveitado por todos os estágios
+        # (OCR progressivo: o texto pode parar no cabeçalho se a classificação já estiver decidida)
+        ctx = DocumentContext(file_path, file_hash, progressive=PROGRESSIVE_OCR)
+        if batch_document is not None:
+            ctx.photo_prescreen = batch_document['photo_prescreen']
+            ctx.photo_prescreen_done = True
+            ctx.faces = batch_document['faces']
+            ctx.ocr_stats = batch_document['ocr_stats']
+
+        # Fotos confiantes são classificadas pela miniatura, sem OCR
+        classification = prescreen_photo(ctx)
+        if classification is not None:
+            text_content = ""
+        else:
+            text_content = ctx.text
+            if defer_classification:
+                if not use_offline_mode:
+                    classification = classify_people_photo(ctx, text_content)
+                if classification is None:
+                    ctx.release_images()
+                    return {
+                        'filename': filename,
+                        'deferred': True,
+                        'file_path': file_path,
+                        'file_hash': ctx.file_hash,
+                        'text': text_content,
+                        'ocr_stats': ctx.ocr_stats
+                    }
+            elif use_offline_mode:
+                classification = classify_offline_fallback(ctx, categories)
+            else:
+                classification = classify_document(ctx, api_key, categories)
+            if classification['category'] == 'bulletin_salaire':
+                # O período pode estar fora do cabeçalho lido pelo OCR progressivo
+                text_content = ctx.complete_text()
+        ctx.release_images()
+
+        return build_file_result(filename, classification, text_content, ctx.ocr_stats, ctx.rules.version)
+    except Exception as e:
+        print(f"[BATCH] Erro ao processar {filename}: {str(e)}")
+        return {
+            'filename': filename,
+            'category': 'outros',
+            'category_name': categories.get('outros', 'Outros Documentos'),
+            'error': str(e)
+        }
+
+def classify_deferred_batch(deferred, categories, use_offline_mode):
+    """Classifica de uma vez os documentos adiados da sessão (BatchClassifier)
+
+    deferred: resultados {'deferred': True, 'filename', 'file_path', 'file_hash', 'text',
+    'ocr_stats'} dos workers
+    Aplica as mesmas etapas da classificação por documento (nome → conteúdo
+    → padrões aprimorados → validação semântica) sobre as decisões vetorizadas;
+    documentos que as regras deixam em "outros" usam o modelo aprendido
+    (regras + feedback) quando ele é confiante; a classificação por documento
+    continua só com as regras (sessões pequenas não consultam o modelo).
+    Retorna os resultados no formato de process_single_file, na mesma ordem.
+    """
+    rules = get_rules()
+    classifier = get_batch_classifier(rules, learning_system.db_path)
+    started = time.time()
+    decisions = classifier.classify([(entry['filename'], entry['text']) for entry in deferred])
+    print(f"[LOTE] {len(deferred)} documentos classificados em {time.time() - started:.2f}s")
+
+    results = []
+    for entry, decision in zip(deferred, decisions):
+        filename, text_content = entry['filename'], entry['text']
+        try:
+            category, confidence, method = decision.category, decision.confidence, decision.method
+            category_name = categories.get(category, category.title())
+            if not use_offline_mode and decision.strong_category:
+                # Padrões aprimorados sobrescrevem as regras (como na classificação híbrida)
+                category, confidence = decision.strong_category, decision.strong_confidence
+                category_name = categories.get(category, 'Outros Documentos')
+            if category == 'outros' and decision.learned_category:
+                category, confidence, method = decision.learned_category, decision.learned_score, 'learned_fallback'
+                category_name = categories.get(category, category.title())
+
+            # Texto parcial do OCR progressivo: completa só quando a categoria precisa do
+            # documento inteiro; senão não vai para o aprendizado
+            ocr_stats = entry['ocr_stats']
+            if category == 'bulletin_salaire' and ocr_stats['stage'] in PARTIAL_OCR_STAGES:
+                ctx = DocumentContext(entry['file_path'], entry['file_hash'])
+                ctx.ocr_stats = ocr_stats
+                ctx.text = text_content
+                text_content = ctx.complete_text()
+            learning_text = None if ocr_stats['stage'] in PARTIAL_OCR_STAGES else text_content
+
+            if use_offline_mode:
+                classification = {
+                    'category': category,
+                    'category_name': category_name,
+                    'method': method,
+                    'confidence': confidence
+                }
+            else:
+                # Validação sobre o texto classificado (o mesmo das palavras-chave da decisão)
+                features = extract_features(entry['text'], entry['text'].lower(), decision.keyword_matches)
+                confidence = min(0.98, confidence * validate_classification_semantically(
+                    category, entry['text'], features=features))
+                if category == 'outros':
+                    learning_system.record_classification(filename, category, 0, learning_text)
+                    classification = {
+                        'category': category,
+                        'category_name': category_name,
+                        'method': 'rules_outros_category',
+                        'confidence': 'N/A'
+                    }
+                else:
+                    if confidence == 0.0:
+                        confidence = 0.30  # Categoria específica: confiança mínima de 30%
+                    learning_system.record_classification(filename, category, confidence, learning_text)
+                    classification = {
+                        'category': category,
+                        'category_name': category_name,
+                        'method': 'learned_fallback' if method == 'learned_fallback' else 'rules_ocr_only',
+                        'confidence': confidence
+                    }
+            classification['category_scores'] = decision.scores
+            results.append(build_file_result(filename, classification, text_content, ocr_stats, rules.version))
+        except Exception as e:
+            print(f"[LOTE] Erro ao classificar {filename}: {str(e)}")
+            results.append({
+                'filename': filename,
+                'category': 'outros',
+                'category_name': categories.get('outros', 'Outros Documentos'),
+                'error': str(e)
+            })
+    return results
+
+def ocr_image_batch(entries):
+    """Pré-passada de OCR em lote para uma janela de uploads de imagem
+
+    entries: lista de (file_path, file_hash)
+    Decodifica e pré-processa cada imagem, executa o tesseract uma vez com
+    'por' e uma vez com 'fra+por' só para as imagens com dica de francês ou
+    texto curto, e grava o texto de cada documento no cache. Os documentos
+    depois são classificados normalmente, com cache HIT; a triagem de fotos,
+    os rostos e as estatísticas de OCR de cada um seguem em 'documents' para
+    process_single_file (batch_document), sem decodificar a imagem de novo.
+
+    Retorna {'images': documentos gravados no cache, 'runs': execuções do tesseract,
+    'documents': {file_path: {'photo_prescreen', 'faces', 'ocr_stats'}}}.
+    """
+    pages = []
+    documents = {}
+    for file_path, file_hash in entries:
+        try:
+            if file_hash is None:
+                file_hash = get_file_hash(file_path)
+            if get_cached_ocr(file_path, file_hash) is not None:
+                continue
+
+            ctx = DocumentContext(file_path, file_hash)
+            verdict = prescreen_photo(ctx)
+            documents[file_path] = {'photo_prescreen': verdict, 'faces': ctx.faces, 'ocr_stats': ctx.ocr_stats}
+            if verdict is not None:
+                continue  # Fotos não passam pelo OCR
+            # Com PHOTO_PRESCREEN desligado a triagem não decodifica a imagem
+            if ctx.image is None:
+                ctx.image = load_image_for_ocr(file_path)
+            processed_image = preprocess_image_for_ocr(ctx.image)
+            pages.append({'path': file_path, 'hash': file_hash, 'image': processed_image, 'stats': ctx.ocr_stats,
+                          'french_hint': any(kw in ctx.filename_lower for kw in FRENCH_KEYWORDS)})
+        except Exception as e:
+            print(f"  [LOTE] Erro ao preparar {os.path.basename(file_path)}: {e}")
+            documents.pop(file_path, None)
+
+    if not pages:
+        return {'images': 0, 'runs': 0, 'documents': documents}
+
+    backend = get_ocr_backend()
+    texts = [None] * len(pages)
+    layouts = [None] * len(pages)
+    langs = [None] * len(pages)
+
+    portuguese = [i for i, page in enumerate(pages) if not page['french_hint']]
+    for i, layout in zip(portuguese, backend.batch_image_to_data([pages[i]['image'] for i in portuguese], lang='por')):
+        texts[i], layouts[i], langs[i] = layout_to_text(layout), layout, 'por'
+
+    # Segunda execução só para dica de francês, texto curto ou palavras francesas
+    bilingual = [i for i, text in enumerate(texts)
+                 if text is None or len(text.strip()) < 50 or any(kw in text.lower() for kw in FRENCH_KEYWORDS)]
+    for i, layout in zip(bilingual, backend.batch_image_to_data([pages[i]['image'] for i in bilingual], lang='fra+por')):
+        text = layout_to_text(layout)
+        if texts[i] is None or len(text.strip()) >= len(texts[i].strip()):
+            texts[i], layouts[i], langs[i] = text, layout, 'fra+por'
+
+    for i, (page, text, layout) in enumerate(zip(pages, texts, layouts)):
+        page_layout = dict(layout, page=1, rows=layout['height'])
+        save_to_cache(page['path'], text.strip(), page['hash'], layout={'pages': [page_layout]})
+
+        # Estatísticas do documento: as execuções do lote de que a imagem participou
+        stats = page['stats']
+        passes = (i in portuguese) + (i in bilingual)
+        stats['pages'] += 1
+        stats['passes'] += passes
+        stats['passes_saved'] += max(0, estimate_legacy_passes(text, langs[i]) - passes)
+        stats['languages'].append(langs[i])
+        stats['resolutions'].append('full')
+        stats['words'] += len(layout['words'])
+        stats['confidence_sum'] += sum(word[5] for word in layout['words'])
+        stats['stage'] = 'full'
+    print(f"[LOTE] {len(pages)} imagens OCRizadas ({len(portuguese)} por, {len(bilingual)} fra+por)")
+    return {'images': len(pages), 'runs': bool(portuguese) + bool(bilingual), 'documents': documents}
@@ -0,0 +1,91 @@
+from collections import deque
+
+try:
+    import ahocorasick  # pyahocorasick (extensão C, opcional)
+except ImportError:
+    ahocorasick = None
+
+
+class KeywordAutomaton:
+    """Autômato de Aho-Corasick: encontra todas as palavras-chave numa única passada
+
+    Equivale a testar `pattern in text` para cada padrão (casamento de
+    substring, inclusive sobreposto), mas percorre o texto uma só vez,
+    independentemente do número de padrões. Usa o pyahocorasick quando
+    instalado; senão, a implementação em Python puro abaixo.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = frozenset(pattern for pattern in patterns if pattern)
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for pattern in self.patterns:
+                self._automaton.add_word(pattern, pattern)
+            self._automaton.make_automaton()
+            self.backend = 'pyahocorasick'
+        else:
+            self._automaton = None
+            self._build()
+            self.backend = 'python'
+
+    def _build(self):
+        """Trie com links de falha; as saídas de cada nó já incluem as da cadeia de falha"""
+        goto = [{}]
+        outputs = [[]]
+        for pattern in self.patterns:
+            node = 0
+            for char in pattern:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    outputs.append([])
+                node = next_node
+            outputs[node].append(pattern)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                outputs[child].extend(outputs[fail[child]])
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(output) for output in outputs]
+        # Transições determinísticas (goto + falhas resolvidas), preenchidas sob demanda
+        self._delta = [dict(edges) for edges in goto]
+
+    def _transition(self, node, char):
+        """Resolve a transição pela cadeia de falha e memoriza no nó de origem"""
+        state = node
+        while state and char not in self._goto[state]:
+            state = self._fail[state]
+        next_node = self._goto[state].get(char, 0)
+        self._delta[node][char] = next_node
+        return next_node
+
+    def find_all(self, text):
+        """Conjunto dos padrões que ocorrem em text"""
+        if not text:
+            return frozenset()
+
+        if self._automaton is not None:
+            return frozenset(pattern for _, pattern in self._automaton.iter(text))
+
+        delta, outputs, transition = self._delta, self._outputs, self._transition
+        found = set()
+        node = 0
+        for char in text:
+            next_node = delta[node].get(char)
+            node = next_node if next_node is not None else transition(node, char)
+            if outputs[node]:
+                found.update(outputs[node])
+        return frozenset(found)
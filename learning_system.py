@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 from collections import defaultdict, Counter
 import re
+from classification_rules import get_rules
+from semantic_features import extract_features
 
 class IntelligentLearningSystem:
     def __init__(self, db_path=None):
@@ -24,10 +26,17 @@ class IntelligentLearningSystem:
             os.makedirs(db_dir, exist_ok=True)
 
         self.init_database()
+
+    def _connect(self):
+        """Conexão com timeout e WAL: workers do pool gravam no mesmo banco em paralelo"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
     
     def init_database(self):
         """Inicializa o banco de dados para armazenar dados de aprendizado"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Tabela para histórico de classificações
@@ -85,7 +94,7 @@ class IntelligentLearningSystem:
     
     def record_classification(self, filename, classification, confidence_score=None, text_content=None):
         """Registra uma classificação no histórico"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -102,7 +111,7 @@ class IntelligentLearningSystem:
     
     def record_feedback(self, filename, correct_classification):
         """Registra feedback de correção do usuário"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Atualiza o registro mais recente para este arquivo
@@ -134,7 +143,7 @@ class IntelligentLearningSystem:
     
     def learn_from_correction(self, filename, text_content, wrong_class, correct_class):
         """Aprende novos padrões baseado nas correções"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Extrai padrões do nome do arquivo
@@ -170,71 +179,43 @@ class IntelligentLearningSystem:
         
         return patterns
     
-    def extract_text_patterns(self, text_content, category):
-        """Extrai padrões úteis do conteúdo de texto com melhor detecção"""
+    def extract_text_patterns(self, text_content, category, features=None):
+        """Extrai padrões úteis do conteúdo de texto com melhor detecção
+
+        features: registro de extract_features já calculado para o texto
+        (get_intelligent_classification calcula uma vez para todas as categorias)
+        """
+        if features is None:
+            features = self.extract_features(text_content)
         patterns = []
-        text_lower = text_content.lower()
         
-        # Palavras-chave específicas por categoria expandidas
-        category_keywords = {
-            'rg': ['registro geral', 'carteira de identidade', 'rg nº', 'identidade', 'documento de identidade'],
-            'cpf': ['cadastro de pessoa física', 'cpf', 'receita federal', 'contribuinte'],
-            'cnh': ['carteira nacional', 'habilitação', 'detran', 'condutor', 'permissão para dirigir'],
-            'certidao_nascimento': ['certidão de nascimento', 'nascimento', 'cartório', 'registro civil'],
-            'certidao_casamento': ['certidão de casamento', 'casamento', 'matrimônio', 'união'],
-            'certidao_obito': ['certidão de óbito', 'óbito', 'falecimento', 'morte'],
-            'contracheque': ['contracheque', 'holerite', 'salário', 'remuneração', 'folha de pagamento'],
-            'conta_luz': ['conta de luz', 'energia elétrica', 'kwh', 'cemig', 'cpfl', 'eletropaulo'],
-            'conta_agua': ['conta de água', 'saneamento', 'sabesp', 'copasa', 'águas'],
-            'conta_gas': ['conta de gás', 'gás natural', 'comgás'],
-            'extrato_bancario': ['extrato', 'banco', 'saldo', 'movimentação', 'conta corrente'],
-            'comprovante_residencia': ['comprovante de residência', 'endereço', 'residência'],
-            'comprovante_renda': ['comprovante de renda', 'declaração de renda', 'rendimentos'],
-            'diploma': ['diploma', 'graduação', 'conclusão de curso', 'formatura'],
-            'historico_escolar': ['histórico escolar', 'boletim', 'notas', 'disciplinas'],
-            'atestado_medico': ['atestado médico', 'atestado', 'médico', 'cid'],
-            'laudo_medico': ['laudo médico', 'laudo', 'exame', 'diagnóstico'],
-            'nota_fiscal': ['nota fiscal', 'nf-e', 'cupom fiscal', 'danfe'],
-            'recibo': ['recibo', 'comprovante de pagamento', 'quitação'],
-            'procuracao': ['procuração', 'mandato', 'representação legal'],
-            'contrato_aluguel': ['contrato de aluguel', 'locação', 'inquilino', 'locador'],
-            'carta': ['carta', 'correspondência', 'missiva', 'letter', 'comunicação']
-        }
-        
-        # Busca por palavras-chave relevantes
+        # Busca por palavras-chave relevantes (tabela compilada em classification_rules)
+        category_keywords = get_rules().learning_keywords
         if category in category_keywords:
             for keyword in category_keywords[category]:
-                if keyword in text_lower:
+                if keyword in features.keyword_matches:
                     patterns.append(keyword)
         
-        # Padrões de formato melhorados
-        date_patterns = re.findall(r'\d{1,2}/\d{1,2}/\d{4}', text_content)
-        if date_patterns:
+        # Padrões de formato (uma única varredura em extract_features)
+        if features.has_date:
             patterns.append('has_date_format')
-        
-        cpf_patterns = re.findall(r'\d{3}\.\d{3}\.\d{3}-\d{2}', text_content)
-        if cpf_patterns:
+        if features.has_cpf:
             patterns.append('has_cpf_format')
-        
-        rg_patterns = re.findall(r'\d{1,2}\.\d{3}\.\d{3}-\d{1,2}', text_content)
-        if rg_patterns:
+        if features.has_rg:
             patterns.append('has_rg_format')
-        
-        cnpj_patterns = re.findall(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', text_content)
-        if cnpj_patterns:
+        if features.has_cnpj:
             patterns.append('has_cnpj_format')
-        
-        # Padrões de valores monetários
-        money_patterns = re.findall(r'R\$\s*\d+[,.]?\d*', text_content)
-        if money_patterns:
+        if features.has_money:
             patterns.append('has_money_format')
-        
-        # Padrões de CEP
-        cep_patterns = re.findall(r'\d{5}-?\d{3}', text_content)
-        if cep_patterns:
+        if features.has_cep:
             patterns.append('has_cep_format')
         
         return patterns
+
+    def extract_features(self, text_content):
+        """Features semânticas do texto (minúsculas uma vez, uma passada do autômato das regras)"""
+        text_lower = text_content.lower()
+        return extract_features(text_content, text_lower, get_rules().automaton.find_all(text_lower))
     
     def add_or_update_pattern(self, pattern_type, pattern_value, category, cursor):
         """Adiciona ou atualiza um padrão aprendido"""
@@ -266,7 +247,7 @@ class IntelligentLearningSystem:
     
     def get_intelligent_classification(self, filename, text_content=None):
         """Usa padrões aprendidos para sugerir classificação com pontuação de confiança melhorada"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         category_scores = defaultdict(float)
@@ -293,9 +274,10 @@ class IntelligentLearningSystem:
             # Busca padrões em todas as categorias conhecidas
             cursor.execute('SELECT DISTINCT category FROM learned_patterns')
             all_categories = [row[0] for row in cursor.fetchall()]
+            features = self.extract_features(text_content)
             
             for category in all_categories:
-                text_patterns = self.extract_text_patterns(text_content, category)
+                text_patterns = self.extract_text_patterns(text_content, category, features)
                 for pattern in text_patterns:
                     cursor.execute('''
                         SELECT confidence, usage_count FROM learned_patterns
@@ -329,7 +311,7 @@ class IntelligentLearningSystem:
     
     def update_category_stats(self, category):
         """Atualiza estatísticas de uma categoria"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -349,7 +331,7 @@ class IntelligentLearningSystem:
     
     def update_performance_stats(self, category, was_correct):
         """Atualiza estatísticas de performance"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         if was_correct:
@@ -366,7 +348,7 @@ class IntelligentLearningSystem:
     
     def record_positive_feedback(self, filename, category):
         """Registra feedback positivo do usuário e reforça padrões aprendidos"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -406,7 +388,7 @@ class IntelligentLearningSystem:
 
     def record_negative_feedback(self, filename, category):
         """Registra feedback negativo e penaliza padrões incorretos"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -430,7 +412,7 @@ class IntelligentLearningSystem:
 
     def get_performance_report(self):
         """Gera relatório de performance do sistema"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
 
         cursor.execute('''
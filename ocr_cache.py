@@ -0,0 +1,184 @@
+import sqlite3
+import os
+import json
+import zlib
+import time
+import threading
+
+
+class PersistentOCRCache:
+    """Cache de OCR em disco endereçado pelo hash do conteúdo do arquivo.
+
+    Usa SQLite em modo WAL para ser compartilhado entre workers do gunicorn e
+    sobreviver a reinícios (--max-requests). A eviction é LRU, limitada por
+    número de entradas e por tamanho total em bytes.
+    """
+
+    def __init__(self, db_path=None, max_entries=5000, max_bytes=200 * 1024 * 1024, expiry=None):
+        # Configuração de banco de dados para produção (mesmo padrão do learning_system)
+        if db_path is None:
+            if os.environ.get('RENDER'):
+                db_path = "/app/data/ocr_cache.db"
+            else:
+                db_path = "ocr_cache.db"
+
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.expiry = expiry  # None = sem expiração por tempo (conteúdo não muda para o mesmo hash)
+        self._local = threading.local()
+        self._writes_since_evict = 0
+        self._evict_lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.init_database()
+
+    def _connect(self):
+        """Conexão por thread (e por processo) com timeout para concorrência entre workers"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def init_database(self):
+        """Inicializa a tabela de resultados de OCR"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ocr_results (
+                file_hash TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                stage TEXT NOT NULL DEFAULT 'full',
+                layout BLOB
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_ocr_results_last_access ON ocr_results (last_access)')
+
+        # Migração de bancos criados antes das colunas stage e layout
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(ocr_results)')]
+        if 'stage' not in columns:
+            conn.execute("ALTER TABLE ocr_results ADD COLUMN stage TEXT NOT NULL DEFAULT 'full'")
+        if 'layout' not in columns:
+            conn.execute('ALTER TABLE ocr_results ADD COLUMN layout BLOB')
+        conn.commit()
+
+    def get(self, file_hash):
+        """Retorna o texto em cache para o hash ou None"""
+        entry = self.get_entry(file_hash)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, file_hash):
+        """Retorna (texto, estágio) do cache ou None
+
+        stage: 'full' para extração completa ou o estágio do OCR progressivo
+        em que a classificação já estava decidida (ex.: 'header').
+        """
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT text, created_at, stage FROM ocr_results WHERE file_hash = ?', (file_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        text, created_at, stage = row
+        now = time.time()
+        if self.expiry is not None and now - created_at > self.expiry:
+            conn.execute('DELETE FROM ocr_results WHERE file_hash = ?', (file_hash,))
+            conn.commit()
+            return None
+
+        # Atualiza recência para a política LRU
+        conn.execute('UPDATE ocr_results SET last_access = ? WHERE file_hash = ?', (now, file_hash))
+        conn.commit()
+        return text, stage
+
+    def get_layout(self, file_hash):
+        """Retorna o layout de palavras (caixas, confianças, linhas) do hash ou None
+
+        Documentos extraídos da camada de texto do PDF não têm layout.
+        """
+        conn = self._connect()
+        row = conn.execute('SELECT layout FROM ocr_results WHERE file_hash = ?', (file_hash,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def put(self, file_hash, text, stage='full', layout=None):
+        """Salva (ou substitui) o texto de um hash e aplica a eviction quando necessário
+
+        layout: estrutura de palavras do OCR, gravada como JSON comprimido (zlib)
+        """
+        now = time.time()
+        blob = None
+        if layout is not None:
+            blob = zlib.compress(json.dumps(layout, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        size_bytes = len(text.encode('utf-8')) + (len(blob) if blob is not None else 0)
+        conn = self._connect()
+        conn.execute('''
+            INSERT OR REPLACE INTO ocr_results (file_hash, text, size_bytes, created_at, last_access, stage, layout)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (file_hash, text, size_bytes, now, now, stage, blob))
+        conn.commit()
+
+        # Eviction não precisa rodar a cada escrita
+        with self._evict_lock:
+            self._writes_since_evict += 1
+            should_evict = self._writes_since_evict >= 20
+            if should_evict:
+                self._writes_since_evict = 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Remove entradas expiradas e as menos usadas recentemente até caber nos limites"""
+        conn = self._connect()
+        if self.expiry is not None:
+            conn.execute('DELETE FROM ocr_results WHERE created_at < ?', (time.time() - self.expiry,))
+
+        total_entries, total_bytes = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM ocr_results'
+        ).fetchone()
+
+        if total_entries > self.max_entries:
+            conn.execute('''
+                DELETE FROM ocr_results WHERE file_hash IN (
+                    SELECT file_hash FROM ocr_results ORDER BY last_access ASC LIMIT ?
+                )
+            ''', (total_entries - self.max_entries,))
+            total_bytes = conn.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM ocr_results').fetchone()[0]
+
+        if total_bytes > self.max_bytes:
+            # Remove em ordem LRU até liberar o excesso
+            excess = total_bytes - self.max_bytes
+            rows = conn.execute('SELECT file_hash, size_bytes FROM ocr_results ORDER BY last_access ASC')
+            to_delete = []
+            for file_hash, size_bytes in rows:
+                if excess <= 0:
+                    break
+                to_delete.append((file_hash,))
+                excess -= size_bytes
+            conn.executemany('DELETE FROM ocr_results WHERE file_hash = ?', to_delete)
+
+        conn.commit()
+
+    def stats(self):
+        """Estatísticas do cache (entradas e bytes)"""
+        conn = self._connect()
+        total_entries, total_bytes = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM ocr_results'
+        ).fetchone()
+        return {
+            'entries': total_entries,
+            'bytes': total_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes
+        }
@@ -0,0 +1,256 @@
+import os
+import subprocess
+import tempfile
+import threading
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr  # API C do Tesseract (mantém modelos carregados em memória)
+except ImportError:
+    tesserocr = None
+
+# Diretórios comuns de traineddata (Debian/Ubuntu/Alpine)
+TESSDATA_CANDIDATES = [
+    '/usr/share/tesseract-ocr/5/tessdata',
+    '/usr/share/tesseract-ocr/4.00/tessdata',
+    '/usr/share/tessdata',
+    '/usr/local/share/tessdata',
+]
+
+
+def find_tessdata_path():
+    """Localiza o diretório de traineddata (TESSDATA_PREFIX tem prioridade)"""
+    prefix = os.environ.get('TESSDATA_PREFIX')
+    if prefix and os.path.isdir(prefix):
+        return prefix
+    for path in TESSDATA_CANDIDATES:
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+# Layout de uma página: {'width', 'height', 'words': [[texto, left, top, width,
+# height, conf, block, par, line], ...]}. O texto simples é derivado dele.
+WORD_FIELDS = ('text', 'left', 'top', 'width', 'height', 'conf', 'block', 'par', 'line')
+
+
+def words_from_data(data):
+    """Converte a saída de image_to_data (colunas do TSV) em registros de palavras"""
+    words = []
+    for index, text in enumerate(data['text']):
+        conf = float(data['conf'][index])
+        if conf < 0 or not str(text).strip():
+            continue
+        words.append([str(text), int(data['left'][index]), int(data['top'][index]),
+                      int(data['width'][index]), int(data['height'][index]), round(conf, 1),
+                      int(data['block_num'][index]), int(data['par_num'][index]), int(data['line_num'][index])])
+    return words
+
+
+def split_tsv_pages(tsv):
+    """Separa a saída TSV de um lote em colunas por página (page_num)
+
+    Retorna [{'width', 'height', 'data': {coluna: [valores]}}, ...]; as linhas
+    de nível 1 (página) trazem as dimensões de cada imagem.
+    """
+    rows = [line.split('\t') for line in tsv.splitlines() if line]
+    if not rows or rows[0][0] != 'level':
+        return []
+
+    header = rows[0]
+    pages = []
+    for row in rows[1:]:
+        if len(row) < len(header):
+            row = row + [''] * (len(header) - len(row))
+        record = dict(zip(header, row))
+        if record['level'] == '1':
+            pages.append({'width': int(record['width']), 'height': int(record['height']),
+                          'data': {column: [] for column in header}})
+        elif pages:
+            for column in header:
+                pages[-1]['data'][column].append(record[column])
+    return pages
+
+
+def layout_to_text(layout):
+    """Texto simples derivado do layout: palavras unidas por linha, na ordem de leitura"""
+    lines = []
+    current_key = None
+    for word in layout.get('words', []):
+        key = (word[6], word[7], word[8])
+        if key != current_key:
+            lines.append([])
+            current_key = key
+        lines[-1].append(word[0])
+    return "\n".join(" ".join(words) for words in lines)
+
+
+def mean_confidence(layout):
+    """Confiança média das palavras (0-100); 0 se não houver palavras"""
+    words = layout.get('words', [])
+    return sum(word[5] for word in words) / len(words) if words else 0.0
+
+
+class PytesseractBackend:
+    """Backend padrão: executa o binário tesseract via pytesseract (um processo por chamada)"""
+
+    name = 'pytesseract'
+
+    def image_to_string(self, image, lang='por', psm=6):
+        """Aplica OCR em uma imagem PIL ou array numpy e retorna o texto"""
+        return pytesseract.image_to_string(image, lang=lang, config=f'--oem 3 --psm {psm}')
+
+    def image_to_data(self, image, lang='por', psm=6):
+        """Aplica OCR e retorna o layout da página (palavras, caixas, confianças e linhas)
+
+        Uma única execução do tesseract (saída TSV).
+        """
+        data = pytesseract.image_to_data(image, lang=lang, config=f'--oem 3 --psm {psm}',
+                                         output_type=pytesseract.Output.DICT)
+        height, width = np.asarray(image).shape[:2]
+        return {'width': width, 'height': height, 'words': words_from_data(data)}
+
+    def batch_image_to_data(self, images, lang='por', psm=6, timeout=600):
+        """Aplica OCR em várias imagens com UMA execução do tesseract
+
+        As imagens são gravadas uma vez (PNM, sem compressão) e passadas numa
+        lista de arquivos; a saída TSV traz page_num, o que permite devolver o
+        layout de cada imagem na ordem de entrada. Se a saída não puder ser
+        separada, cai para uma chamada por imagem.
+        """
+        if not images:
+            return []
+
+        with tempfile.TemporaryDirectory(prefix='ocr_batch_') as tmp_dir:
+            paths = []
+            for index, image in enumerate(images):
+                path = os.path.join(tmp_dir, f'{index:05d}.pnm')
+                pil_image = image if isinstance(image, Image.Image) else Image.fromarray(np.asarray(image))
+                pil_image.save(path, format='PPM')
+                paths.append(path)
+
+            list_path = os.path.join(tmp_dir, 'pages.txt')
+            with open(list_path, 'w') as list_file:
+                list_file.write("\n".join(paths) + "\n")
+
+            command = [pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout',
+                       '-l', lang, '--oem', '3', '--psm', str(psm), 'tsv']
+            try:
+                result = subprocess.run(command, capture_output=True, timeout=timeout)
+                pages = split_tsv_pages(result.stdout.decode('utf-8', errors='replace'))
+                if result.returncode == 0 and len(pages) == len(images):
+                    print(f"  [OCR] Lote de {len(images)} imagens ({lang}) em uma execução")
+                    return [{'width': page['width'], 'height': page['height'], 'words': words_from_data(page['data'])}
+                            for page in pages]
+                print(f"  [OCR] Saída do lote inválida (código {result.returncode}), OCR por imagem")
+            except (OSError, subprocess.TimeoutExpired) as e:
+                print(f"  [OCR] Lote falhou ({e}), OCR por imagem")
+
+        return [self.image_to_data(image, lang=lang, psm=psm) for image in images]
+
+
+class TesserocrBackend:
+    """Backend persistente: uma instância da API C do Tesseract por idioma e por thread
+
+    Os modelos de idioma são carregados uma vez por worker e reaproveitados;
+    as imagens são passadas em memória (sem arquivo temporário nem subprocesso).
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, tessdata_path=None):
+        self.tessdata_path = tessdata_path or find_tessdata_path()
+        self.fallback = PytesseractBackend()
+        self._local = threading.local()
+
+    def _get_api(self, lang, psm):
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+
+        api = apis.get((lang, psm))
+        if api is None:
+            kwargs = {'lang': lang, 'psm': psm, 'oem': tesserocr.OEM.DEFAULT}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            apis[(lang, psm)] = api
+            print(f"  [OCR] Modelo '{lang}' carregado (psm {psm})")
+        return api
+
+    def _set_image(self, api, image):
+        if isinstance(image, np.ndarray):
+            buffer = np.ascontiguousarray(image, dtype=np.uint8)
+            height, width = buffer.shape[:2]
+            bytes_per_pixel = 1 if buffer.ndim == 2 else buffer.shape[2]
+            api.SetImageBytes(buffer.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+        else:
+            api.SetImage(image)
+
+    def image_to_string(self, image, lang='por', psm=6):
+        """Aplica OCR em uma imagem PIL ou array numpy e retorna o texto"""
+        try:
+            api = self._get_api(lang, psm)
+            self._set_image(api, image)
+            return api.GetUTF8Text()
+        except Exception as e:
+            print(f"  [OCR] tesserocr falhou ({e}), usando pytesseract")
+            return self.fallback.image_to_string(image, lang=lang, psm=psm)
+
+    def image_to_data(self, image, lang='por', psm=6):
+        """Aplica OCR e retorna o layout da página (palavras, caixas, confianças e linhas)"""
+        try:
+            api = self._get_api(lang, psm)
+            self._set_image(api, image)
+            api.Recognize()
+
+            words = []
+            block = paragraph = line = 0
+            level = tesserocr.RIL.WORD
+            iterator = api.GetIterator()
+            if iterator is not None:
+                for word in tesserocr.iterate_level(iterator, level):
+                    if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                        block += 1
+                    if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+                        paragraph += 1
+                    if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                        line += 1
+                    text = word.GetUTF8Text(level)
+                    box = word.BoundingBox(level)
+                    if not text or not text.strip() or box is None:
+                        continue
+                    left, top, right, bottom = box
+                    words.append([text, left, top, right - left, bottom - top,
+                                  round(word.Confidence(level), 1), block, paragraph, line])
+
+            height, width = np.asarray(image).shape[:2]
+            return {'width': width, 'height': height, 'words': words}
+        except Exception as e:
+            print(f"  [OCR] tesserocr falhou ({e}), usando pytesseract")
+            return self.fallback.image_to_data(image, lang=lang, psm=psm)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend():
+    """Retorna o backend de OCR deste processo (criado sob demanda)
+
+    OCR_BACKEND: 'auto' (padrão), 'tesserocr' ou 'pytesseract'.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            choice = os.environ.get('OCR_BACKEND', 'auto').lower()
+            if choice in ('auto', 'tesserocr') and tesserocr is not None:
+                _backend = TesserocrBackend()
+            else:
+                if choice == 'tesserocr':
+                    print("  [OCR] tesserocr não instalado, usando pytesseract")
+                _backend = PytesseractBackend()
+            print(f"  [OCR] Backend ativo: {_backend.name}")
+        return _backend
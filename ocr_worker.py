@@ -0,0 +1,32 @@
+# Ponto de entrada dos workers do pool de OCR (spawn/forkserver)
+# Importa só o pipeline de documentos: nada de Flask nem de app.py em cada worker
+import multiprocessing
+import sys
+
+try:
+    import resource  # Não existe no Windows
+except ImportError:
+    resource = None
+
+import document_pipeline
+
+
+def init_worker(pool_size):
+    """Inicializa o worker: divide as CPUs entre os workers do pool"""
+    document_pipeline.set_ocr_pool_size(pool_size)
+
+def peak_rss_mb():
+    """Pico de RSS deste worker em MB (None fora de um processo do pool)"""
+    if resource is None or multiprocessing.parent_process() is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def process_document(*args):
+    """Processa um documento no worker; retorna (resultado, pico de RSS em MB)"""
+    return document_pipeline.process_single_file(*args), peak_rss_mb()
+
+def ocr_window(entries):
+    """OCR em lote de uma janela de imagens; retorna (estatísticas, pico de RSS em MB)"""
+    return document_pipeline.ocr_image_batch(entries), peak_rss_mb()
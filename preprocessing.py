@@ -0,0 +1,179 @@
+import os
+import time
+import cv2
+import numpy as np
+
+# Resolução da imagem de análise (inclinação, histograma, ruído)
+ANALYSIS_SIZE = 800
+
+# Busca de inclinação por perfil de projeção: passo grosso e refinamento
+MAX_SKEW_ANGLE = 5.0
+COARSE_SKEW_STEP = 0.5
+FINE_SKEW_STEP = 0.1
+MIN_SKEW_ANGLE = 0.5  # Abaixo disso não vale a rotação em resolução total
+
+# Razão de Otsu (variância entre classes / variância total): acima disso o
+# histograma é bimodal e a binarização global basta
+OTSU_SEPARABILITY_MIN = 0.75
+
+# Ruído estimado (desvio do laplaciano) acima do qual aplica filtro de mediana
+NOISE_SIGMA_MAX = 12.0
+
+# Orçamento de tempo por página (ms); etapas opcionais são puladas quando estoura
+PREPROCESS_TIME_BUDGET_MS = int(os.environ.get('PREPROCESS_TIME_BUDGET_MS', 300))
+
+
+def downsample(gray, max_size=ANALYSIS_SIZE):
+    """Cópia reduzida (INTER_AREA) para análise; imagens pequenas voltam como estão"""
+    height, width = gray.shape[:2]
+    scale = max_size / max(height, width)
+    if scale >= 1.0:
+        return gray
+    return cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def estimate_skew(ink):
+    """Estima a inclinação do texto pelo perfil de projeção horizontal
+
+    ink: imagem reduzida binarizada com a tinta em branco (não zero)
+    Projeta os pixels de tinta em cada ângulo candidato; o ângulo certo
+    concentra as linhas de texto em poucas linhas do histograma (maior soma
+    dos quadrados). Nenhuma imagem é rotacionada na busca.
+
+    Retorna o ângulo de correção em graus, pronto para getRotationMatrix2D.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+
+    height = ink.shape[0]
+    ys = ys.astype(np.float32)
+    xs = xs.astype(np.float32)
+
+    def profile_score(angle):
+        theta = np.deg2rad(angle)
+        rows = ys * np.cos(theta) + xs * np.sin(theta)
+        hist = np.bincount(np.clip(rows, 0, None).astype(np.int32), minlength=height)
+        return float(np.dot(hist, hist))
+
+    coarse = np.arange(-MAX_SKEW_ANGLE, MAX_SKEW_ANGLE + COARSE_SKEW_STEP / 2, COARSE_SKEW_STEP)
+    best = max(coarse, key=profile_score)
+    fine = np.arange(best - COARSE_SKEW_STEP, best + COARSE_SKEW_STEP + FINE_SKEW_STEP / 2, FINE_SKEW_STEP)
+    best = max(np.clip(fine, -MAX_SKEW_ANGLE, MAX_SKEW_ANGLE), key=profile_score)
+    return -float(round(best, 2))
+
+
+def otsu_separability(small):
+    """Razão de Otsu (0-1) calculada só a partir do histograma"""
+    hist = np.bincount(small.ravel(), minlength=256).astype(np.float64)
+    prob = hist / hist.sum()
+    levels = np.arange(256)
+    total_mean = float(np.dot(prob, levels))
+    total_var = float(np.dot(prob, (levels - total_mean) ** 2))
+    if total_var == 0:
+        return 1.0
+
+    omega = np.cumsum(prob)
+    mu = np.cumsum(prob * levels)
+    valid = (omega > 1e-9) & (omega < 1.0 - 1e-9)
+    between = (total_mean * omega[valid] - mu[valid]) ** 2 / (omega[valid] * (1.0 - omega[valid]))
+    return float(min(1.0, between.max() / total_var)) if len(between) else 1.0
+
+
+def estimate_noise(small):
+    """Desvio do ruído estimado pela mediana absoluta do laplaciano"""
+    laplacian = cv2.Laplacian(small, cv2.CV_16S, ksize=3)
+    return float(np.median(np.abs(laplacian)) / 0.6745)
+
+
+def plan_preprocessing(gray):
+    """Analisa uma cópia reduzida e decide as operações a aplicar em resolução total
+
+    Retorna um dict com: scale, angle, binarization ('otsu'|'adaptive') e denoise.
+    """
+    height, width = gray.shape[:2]
+    small = downsample(gray)
+
+    separability = otsu_separability(small)
+    noise = estimate_noise(small)
+    binarization = 'otsu' if separability >= OTSU_SEPARABILITY_MIN else 'adaptive'
+    denoise = noise > NOISE_SIGMA_MAX
+
+    # A inclinação é medida na cópia reduzida já tratada como será a imagem final
+    if denoise:
+        small = cv2.medianBlur(small, 3)
+    if binarization == 'adaptive':
+        ink = cv2.adaptiveThreshold(small, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                    cv2.THRESH_BINARY_INV, 15, 10)
+    else:
+        _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    return {
+        'scale': 2.0 if height < 1000 or width < 1000 else 1.0,  # Imagens pequenas: amplia (melhora OCR)
+        'angle': estimate_skew(ink),
+        'binarization': binarization,
+        'separability': round(separability, 3),
+        'denoise': denoise,
+        'noise': round(noise, 1),
+    }
+
+
+def apply_preprocessing(gray, plan, deadline=None):
+    """Aplica o plano UMA vez em resolução total, respeitando o prazo
+
+    A binarização sempre roda (Otsu se o prazo já estourou); ampliação,
+    rotação e filtro de ruído são pulados quando não há mais tempo.
+    """
+    skipped = []
+
+    def has_time():
+        return deadline is None or time.time() < deadline
+
+    if plan['scale'] != 1.0:
+        if has_time():
+            gray = cv2.resize(gray, None, fx=plan['scale'], fy=plan['scale'], interpolation=cv2.INTER_CUBIC)
+        else:
+            skipped.append('scale')
+
+    if abs(plan['angle']) >= MIN_SKEW_ANGLE:
+        if has_time():
+            height, width = gray.shape
+            matrix = cv2.getRotationMatrix2D((width // 2, height // 2), plan['angle'], 1.0)
+            gray = cv2.warpAffine(gray, matrix, (width, height),
+                                  flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        else:
+            skipped.append('deskew')
+
+    if plan['denoise']:
+        if has_time():
+            gray = cv2.medianBlur(gray, 3)
+        else:
+            skipped.append('denoise')
+
+    if plan['binarization'] == 'adaptive' and has_time():
+        # Janela proporcional à resolução (cobre algumas linhas de texto)
+        block_size = max(11, (min(gray.shape) // 40) | 1)
+        binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                       cv2.THRESH_BINARY, block_size, 10)
+    else:
+        if plan['binarization'] == 'adaptive':
+            skipped.append('adaptive')
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    plan['skipped'] = skipped
+    return binary
+
+
+def preprocess_for_ocr(gray, time_budget_ms=PREPROCESS_TIME_BUDGET_MS):
+    """Pré-processamento de qualidade dentro de um orçamento de tempo por página
+
+    gray: array numpy em escala de cinza
+    Retorna: (imagem binarizada, plano aplicado)
+    """
+    start_time = time.time()
+    deadline = start_time + time_budget_ms / 1000.0 if time_budget_ms else None
+
+    plan = plan_preprocessing(gray)
+    binary = apply_preprocessing(gray, plan, deadline)
+    plan['elapsed_ms'] = round((time.time() - start_time) * 1000, 1)
+    return binary, plan
@@ -0,0 +1,89 @@
+import re
+from collections import namedtuple
+
+from keyword_automaton import KeywordAutomaton
+
+# Formatos de documentos brasileiros num único scanner. A busca recomeça uma
+# posição após cada casamento, então formatos que se sobrepõem (ex.: o final
+# de um CPF também casa com o formato de RG) são todos encontrados, como nas
+# buscas separadas de antes; numa mesma posição no máximo um formato começa.
+# O guarda (?=\d) descarta logo as posições que não começam com dígito.
+FORMAT_SCANNER = re.compile(
+    r'(?P<money>R\$\s*\d+[,.]?\d*)'
+    r'|(?=\d)(?:(?P<cnpj>\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})'
+    r'|(?P<cpf>\d{3}\.\d{3}\.\d{3}-\d{2})'
+    r'|(?P<rg>\d{1,2}\.\d{3}\.\d{3}-\d{1,2})'
+    r'|(?P<cep>\d{5}-?\d{3})'
+    r'|(?P<date>\d{1,2}/\d{1,2}/\d{4}))'
+)
+FORMAT_KINDS = frozenset(FORMAT_SCANNER.groupindex)
+
+# Palavras-chave das features (também compiladas no autômato das regras)
+FEATURE_KEYWORDS = {
+    'has_kwh': ('kwh',),
+    'has_m3': ('m³', 'm3'),
+    'has_tribunal': ('tribunal',),
+    'has_attestation': ('attestation',),
+    'has_salaire': ('salaire', 'bulletin'),
+}
+FRENCH_MARKERS = ('monsieur', 'madame', 'attestation', 'tribunal')
+FEATURE_PATTERNS = frozenset(
+    [keyword for keywords in FEATURE_KEYWORDS.values() for keyword in keywords] + list(FRENCH_MARKERS))
+
+_feature_automaton = KeywordAutomaton(FEATURE_PATTERNS)
+
+SemanticFeatures = namedtuple('SemanticFeatures', [
+    'has_cpf', 'has_rg', 'has_cnpj', 'has_cep', 'has_money', 'has_date',
+    'has_kwh', 'has_m3', 'has_tribunal', 'has_attestation', 'has_salaire',
+    'language', 'keyword_matches',
+])
+
+
+def scan_formats(text):
+    """Formatos presentes no texto (cnpj, cpf, rg, cep, money, date)
+
+    Para assim que todos os formatos foram vistos.
+    """
+    found = set()
+    position = 0
+    search = FORMAT_SCANNER.search
+    while True:
+        match = search(text, position)
+        if match is None:
+            break
+        found.add(match.lastgroup)
+        if len(found) == len(FORMAT_KINDS):
+            break
+        position = match.start() + 1
+    return frozenset(found)
+
+
+def extract_features(text_content, text_lower=None, keyword_matches=None):
+    """Features semânticas do documento numa passada de formatos e uma de palavras-chave
+
+    text_lower: texto já em minúsculas (evita baixar de novo)
+    keyword_matches: padrões encontrados pelo autômato das regras (inclui
+    FEATURE_PATTERNS); sem ele, usa um autômato só com as palavras das features
+    """
+    text_content = text_content or ""
+    if keyword_matches is None:
+        if text_lower is None:
+            text_lower = text_content.lower()
+        keyword_matches = _feature_automaton.find_all(text_lower)
+
+    formats = scan_formats(text_content)
+    keyword_flags = {name: any(keyword in keyword_matches for keyword in keywords)
+                     for name, keywords in FEATURE_KEYWORDS.items()}
+    is_french = any(marker in keyword_matches for marker in FRENCH_MARKERS)
+
+    return SemanticFeatures(
+        has_cpf='cpf' in formats,
+        has_rg='rg' in formats,
+        has_cnpj='cnpj' in formats,
+        has_cep='cep' in formats,
+        has_money='money' in formats,
+        has_date='date' in formats,
+        language='french' if is_french else 'portuguese',
+        keyword_matches=keyword_matches,
+        **keyword_flags
+    )
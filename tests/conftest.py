@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# O app e o pipeline criam bancos SQLite e pastas no diretório atual ao serem importados
+os.chdir(tempfile.mkdtemp(prefix='idp_tests_'))
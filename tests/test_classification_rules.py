@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+import app
+import classification_rules
+import document_pipeline
+import keyword_automaton
+from classification_rules import builtin_rules, compile_rules
+from learning_system import IntelligentLearningSystem
+
+
+@pytest.mark.parametrize('section, value', [
+    ('content', None), ('filename', 5), ('enhanced', {}), ('learning_keywords', []),
+    ('validation_keywords', 'cpf'),
+])
+def test_wrong_section_type_is_value_error(section, value):
+    spec = builtin_rules()
+    spec[section] = value
+    with pytest.raises(ValueError):
+        compile_rules(spec)
+
+
+def test_invalid_file_keeps_current_rules(monkeypatch, tmp_path):
+    path = tmp_path / 'categories.json'
+    monkeypatch.setattr(classification_rules, 'CATEGORIES_FILE', str(path))
+    current = classification_rules.get_rules()
+
+    path.write_text(json.dumps({'categories': {'outros': 'Outros'}, 'rules': {'content': None}}))
+    classification_rules.check_rules_file()
+
+    assert classification_rules.get_rules() is current
+
+
+def test_post_categories_rejects_wrong_section_type(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'CATEGORIES_FILE', str(tmp_path / 'categories.json'))
+    response = app.app.test_client().post('/api/categories', json={
+        'categories': {'outros': 'Outros'}, 'rules': {'filename': 5}})
+    assert response.status_code == 400
+
+
+def test_rule_set_is_immutable():
+    rules = compile_rules()
+
+    with pytest.raises(AttributeError):
+        rules.content_rules = ()
+    with pytest.raises(TypeError):
+        rules.learning_keywords['rg'] = ('rg',)
+    assert isinstance(rules.content_rules, tuple)
+    assert compile_rules().version == rules.version
+
+
+def test_classification_does_not_rebuild_rule_tables(monkeypatch, tmp_path):
+    rules = classification_rules.get_rules()
+    learning = IntelligentLearningSystem(str(tmp_path / 'learning.db'))
+
+    def rebuild(*args, **kwargs):
+        raise AssertionError('tabelas de regras recompiladas')
+    monkeypatch.setattr(keyword_automaton.KeywordAutomaton, '__init__', rebuild)
+    monkeypatch.setattr(classification_rules, 'builtin_rules', rebuild)
+
+    text = "Bulletin de salaire - salaire net à payer 1 850,00 €"
+    for _ in range(3):
+        result = document_pipeline.classify_offline_fallback('scan_0001.pdf', text=text)
+        assert (result['category'], result['rules_version']) == ('bulletin_salaire', rules.version)
+        assert 'holerite' in learning.extract_text_patterns("Holerite de março - salário líquido", 'contracheque')
+    assert classification_rules.get_rules() is rules
+
+
+def invitation_rules():
+    spec = builtin_rules()
+    spec['content'].insert(0, {'category': 'convite', 'phrases': ['convite de casamento'], 'priority': 0,
+                               'method': 'offline_content_custom'})
+    return spec
+
+
+@pytest.fixture
+def restore_active_rules(monkeypatch):
+    """Devolve o RuleSet ativo ao final do teste (o hot reload troca o global do módulo)"""
+    monkeypatch.setattr(classification_rules, '_rules', classification_rules.get_rules())
+    monkeypatch.setattr(classification_rules, '_rules_signature', classification_rules._rules_signature)
+
+
+def test_edited_file_is_hot_reloaded(monkeypatch, tmp_path, restore_active_rules):
+    path = str(tmp_path / 'categories.json')
+    monkeypatch.setattr(classification_rules, 'CATEGORIES_FILE', path)
+    classification_rules.write_categories_file({'convite': 'Convite', 'outros': 'Outros'}, invitation_rules(), path)
+
+    classification_rules.check_rules_file()
+
+    result = document_pipeline.classify_by_content("convite de casamento de ana e joão")
+    assert (result['category'], result['method']) == ('convite', 'offline_content_custom')
+    assert result['rules_version'] == compile_rules(invitation_rules()).version
+
+
+def test_post_categories_activates_pushed_rules(monkeypatch, tmp_path, restore_active_rules):
+    path = str(tmp_path / 'categories.json')
+    monkeypatch.setattr(app, 'write_categories_file',
+                        lambda categories, rules=None: classification_rules.write_categories_file(categories, rules, path))
+    monkeypatch.setattr(app, 'read_categories_file', lambda: classification_rules.read_categories_file(path))
+
+    response = app.app.test_client().post('/api/categories', json={
+        'categories': {'convite': 'Convite'}, 'rules': invitation_rules()})
+
+    assert response.status_code == 200
+    assert response.get_json()['rules_version'] == compile_rules(invitation_rules()).version
+    assert classification_rules.get_rules().content_rules[0].category == 'convite'
+    assert classification_rules.read_categories_file(path)[1] == invitation_rules()
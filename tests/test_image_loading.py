@@ -0,0 +1,28 @@
+import numpy as np
+from PIL import Image
+
+import document_pipeline
+
+
+def test_oversized_png_is_decoded_reduced_in_grayscale(monkeypatch, tmp_path):
+    monkeypatch.setattr(document_pipeline, 'MAX_DECODE_PIXELS', 1_000_000)
+    path = tmp_path / 'planta.png'
+    pixels = np.full((600, 4100, 3), 255, dtype=np.uint8)
+    pixels[200:400, 1000:3000] = (200, 30, 30)
+    Image.fromarray(pixels).save(path)
+
+    image = document_pipeline.load_image_for_ocr(str(path))
+
+    assert image.mode == 'L'
+    assert image.size == (1025, 150)  # 4100x600 reduzido por 4 na decodificação
+    assert np.asarray(image)[75, 500] < 255
+
+
+def test_png_below_limit_keeps_colors(tmp_path):
+    path = tmp_path / 'foto.png'
+    Image.new('RGB', (800, 600), (10, 120, 200)).save(path)
+
+    image = document_pipeline.load_image_for_ocr(str(path))
+
+    assert image.mode == 'RGB'
+    assert image.size == (800, 600)
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+import keyword_automaton
+from classification_rules import builtin_rules
+from keyword_automaton import KeywordAutomaton
+
+
+@pytest.fixture
+def python_automaton(monkeypatch):
+    """Força a implementação em Python puro (usada quando o pyahocorasick não está instalado)"""
+    monkeypatch.setattr(keyword_automaton, 'ahocorasick', None)
+
+    def build(patterns):
+        automaton = KeywordAutomaton(patterns)
+        assert automaton.backend == 'python'
+        return automaton
+    return build
+
+
+def naive_scan(patterns, text):
+    return frozenset(pattern for pattern in patterns if pattern and pattern in text)
+
+
+@pytest.mark.parametrize('text', [
+    'carteira de identidade', 'identidade', 'ident', 'aaaa', 'abababa', 'she sells his hers',
+    'passeport passe', 'dépôt accusé de réception', '',
+])
+def test_overlapping_and_prefix_keywords_match_a_plain_scan(python_automaton, text):
+    patterns = ['identidade', 'ident', 'dade', 'carteira de identidade', 'a', 'aa', 'aaa', 'aba', 'bab',
+                'he', 'she', 'his', 'hers', 'passe', 'passeport', 'port', 'dépôt', 'accusé de réception', 'ré']
+
+    assert python_automaton(patterns).find_all(text) == naive_scan(patterns, text)
+
+
+def test_random_patterns_match_a_plain_scan(python_automaton):
+    rng = random.Random(21)
+    for _ in range(200):
+        patterns = [''.join(rng.choice('abc') for _ in range(rng.randint(1, 5))) for _ in range(rng.randint(1, 12))]
+        automaton = python_automaton(patterns)
+        for _ in range(5):
+            text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 40)))
+            assert automaton.find_all(text) == naive_scan(patterns, text)
+
+
+def test_builtin_keyword_tables_match_a_plain_scan(python_automaton):
+    spec = builtin_rules()
+    patterns = {phrase for rule in spec['content'] for phrase in rule['phrases'] + rule.get('exclude', [])}
+    patterns |= {keyword for rule in spec['filename'] for keyword in rule['keywords']}
+    text = ("tribunal administratif requête accusé de réception carteira de identidade registro geral "
+            "passeport république française bulletin de salaire cpf rg_frente.jpg").lower()
+
+    automaton = python_automaton(patterns)
+    assert automaton.find_all(text) == naive_scan(patterns, text)
+    assert automaton.find_all(text)  # o texto de exemplo casa com várias regras
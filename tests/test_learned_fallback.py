@@ -0,0 +1,49 @@
+import pytest
+
+import document_pipeline
+from batch_classifier import BatchClassifier
+
+
+# Palavras-chave das regras que, sozinhas, não decidem nenhuma categoria
+TEXT = "documento abonnement assurance commune anexo"
+
+
+@pytest.fixture
+def learned_model(monkeypatch):
+    rules = document_pipeline.get_rules()
+    classifier = BatchClassifier(rules, [(TEXT, 'attestation_honneur', 1.0)] * 3)
+    monkeypatch.setattr(document_pipeline, 'get_batch_classifier', lambda rules=None, db_path=None: classifier)
+    return classifier
+
+
+def deferred_entry(path):
+    stats = document_pipeline.new_ocr_stats()
+    stats['stage'] = 'full'
+    return {'filename': path.name, 'file_path': str(path), 'file_hash': 'abc', 'text': TEXT, 'ocr_stats': stats}
+
+
+def test_small_sessions_keep_the_rules_result(learned_model, monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(document_pipeline, 'get_batch_classifier',
+                        lambda rules=None, db_path=None: calls.append(db_path) or learned_model)
+    categories = document_pipeline.load_categories()
+    ctx = document_pipeline.DocumentContext(str(tmp_path / 'scan.pdf'), 'abc')
+    ctx.text = TEXT
+
+    offline = document_pipeline.classify_offline_fallback(ctx, categories)
+    hybrid = document_pipeline.classify_document_hybrid(ctx, categories=categories)
+
+    assert (offline['category'], offline['method']) == ('outros', 'offline_fallback')
+    assert (hybrid['category'], hybrid['method']) == ('outros', 'rules_outros_category')
+    assert calls == []  # Nenhuma consulta ao modelo (nem ao SQLite) por documento
+
+
+@pytest.mark.parametrize('use_offline_mode', [True, False])
+def test_batch_path_applies_the_learned_fallback(learned_model, tmp_path, use_offline_mode):
+    path = tmp_path / 'scan.pdf'
+    categories = document_pipeline.load_categories()
+
+    batch = document_pipeline.classify_deferred_batch([deferred_entry(path)], categories, use_offline_mode)[0]
+
+    assert batch['category'] == 'attestation_honneur'
+    assert batch['method'] == 'learned_fallback'
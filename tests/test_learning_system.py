@@ -0,0 +1,44 @@
+import sqlite3
+import threading
+
+from learning_system import IntelligentLearningSystem
+
+
+def test_open_reader_does_not_block_classification_writes(tmp_path):
+    learning = IntelligentLearningSystem(str(tmp_path / 'learning.db'))
+    reader = sqlite3.connect(learning.db_path)
+    reader.execute('BEGIN')
+    reader.execute('SELECT COUNT(*) FROM classification_history').fetchone()
+
+    # Sem WAL, o leitor com transação aberta impede o commit do escritor
+    learning.record_classification('rg.jpg', 'rg', 0.9)
+    reader.rollback()
+    reader.close()
+
+    conn = sqlite3.connect(learning.db_path)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('SELECT COUNT(*) FROM classification_history').fetchone()[0] == 1
+
+
+def test_parallel_workers_record_every_classification(tmp_path):
+    db_path = str(tmp_path / 'learning.db')
+    IntelligentLearningSystem(db_path)
+    errors = []
+
+    def worker(index):
+        learning = IntelligentLearningSystem(db_path)
+        try:
+            for number in range(20):
+                learning.record_classification(f'doc_{index}_{number}.pdf', 'cpf', 0.8)
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM classification_history').fetchone()[0] == 120
@@ -0,0 +1,76 @@
+import sqlite3
+
+from ocr_cache import PersistentOCRCache
+
+
+LAYOUT = {'pages': [{'page': 1, 'width': 800, 'height': 1000, 'rows': 1000,
+                     'words': [['Comprovante', 10, 20, 120, 18, 91.5, 1, 1, 1]]}]}
+
+
+def test_put_stores_the_layout_with_the_text(tmp_path):
+    cache = PersistentOCRCache(str(tmp_path / 'ocr_cache.db'))
+
+    cache.put('abc', 'Comprovante', 'header', LAYOUT)
+    cache.put('def', 'Texto nativo')
+
+    assert cache.get_entry('abc') == ('Comprovante', 'header')
+    assert cache.get_layout('abc') == LAYOUT
+    assert cache.get_layout('def') is None
+    assert cache.stats()['bytes'] > len('Comprovante') + len('Texto nativo')
+
+
+def test_older_databases_gain_the_layout_column(tmp_path):
+    db_path = str(tmp_path / 'ocr_cache.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE ocr_results (
+            file_hash TEXT PRIMARY KEY, text TEXT NOT NULL, size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL, last_access REAL NOT NULL
+        )
+    ''')
+    conn.execute("INSERT INTO ocr_results VALUES ('abc', 'texto', 5, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = PersistentOCRCache(db_path)
+
+    assert cache.get_entry('abc') == ('texto', 'full')
+    assert cache.get_layout('abc') is None
+    cache.put('abc', 'texto', layout=LAYOUT)
+    assert cache.get_layout('abc') == LAYOUT
+
+
+def test_entries_survive_a_new_cache_instance(tmp_path):
+    db_path = str(tmp_path / 'ocr_cache.db')
+    PersistentOCRCache(db_path).put('abc', 'Comprovante')
+
+    assert PersistentOCRCache(db_path).get('abc') == 'Comprovante'
+
+
+def test_evict_removes_least_recently_used_entries(monkeypatch, tmp_path):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr('ocr_cache.time.time', lambda: next(clock))
+    cache = PersistentOCRCache(str(tmp_path / 'ocr_cache.db'), max_entries=2)
+
+    cache.put('a', 'primeiro')
+    cache.put('b', 'segundo')
+    cache.put('c', 'terceiro')
+    cache.get('a')  # 'b' passa a ser o menos usado
+    cache.evict()
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'primeiro'
+    assert cache.get('c') == 'terceiro'
+
+
+def test_evict_respects_the_size_limit(monkeypatch, tmp_path):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr('ocr_cache.time.time', lambda: next(clock))
+    cache = PersistentOCRCache(str(tmp_path / 'ocr_cache.db'), max_bytes=25)
+
+    for file_hash in ('a', 'b', 'c'):
+        cache.put(file_hash, 'x' * 10)
+    cache.evict()
+
+    assert cache.stats()['entries'] == 2
+    assert cache.get('a') is None
@@ -0,0 +1,100 @@
+import numpy as np
+
+import ocr_engine
+from ocr_engine import layout_to_text, split_tsv_pages, words_from_data
+
+HEADER = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext'
+
+
+def tsv_row(level, page, block=0, par=0, line=0, word=0, left=0, top=0, width=0, height=0, conf='-1', text=''):
+    return '\t'.join(str(value) for value in (level, page, block, par, line, word, left, top, width, height, conf, text))
+
+
+def test_batch_tsv_is_split_into_one_layout_per_image():
+    tsv = '\n'.join([
+        HEADER,
+        tsv_row(1, 1, width=800, height=1000),
+        tsv_row(5, 1, 1, 1, 1, 1, 10, 20, 60, 15, '91.2', 'Carteira'),
+        tsv_row(5, 1, 1, 1, 1, 2, 80, 20, 40, 15, '88', 'Nacional'),
+        tsv_row(5, 1, 1, 1, 2, 1, 10, 40, 50, 15, '-1', ' '),
+        tsv_row(1, 2, width=600, height=400),
+        tsv_row(5, 2, 1, 1, 1, 1, 5, 5, 30, 12, '75.5', 'Passeport'),
+    ])
+
+    pages = split_tsv_pages(tsv)
+
+    assert [(page['width'], page['height']) for page in pages] == [(800, 1000), (600, 400)]
+    assert words_from_data(pages[0]['data']) == [['Carteira', 10, 20, 60, 15, 91.2, 1, 1, 1],
+                                         ['Nacional', 80, 20, 40, 15, 88.0, 1, 1, 1]]
+    assert layout_to_text({'words': words_from_data(pages[1]['data'])}) == 'Passeport'
+
+
+def test_batch_run_returns_page_dimensions(monkeypatch):
+    tsv = '\n'.join([HEADER, tsv_row(1, 1, width=30, height=40),
+                     tsv_row(5, 1, 1, 1, 1, 1, 2, 3, 10, 8, '90', 'RG'), tsv_row(1, 2, width=50, height=20)])
+    monkeypatch.setattr(ocr_engine.subprocess, 'run', lambda command, **kwargs: type(
+        'Result', (), {'returncode': 0, 'stdout': tsv.encode('utf-8')}))
+
+    layouts = ocr_engine.PytesseractBackend().batch_image_to_data(
+        [np.zeros((40, 30), dtype=np.uint8), np.zeros((20, 50), dtype=np.uint8)])
+
+    assert layouts == [{'width': 30, 'height': 40, 'words': [['RG', 2, 3, 10, 8, 90.0, 1, 1, 1]]},
+                       {'width': 50, 'height': 20, 'words': []}]
+
+
+def test_invalid_tsv_yields_no_pages():
+    assert split_tsv_pages('Error opening data file') == []
+
+
+def test_layout_text_breaks_lines_by_block_paragraph_and_line():
+    layout = {'words': [['Nome', 0, 0, 1, 1, 90, 1, 1, 1], ['Completo', 0, 0, 1, 1, 90, 1, 1, 1],
+                        ['CPF', 0, 0, 1, 1, 90, 1, 1, 2], ['Assinatura', 0, 0, 1, 1, 90, 2, 1, 1]]}
+    assert layout_to_text(layout) == 'Nome Completo\nCPF\nAssinatura'
+
+
+def test_tesserocr_reuses_the_api_and_reads_numpy_buffers(monkeypatch):
+    class FakeApi:
+        def __init__(self):
+            self.images = []
+
+        def SetImageBytes(self, data, width, height, bytes_per_pixel, bytes_per_line):
+            self.images.append((len(data), width, height, bytes_per_pixel, bytes_per_line))
+
+        def GetUTF8Text(self):
+            return 'Carteira Nacional'
+
+    apis = []
+    backend = ocr_engine.TesserocrBackend(tessdata_path='/nao/existe')
+    monkeypatch.setattr(ocr_engine, 'tesserocr', type('tesserocr', (), {
+        'OEM': type('OEM', (), {'DEFAULT': 3}),
+        'PyTessBaseAPI': lambda **kwargs: apis.append(FakeApi()) or apis[-1]}))
+
+    for _ in range(3):
+        assert backend.image_to_string(np.zeros((40, 30), dtype=np.uint8)) == 'Carteira Nacional'
+    backend.image_to_string(np.zeros((40, 30, 3), dtype=np.uint8))
+
+    assert len(apis) == 1
+    assert apis[0].images == [(1200, 30, 40, 1, 30)] * 3 + [(3600, 30, 40, 3, 90)]
+
+
+def test_tesserocr_errors_fall_back_to_pytesseract(monkeypatch):
+    class BrokenApi:
+        def SetImageBytes(self, *args):
+            raise RuntimeError('modelo ausente')
+
+    backend = ocr_engine.TesserocrBackend(tessdata_path='/nao/existe')
+    monkeypatch.setattr(backend, '_get_api', lambda lang, psm: BrokenApi())
+    calls = []
+    monkeypatch.setattr(backend.fallback, 'image_to_string',
+                        lambda image, lang='por', psm=6: calls.append((lang, psm)) or 'texto')
+
+    assert backend.image_to_string(np.zeros((10, 10), dtype=np.uint8), lang='fra', psm=4) == 'texto'
+    assert calls == [('fra', 4)]
+
+
+def test_pytesseract_is_used_when_tesserocr_is_missing(monkeypatch):
+    monkeypatch.setattr(ocr_engine, 'tesserocr', None)
+    monkeypatch.setattr(ocr_engine, '_backend', None)
+    monkeypatch.setenv('OCR_BACKEND', 'tesserocr')
+
+    assert isinstance(ocr_engine.get_ocr_backend(), ocr_engine.PytesseractBackend)
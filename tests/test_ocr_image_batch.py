@@ -0,0 +1,77 @@
+from PIL import Image
+
+import document_pipeline
+from ocr_cache import PersistentOCRCache
+
+
+class RecordingBackend:
+    """Backend falso: registra as imagens recebidas e devolve uma palavra por imagem"""
+
+    name = 'pytesseract'
+
+    def __init__(self):
+        self.calls = []
+
+    def batch_image_to_data(self, images, lang='por', psm=6):
+        self.calls.append((lang, list(images)))
+        return [{'width': 100, 'height': 100,
+                 'words': [['documento', 0, 0, 10, 10, 95.0, 1, 1, 1]] * 12}
+                for _ in images]
+
+
+def test_ocr_image_batch_with_prescreen_disabled(monkeypatch, tmp_path):
+    backend = RecordingBackend()
+    monkeypatch.setattr(document_pipeline, 'PHOTO_PRESCREEN', False)
+    monkeypatch.setattr(document_pipeline, 'ocr_cache', PersistentOCRCache(str(tmp_path / 'ocr_cache.db')))
+    monkeypatch.setattr(document_pipeline, 'get_ocr_backend', lambda: backend)
+
+    paths = []
+    for index in range(2):
+        path = tmp_path / f'scan_{index}.png'
+        Image.new('RGB', (400, 300), 'white').save(path)
+        paths.append(str(path))
+
+    stats = document_pipeline.ocr_image_batch([(path, None) for path in paths])
+
+    assert (stats['images'], stats['runs']) == (2, 1)
+    assert set(stats['documents']) == set(paths)
+    assert backend.calls and all(image is not None for _, images in backend.calls for image in images)
+    for path in paths:
+        assert document_pipeline.get_cached_ocr(path).startswith('documento')
+
+
+class CountingDetector:
+    """Detector de rostos falso: conta as chamadas e não encontra rostos"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detectMultiScale(self, gray, **kwargs):
+        self.calls += 1
+        return []
+
+
+def test_batched_documents_reuse_the_prescreen_and_ocr_stats(monkeypatch, tmp_path):
+    backend = RecordingBackend()
+    detector = CountingDetector()
+    decoded = []
+    load_image = document_pipeline.load_image_for_ocr
+    monkeypatch.setattr(document_pipeline, 'PHOTO_PRESCREEN', True)
+    monkeypatch.setattr(document_pipeline, 'PROGRESSIVE_OCR', False)
+    monkeypatch.setattr(document_pipeline, 'ocr_cache', PersistentOCRCache(str(tmp_path / 'ocr_cache.db')))
+    monkeypatch.setattr(document_pipeline, 'get_ocr_backend', lambda: backend)
+    monkeypatch.setattr(document_pipeline, 'get_face_detector', lambda: detector)
+    monkeypatch.setattr(document_pipeline, 'load_image_for_ocr', lambda path: decoded.append(path) or load_image(path))
+    path = tmp_path / 'comprovante.png'
+    Image.new('RGB', (400, 300), 'white').save(path)
+
+    stats = document_pipeline.ocr_image_batch([(str(path), 'abc')])
+    result = document_pipeline.process_single_file(path.name, str(path), None, {}, True, 'abc',
+                                                   batch_document=stats['documents'][str(path)])
+
+    # Uma decodificação e uma detecção de rostos: o processamento por documento reaproveita o lote
+    assert decoded == [str(path)] and detector.calls == 1
+    assert result['ocr_passes'] == 1
+    assert result['ocr_languages'] == ['por']
+    assert result['ocr_stage'] == 'full'
+    assert result['ocr_confidence'] == 0.95
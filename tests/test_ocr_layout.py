@@ -0,0 +1,70 @@
+import numpy as np
+from PIL import Image
+
+import document_pipeline
+from ocr_cache import PersistentOCRCache
+
+
+class CropBackend:
+    """Backend falso: registra a altura de cada recorte e devolve o próximo texto da fila"""
+
+    name = 'tesserocr'
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.heights = []
+
+    def image_to_data(self, image, lang='por', psm=6):
+        height, width = np.asarray(image).shape[:2]
+        self.heights.append(height)
+        words = [[word, 0, 0, 10, 10, 90.0, 1, 1, 1] for word in self.texts.pop(0).split()]
+        return {'width': width, 'height': height, 'words': words}
+
+
+class FailingBackend:
+    name = 'tesserocr'
+
+    def image_to_data(self, image, lang='por', psm=6):
+        raise AssertionError("Tesseract não deveria rodar")
+
+
+def test_complete_text_resumes_from_the_cached_layout(monkeypatch, tmp_path):
+    monkeypatch.setattr(document_pipeline, 'ocr_cache', PersistentOCRCache(str(tmp_path / 'ocr_cache.db')))
+    monkeypatch.setattr(document_pipeline, 'MULTIRES_OCR', False)
+    monkeypatch.setattr(document_pipeline, 'classification_is_decided', lambda text, categories=None: True)
+    backend = CropBackend(["bulletin de salaire", "Période Mars 2024"])
+    monkeypatch.setattr(document_pipeline, 'get_ocr_backend', lambda: backend)
+    path = tmp_path / 'bulletin.png'
+    Image.new('RGB', (800, 1000), 'white').save(path)
+
+    ctx = document_pipeline.DocumentContext(str(path), 'abc', progressive=True)
+    assert ctx.text == "bulletin de salaire"
+    assert ctx.ocr_stats['stage'] == 'header'
+    page_height = ctx.layout['pages'][0]['height']
+    split_row = ctx.layout['pages'][0]['rows']
+    assert split_row < page_height
+
+    text = ctx.complete_text()
+
+    # O cabeçalho vem do layout em cache: só o resto da página passa pelo OCR
+    assert backend.heights == [split_row, page_height - split_row]
+    assert text == "bulletin de salaire\nPériode Mars 2024"
+    assert ctx.ocr_stats['stage'] == 'full'
+    assert ctx.layout['pages'][0]['rows'] == page_height
+
+
+def test_cache_hit_serves_the_layout_without_tesseract(monkeypatch, tmp_path):
+    monkeypatch.setattr(document_pipeline, 'ocr_cache', PersistentOCRCache(str(tmp_path / 'ocr_cache.db')))
+    monkeypatch.setattr(document_pipeline, 'MULTIRES_OCR', False)
+    monkeypatch.setattr(document_pipeline, 'get_ocr_backend', lambda: CropBackend(["attestation de domicile"]))
+    path = tmp_path / 'attestation.png'
+    Image.new('RGB', (800, 1000), 'white').save(path)
+    first = document_pipeline.DocumentContext(str(path), 'abc')
+    assert first.text == "attestation de domicile"
+
+    monkeypatch.setattr(document_pipeline, 'get_ocr_backend', lambda: FailingBackend())
+    ctx = document_pipeline.DocumentContext(str(path), 'abc')
+
+    assert ctx.text == "attestation de domicile"
+    assert ctx.layout == first.layout
+    assert [word[0] for word in ctx.layout['pages'][0]['words']] == ['attestation', 'de', 'domicile']
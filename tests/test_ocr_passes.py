@@ -0,0 +1,72 @@
+import numpy as np
+
+import document_pipeline
+
+
+class CountingBackend:
+    """Backend falso: conta as execuções e devolve o mesmo texto com a confiança pedida"""
+
+    name = 'tesserocr'
+
+    def __init__(self, text, confidence=90.0):
+        self.text = text
+        self.confidence = confidence
+        self.calls = []
+
+    def image_to_data(self, image, lang='por', psm=6):
+        height, width = np.asarray(image).shape[:2]
+        self.calls.append((lang, width))
+        words = [[word, 0, 0, 10, 10, self.confidence, 1, 1, 1] for word in self.text.split()]
+        return {'width': width, 'height': height, 'words': words}
+
+
+PORTUGUESE = "certidão de nascimento do registro civil das pessoas naturais da república federativa do brasil"
+
+
+def run_page(monkeypatch, backend, size, filename="scan.png"):
+    monkeypatch.setattr(document_pipeline, 'get_ocr_backend', lambda: backend)
+    stats = document_pipeline.new_ocr_stats()
+    text = document_pipeline.ocr_with_language_routing(np.full((size, size), 255, dtype=np.uint8), filename, "", stats)
+    return text, stats
+
+
+def test_small_image_reuses_the_probe(monkeypatch):
+    backend = CountingBackend(PORTUGUESE)
+    text, stats = run_page(monkeypatch, backend, 600)
+
+    assert len(backend.calls) == 1
+    assert text == PORTUGUESE
+    assert stats['passes'] == 1 and stats['probe_passes'] == 1
+
+
+def test_probe_counts_against_passes_saved(monkeypatch):
+    monkeypatch.setattr(document_pipeline, 'MULTIRES_OCR', False)
+    backend = CountingBackend(PORTUGUESE)
+    _, stats = run_page(monkeypatch, backend, 2000)
+
+    # Português limpo: o fluxo antigo fazia 1 passada; sondagem + passada não economizam nada
+    assert stats['passes_saved'] == 0
+
+    # Francês sem dica no nome: por + fra+por no fluxo antigo, sondagem + fra+por agora
+    backend = CountingBackend("attestation de domicile délivrée par la préfecture pour monsieur le titulaire")
+    _, stats = run_page(monkeypatch, backend, 2000)
+    assert [lang for lang, _ in backend.calls] == ['fra+por', 'fra+por']
+    assert stats['probe_passes'] == 1 and stats['passes_saved'] == 0
+
+
+def test_probe_doubles_as_the_low_resolution_pass(monkeypatch):
+    monkeypatch.setattr(document_pipeline, 'MULTIRES_OCR', True)
+    backend = CountingBackend(PORTUGUESE)
+    _, stats = run_page(monkeypatch, backend, 2000)
+
+    assert backend.calls == [('fra+por', 1000)]
+    assert stats['passes'] == 1 and stats['resolutions'] == ['low']
+
+
+def test_escalation_counts_every_invocation(monkeypatch):
+    monkeypatch.setattr(document_pipeline, 'MULTIRES_OCR', True)
+    backend = CountingBackend(PORTUGUESE, confidence=40.0)
+    _, stats = run_page(monkeypatch, backend, 2000)
+
+    assert backend.calls == [('fra+por', 1000), ('por', 2000)]
+    assert stats['passes'] == 2 and stats['probe_passes'] == 1 and stats['escalations'] == 1
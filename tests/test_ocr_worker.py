@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+
+import app
+import document_pipeline
+import ocr_worker
+from conftest import ROOT
+
+
+def test_worker_module_does_not_import_the_flask_app():
+    code = "import sys, ocr_worker; print('app' in sys.modules, 'flask' in sys.modules)"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    assert output.stdout.splitlines()[-1] == 'False False'
+
+
+def test_entry_points_return_peak_rss(monkeypatch):
+    monkeypatch.setattr(document_pipeline, 'process_single_file', lambda *args: {'filename': args[0]})
+    monkeypatch.setattr(ocr_worker, 'peak_rss_mb', lambda: 180.0)
+
+    assert ocr_worker.process_document('scan.png', 'scan.png') == ({'filename': 'scan.png'}, 180.0)
+
+
+def test_main_process_reports_no_rss():
+    assert ocr_worker.peak_rss_mb() is None
+
+
+def test_pool_size_follows_measured_worker_rss(monkeypatch):
+    monkeypatch.delenv('OCR_POOL_WORKERS', raising=False)
+    monkeypatch.setattr(app.os, 'cpu_count', lambda: 8)
+    monkeypatch.setattr(app, 'OCR_MEMORY_BUDGET_MB', 600)
+    monkeypatch.setattr(app, 'OCR_WORKER_MEMORY_MB', 300)
+    monkeypatch.setattr(app, 'worker_peak_rss_mb', 0.0)
+    assert app.compute_ocr_pool_size() == 2  # Estimativa até a primeira medição
+
+    app.record_worker_rss(None)  # Pool de threads: sem medição
+    app.record_worker_rss(140.0)
+    app.record_worker_rss(110.0)
+    assert app.compute_ocr_pool_size() == 4
+
+
+class FakePool:
+    """Pool falso: registra os shutdowns (e se as tarefas pendentes seriam canceladas)"""
+
+    def __init__(self, *args, **kwargs):
+        self.shutdowns = []
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns.append(cancel_futures)
+
+
+def use_pool(monkeypatch, pool, size, sessions):
+    monkeypatch.setattr(app, 'ocr_executor', pool)
+    monkeypatch.setattr(app, 'ocr_executor_size', size)
+    monkeypatch.setattr(app, 'ocr_executor_sessions', sessions)
+
+
+def test_reset_does_not_cancel_other_sessions(monkeypatch):
+    pool = FakePool()
+    use_pool(monkeypatch, pool, 2, 2)
+
+    app.reset_ocr_executor(pool)
+    app.release_ocr_executor(pool)  # Sessão do pool descartado: não mexe no contador
+
+    assert pool.shutdowns == [False]
+    assert app.ocr_executor is None and app.ocr_executor_sessions == 0
+
+    # Pool já recriado por outra sessão: um reset atrasado do pool antigo não o derruba
+    newer = FakePool()
+    use_pool(monkeypatch, newer, 2, 1)
+    app.reset_ocr_executor(pool)
+    assert app.ocr_executor is newer and newer.shutdowns == []
+
+
+def test_pool_shrinks_only_when_idle(monkeypatch):
+    monkeypatch.setattr(app, 'ProcessPoolExecutor', FakePool)
+    monkeypatch.setattr(app, 'compute_ocr_pool_size', lambda: 1)
+    monkeypatch.setattr(document_pipeline, 'ocr_pool_size', document_pipeline.ocr_pool_size)
+    pool = FakePool()
+    use_pool(monkeypatch, pool, 3, 1)
+
+    assert app.get_ocr_executor() is pool  # Outra sessão usa o pool: mantém o tamanho
+    app.release_ocr_executor(pool)
+    app.release_ocr_executor(pool)
+
+    smaller = app.get_ocr_executor()
+    assert smaller is not pool and pool.shutdowns == [False]
+    assert app.ocr_executor_size == 1 and app.ocr_executor_sessions == 1
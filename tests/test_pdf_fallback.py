@@ -0,0 +1,43 @@
+import fitz
+
+import document_pipeline
+
+
+TEXT = "Comprovante de residencia emitido em 10/03/2024 para Maria da Silva, Rua das Flores 123"
+
+
+class BrokenFitz:
+    """PyMuPDF falso que não consegue abrir nenhum arquivo"""
+
+    @staticmethod
+    def open(file_path):
+        raise fitz.FileDataError("cannot open broken document")
+
+
+def text_pdf(path):
+    with fitz.open() as document:
+        page = document.new_page()
+        for line in range(12):
+            page.insert_text((50, 72 + line * 20), TEXT)
+        document.save(str(path))
+
+
+def test_extract_pdf_text_falls_back_to_pypdf2(monkeypatch, tmp_path):
+    path = tmp_path / 'comprovante.pdf'
+    text_pdf(path)
+    monkeypatch.setattr(document_pipeline, 'fitz', BrokenFitz)
+
+    text = document_pipeline.extract_pdf_text_pymupdf(str(path), path.name, document_pipeline.new_ocr_stats())
+
+    assert "Comprovante de residencia" in text
+
+
+def test_separate_documents_falls_back_to_pypdf2(monkeypatch, tmp_path):
+    path = tmp_path / 'lote.pdf'
+    text_pdf(path)
+    monkeypatch.setattr(document_pipeline, 'fitz', BrokenFitz)
+
+    documents = document_pipeline.separate_documents_from_pdf(str(path))
+
+    assert [document['page_number'] for document in documents] == [1]
+    assert "Comprovante de residencia" in documents[0]['text']
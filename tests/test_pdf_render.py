@@ -0,0 +1,22 @@
+import fitz
+import pytest
+
+import document_pipeline
+
+
+@pytest.mark.parametrize('page_size, expected', [
+    ((595, 842), (1190, 1684)),   # A4: 2x, como antes, sem redução posterior
+    ((420, 595), (840, 1190)),    # A5: não é ampliada além de 2x
+    ((842, 1191), (1414, 2000)),  # A3: sai do renderizador já no alvo do OCR
+    ((1684, 1191), (2000, 1414)),  # A2 paisagem
+])
+def test_pages_render_gray_at_the_ocr_target_size(page_size, expected):
+    with fitz.open() as document:
+        page = document.new_page(width=page_size[0], height=page_size[1])
+        page.insert_text((50, 72), "Accusé de réception")
+
+        array = document_pipeline.render_page_gray(page)
+
+    assert array.ndim == 2
+    assert (array.shape[1], array.shape[0]) == pytest.approx(expected, abs=1)
+    assert max(array.shape) <= document_pipeline.OCR_TARGET_SIZE
@@ -0,0 +1,71 @@
+import numpy as np
+from PIL import Image
+
+import document_pipeline
+
+
+class CountingDetector:
+    """Detector de rostos falso: conta as chamadas e devolve caixas fixas"""
+
+    def __init__(self, faces=()):
+        self.faces = list(faces)
+        self.calls = 0
+        self.min_sizes = []
+
+    def detectMultiScale(self, gray, **kwargs):
+        self.calls += 1
+        self.min_sizes.append(kwargs['minSize'])
+        return self.faces
+
+
+def landscape_image(path):
+    # Gradiente saturado e suave: muita cor, nenhum papel, poucas bordas
+    ramp = np.linspace(0, 255, 800, dtype=np.uint8)
+    pixels = np.zeros((600, 800, 3), dtype=np.uint8)
+    pixels[:, :, 0] = ramp
+    pixels[:, :, 1] = 60
+    pixels[:, :, 2] = 255 - ramp
+    Image.fromarray(pixels).save(path)
+
+
+def test_landscape_prescreen_is_reachable(monkeypatch, tmp_path):
+    detector = CountingDetector()
+    monkeypatch.setattr(document_pipeline, 'get_face_detector', lambda: detector)
+    path = tmp_path / 'praia.png'
+    landscape_image(path)
+
+    result = document_pipeline.prescreen_photo(document_pipeline.DocumentContext(str(path)))
+
+    assert result is not None
+    assert result['category'] == 'fotos_pessoas'
+    assert result['confidence'] >= document_pipeline.PHOTO_PRESCREEN_LANDSCAPE_THRESHOLD
+
+
+def test_face_detection_runs_once_per_document(monkeypatch, tmp_path):
+    detector = CountingDetector(faces=[(16, 16, 32, 32)])
+    monkeypatch.setattr(document_pipeline, 'get_face_detector', lambda: detector)
+    path = tmp_path / 'rg.png'
+    Image.new('RGB', (800, 600), 'white').save(path)
+
+    ctx = document_pipeline.DocumentContext(str(path))
+    assert document_pipeline.prescreen_photo(ctx) is None  # Papel demais: segue para o OCR
+    _, _, num_faces, _ = document_pipeline.detect_people_photo(ctx, "")
+
+    assert detector.calls == 1
+    assert num_faces == 1
+    assert ctx.faces[0] == (20, 20, 40, 40)  # Caixa mapeada para a imagem original (640 → 800)
+
+
+def test_min_face_size_is_measured_on_the_original_file(monkeypatch, tmp_path):
+    detector = CountingDetector()
+    monkeypatch.setattr(document_pipeline, 'get_face_detector', lambda: detector)
+
+    for size in [(400, 300), (4000, 3000)]:
+        path = tmp_path / f'foto_{size[0]}.jpg'
+        Image.new('RGB', size, 'white').save(path)
+        image = document_pipeline.load_image_for_ocr(str(path))
+        document_pipeline.extract_photo_features(image)
+
+    # 30px no original: inalterado sem redução; numa foto de 4000px decodificada
+    # a 2000px, a cópia de 640px aceita rostos de 30 * 640/4000 ≈ 5px
+    assert detector.min_sizes == [(30, 30), (5, 5)]
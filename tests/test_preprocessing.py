@@ -0,0 +1,46 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from preprocessing import apply_preprocessing, plan_preprocessing, preprocess_for_ocr
+
+
+def text_page(angle=0.0, height=2200, width=1600):
+    """Página branca com linhas de "texto" (blocos escuros), rotacionada em angle graus"""
+    page = np.full((height, width), 245, dtype=np.uint8)
+    for top in range(150, height - 150, 60):
+        for left in range(120, width - 200, 90):
+            cv2.rectangle(page, (left, top), (left + 70, top + 22), 20, -1)
+    if angle:
+        matrix = cv2.getRotationMatrix2D((width // 2, height // 2), angle, 1.0)
+        page = cv2.warpAffine(page, matrix, (width, height), borderValue=245)
+    return page
+
+
+@pytest.mark.parametrize('angle', [-3.0, 1.5, 4.0])
+def test_skew_is_estimated_on_the_downsampled_copy(angle):
+    plan = plan_preprocessing(text_page(angle))
+    assert plan['angle'] == pytest.approx(-angle, abs=0.3)
+
+
+def test_clean_page_uses_otsu_without_denoise_or_rotation():
+    binary, plan = preprocess_for_ocr(text_page(), time_budget_ms=None)
+
+    assert plan['binarization'] == 'otsu'
+    assert not plan['denoise']
+    assert abs(plan['angle']) < 0.5
+    assert plan['skipped'] == []
+    assert set(np.unique(binary)) <= {0, 255}
+
+
+def test_expired_deadline_skips_optional_steps_but_still_binarizes():
+    gray = text_page(3.0)[:900, :900]
+    plan = {'scale': 2.0, 'angle': -3.0, 'binarization': 'adaptive', 'denoise': True}
+
+    binary = apply_preprocessing(gray, plan, deadline=time.time() - 1)
+
+    assert plan['skipped'] == ['scale', 'deskew', 'denoise', 'adaptive']
+    assert binary.shape == gray.shape
+    assert set(np.unique(binary)) <= {0, 255}
@@ -0,0 +1,67 @@
+from PIL import Image
+
+import document_pipeline
+
+
+def fake_extraction(header_text, full_text):
+    """extract_text_from_file falso: cabeçalho no modo progressivo, documento inteiro sem ele"""
+    calls = []
+
+    def extract(file_path, file_hash=None, context=None, progressive=False, resume=None):
+        calls.append(progressive)
+        stats = context.ocr_stats
+        stats['stage'] = 'header' if progressive else 'full'
+        stats['words'] += 4
+        stats['confidence_sum'] += 4 * (90.0 if progressive else 80.0)
+        return header_text if progressive else full_text
+
+    return extract, calls
+
+
+def test_ocr_confidence_uses_word_confidences():
+    stats = document_pipeline.new_ocr_stats()
+    stats.update(stage='header', words=2, confidence_sum=180.0)
+    assert document_pipeline.compute_ocr_confidence("curto", stats) == 0.9
+
+    stats.update(words=0, confidence_sum=0.0)
+    assert document_pipeline.compute_ocr_confidence("curto", stats) is None
+
+    stats['stage'] = 'text_layer'
+    assert document_pipeline.compute_ocr_confidence("x" * 250, stats) == 0.5
+
+
+def test_bulletin_period_comes_from_the_complete_text(monkeypatch, tmp_path):
+    path = tmp_path / 'scan.png'
+    Image.new('RGB', (50, 50), 'white').save(path)
+    extract, calls = fake_extraction("bulletin de salaire salaire net employeur",
+                                     "bulletin de salaire salaire net employeur\nPériode : Mars 2024")
+    monkeypatch.setattr(document_pipeline, 'PROGRESSIVE_OCR', True)
+    monkeypatch.setattr(document_pipeline, 'PHOTO_PRESCREEN', False)
+    monkeypatch.setattr(document_pipeline, 'extract_text_from_file', extract)
+    monkeypatch.setattr(document_pipeline, 'classify_offline_fallback', lambda ctx, categories: {
+        'category': 'bulletin_salaire', 'category_name': 'Bulletin', 'method': 'offline_content',
+        'confidence': 0.9})
+
+    result = document_pipeline.process_single_file('scan.png', str(path), None, {}, True, file_hash='abc')
+
+    assert calls == [True, False]
+    assert result['suggested_filename'] == 'Bulletin_de_salaire_Mars_2024.pdf'
+    assert result['ocr_stage'] == 'full'
+    assert result['ocr_confidence'] == 0.85
+
+
+def test_partial_text_is_not_recorded_for_learning(monkeypatch, tmp_path):
+    path = tmp_path / 'scan.png'
+    Image.new('RGB', (50, 50), 'white').save(path)
+    extract, _ = fake_extraction("carte nationale d'identité", "")
+    recorded = []
+    monkeypatch.setattr(document_pipeline, 'PHOTO_PRESCREEN', False)
+    monkeypatch.setattr(document_pipeline, 'extract_text_from_file', extract)
+    monkeypatch.setattr(document_pipeline, 'classify_people_photo', lambda ctx, text: None)
+    monkeypatch.setattr(document_pipeline.learning_system, 'record_classification',
+                        lambda filename, category, confidence=None, text_content=None: recorded.append(text_content))
+
+    ctx = document_pipeline.DocumentContext(str(path), 'abc', progressive=True)
+    document_pipeline.classify_document_hybrid(ctx, None, {})
+
+    assert recorded == [None]
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+import document_pipeline
+from classification_rules import (CONTENT_PATTERNS, LEGAL_CATEGORIES, RG_EXCLUSION_TERMS, SPECIFIC_CATEGORIES,
+                                  builtin_rules, compile_rules, load_rules_from_file, write_categories_file)
+
+
+def baseline_content_classification(text_lower):
+    """Regras de conteúdo como eram avaliadas em classify_offline_fallback antes do RuleSet
+
+    Jurídicas (1 padrão) → específicas (1 padrão) → demais na ordem da tabela,
+    com RG exigindo 3 padrões e nenhum termo jurídico/específico.
+    """
+    for category in LEGAL_CATEGORIES:
+        matches = sum(1 for pattern in CONTENT_PATTERNS[category] if pattern in text_lower)
+        if matches >= 1:
+            return category, 'offline_content_legal', min(0.9, 0.7 + (matches * 0.1))
+    for category in SPECIFIC_CATEGORIES:
+        matches = sum(1 for pattern in CONTENT_PATTERNS[category] if pattern in text_lower)
+        if matches >= 1:
+            return category, 'offline_content_specific', min(0.9, 0.7 + (matches * 0.1))
+    for category, patterns in CONTENT_PATTERNS.items():
+        if category in LEGAL_CATEGORIES or category in SPECIFIC_CATEGORIES:
+            continue
+        matches = sum(1 for pattern in patterns if pattern in text_lower)
+        if matches > 0:
+            if category == 'rg' and matches >= 3:
+                if not any(term in text_lower for term in RG_EXCLUSION_TERMS):
+                    return category, 'offline_content', min(0.7, 0.4 + (matches * 0.08))
+            elif category != 'rg':
+                return category, 'offline_content', min(0.8, 0.6 + (matches * 0.1))
+    return None
+
+
+def sample_texts():
+    """Frases de todas as categorias, isoladas e combinadas (conflitos de prioridade)"""
+    phrases = {category: list(patterns) for category, patterns in CONTENT_PATTERNS.items()}
+    texts = [phrase for patterns in phrases.values() for phrase in patterns]
+    rg = phrases['rg']
+    texts += [' '.join(rg[:2]), ' '.join(rg[:3]), ' '.join(rg[:5])]
+    texts += [' '.join(rg[:4] + [term]) for term in RG_EXCLUSION_TERMS]
+    texts += [f"{phrases[legal][0]} {phrases[specific][0]}"
+              for legal in LEGAL_CATEGORIES for specific in SPECIFIC_CATEGORIES]
+
+    rng = random.Random(25)
+    all_phrases = [phrase for patterns in phrases.values() for phrase in patterns]
+    for _ in range(500):
+        texts.append(' '.join(rng.sample(all_phrases, rng.randint(1, 5))))
+    return [text.lower() for text in texts] + ['texto sem nenhuma regra']
+
+
+@pytest.fixture(params=['builtin', 'categories.json'])
+def rules(request, tmp_path):
+    if request.param == 'builtin':
+        return compile_rules()
+    path = str(tmp_path / 'categories.json')
+    write_categories_file({'outros': 'Outros Documentos'}, builtin_rules(), path)
+    return load_rules_from_file(path)
+
+
+def test_rule_set_reproduces_the_baseline_priority_order(rules):
+    assert rules.version == compile_rules().version
+    for text in sample_texts():
+        result = document_pipeline.classify_by_content(text, rules=rules)
+        expected = baseline_content_classification(text)
+        if expected is None:
+            assert result is None, text
+        else:
+            assert (result['category'], result['method']) == expected[:2], text
+            assert result['confidence'] == pytest.approx(expected[2]), text
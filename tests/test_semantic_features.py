@@ -0,0 +1,50 @@
+import random
+import re
+
+import pytest
+
+from semantic_features import extract_features
+
+
+def separate_scans(text_content):
+    """Features como eram calculadas antes: uma busca (e um lower()) por feature"""
+    return {
+        'has_cpf': bool(re.search(r'\d{3}\.\d{3}\.\d{3}-\d{2}', text_content)),
+        'has_rg': bool(re.search(r'\d{1,2}\.\d{3}\.\d{3}-\d{1,2}', text_content)),
+        'has_cnpj': bool(re.search(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', text_content)),
+        'has_cep': bool(re.search(r'\d{5}-?\d{3}', text_content)),
+        'has_money': bool(re.search(r'R\$\s*\d+[,.]?\d*', text_content)),
+        'has_date': bool(re.search(r'\d{1,2}/\d{1,2}/\d{4}', text_content)),
+        'has_kwh': 'kwh' in text_content.lower(),
+        'has_m3': 'm³' in text_content.lower() or 'm3' in text_content.lower(),
+        'has_tribunal': 'tribunal' in text_content.lower(),
+        'has_attestation': 'attestation' in text_content.lower(),
+        'has_salaire': 'salaire' in text_content.lower() or 'bulletin' in text_content.lower(),
+        'language': 'french' if any(word in text_content.lower()
+                                    for word in ['monsieur', 'madame', 'attestation', 'tribunal']) else 'portuguese',
+    }
+
+
+def as_dict(features):
+    return {name: value for name, value in features._asdict().items() if name != 'keyword_matches'}
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    'CPF 123.456.789-09',  # O final do CPF também casa com o formato de RG
+    'RG 12.345.678-9 emitido em 01/02/2020',
+    'CNPJ 12.345.678/0001-90 - CEP 01310-100',
+    'Total: R$ 1.234,56 - consumo 350 kWh e 12 m³',
+    'Madame, veuillez trouver le BULLETIN de salaire',
+    'Tribunal administratif - Attestation sur l\'honneur',
+    'Nota 12345678 sem formatação',
+])
+def test_single_pass_matches_the_separate_scans(text):
+    assert as_dict(extract_features(text)) == separate_scans(text)
+
+
+def test_random_digit_runs_match_the_separate_scans():
+    rng = random.Random(24)
+    for _ in range(500):
+        text = ''.join(rng.choice('0123456789./-R$ ') for _ in range(rng.randint(0, 40)))
+        assert as_dict(extract_features(text)) == separate_scans(text)
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+import ocr_worker
+
+
+def test_deferred_documents_count_as_ocr_progress(monkeypatch, tmp_path):
+    session_id = 'sessao'
+    (tmp_path / session_id).mkdir()
+    files = ['a.pdf', 'b.pdf', 'c.pdf']
+    for filename in files:
+        (tmp_path / session_id / filename).write_bytes(b'%PDF')
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(app, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(app, 'OCR_BATCH', False)
+    monkeypatch.setattr(app, 'BATCH_CLASSIFIER', True)
+    monkeypatch.setattr(app, 'BATCH_CLASSIFIER_MIN_FILES', 1)
+    monkeypatch.setattr(app, 'get_ocr_executor', lambda: executor)
+    monkeypatch.setattr(app, 'release_ocr_executor', lambda executor: None)
+    monkeypatch.setattr(ocr_worker, 'process_document', lambda filename, *args: (
+        {'filename': filename, 'deferred': True, 'text': 'texto'}, None))
+
+    seen = []
+
+    def classify(deferred, categories, use_offline_mode):
+        job = app.processing_jobs[session_id]
+        seen.append((job['progress'], job['classified']))
+        return [{'filename': entry['filename'], 'category': 'outros'} for entry in deferred]
+
+    monkeypatch.setattr(app, 'classify_deferred_batch', classify)
+    app.processing_jobs[session_id] = {'status': 'processing', 'progress': 0, 'classified': 0,
+                                       'total': len(files), 'results': [], 'error': ''}
+
+    app.process_documents_async(session_id, None, {}, True)
+    executor.shutdown()
+
+    # OCR de todos concluído antes da classificação em lote: a barra não fica em 0/N
+    assert seen == [(3, 0)]
+    job = app.processing_jobs.pop(session_id)
+    assert job['status'] == 'completed'
+    assert (job['progress'], job['classified']) == (3, 3)
+    assert [result['filename'] for result in job['results']] == app.list_session_files(str(tmp_path / session_id))
@@ -0,0 +1,49 @@
+import document_pipeline
+from text_quality import score_text_layer
+
+A4_AREA = 595 * 842
+
+GOOD_TEXT = ("Comprovante de residência emitido em nome de Maria da Silva para fins de cadastro. "
+             "O endereço é Rua das Flores 123, com data de emissão em 10/03/2024. ") * 6
+GARBAGE_TEXT = "Ã§Ã£ ¤¤ xkrtq zzkwp �� ~^~ qwrt 1l1l ||| mnbvcx ¦¦ " * 10
+
+
+def test_real_text_layer_passes_and_garbage_fails():
+    good = score_text_layer(GOOD_TEXT, A4_AREA)
+    garbage = score_text_layer(GARBAGE_TEXT, A4_AREA)
+
+    assert good['passed'] and good['dictionary_rate'] > 0.15
+    assert not garbage['passed']
+    assert garbage['score'] < good['score']
+
+
+def test_sparse_page_scores_lower_than_a_dense_one():
+    sparse = score_text_layer("Nome da empresa", A4_AREA)
+    dense = score_text_layer(GOOD_TEXT, A4_AREA)
+    assert sparse['density'] < dense['density']
+    assert sparse['score'] < dense['score']
+
+
+def test_only_rejected_pages_are_ocred(monkeypatch):
+    ocred = []
+
+    def fake_ocr_pages(loaders, filename, trusted_text, ocr_stats, context, progressive, layout, page_numbers,
+                       resume=None):
+        ocred.extend(page_numbers)
+        for page_number in page_numbers:
+            layout['pages'].append({'page': page_number, 'width': 10, 'height': 10, 'rows': 10,
+                                    'words': [[f'ocr{page_number}', 0, 0, 1, 1, 90.0, 1, 1, 1]]})
+        ocr_stats['stage'] = 'full'
+
+    monkeypatch.setattr(document_pipeline, 'ocr_pages', fake_ocr_pages)
+    ocr_stats = document_pipeline.new_ocr_stats()
+    page_texts = [GOOD_TEXT, GARBAGE_TEXT, GARBAGE_TEXT]
+    page_scores = document_pipeline.score_pdf_pages(page_texts, [A4_AREA] * 3, ocr_stats)
+
+    text = document_pipeline.ocr_rejected_pdf_pages(page_texts, page_scores, [True, True, False],
+                                                    lambda page_num: None, 'lote.pdf', ocr_stats)
+
+    # A página 3 reprovou mas não tem imagem: mantém a camada de texto
+    assert ocred == [2]
+    assert text.split("\n")[-2:] == ['ocr2', GARBAGE_TEXT.strip()]
+    assert len(ocr_stats['text_layer_scores']) == 3
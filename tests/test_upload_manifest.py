@@ -0,0 +1,45 @@
+import io
+import os
+from datetime import datetime
+
+import app
+import document_pipeline
+from ocr_cache import PersistentOCRCache
+
+
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 5, 1, 10, 30, 0)
+
+
+def upload(client, data, name='contrato.pdf'):
+    response = client.post('/api/upload', data={'files[]': (io.BytesIO(data), name)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response.get_json()['session_id']
+
+
+def test_reupload_in_the_same_session_hits_the_cache_by_manifest_hash(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(app, 'datetime', FixedDatetime)
+    monkeypatch.setattr(document_pipeline, 'ocr_cache', PersistentOCRCache(str(tmp_path / 'ocr_cache.db')))
+    client = app.app.test_client()
+    data = b'%PDF-1.4 conteudo do contrato' * 1000
+
+    session_id = upload(client, data)
+    session_folder = os.path.join(str(tmp_path), session_id)
+    first_hash = app.load_session_manifest(session_folder)['contrato.pdf']['hash']
+    file_path = os.path.join(session_folder, 'contrato.pdf')
+    assert first_hash == document_pipeline.get_file_hash(file_path)
+    document_pipeline.save_to_cache(file_path, 'Contrato de locação', file_hash=first_hash)
+
+    assert upload(client, data) == session_id
+    manifest = app.load_session_manifest(session_folder)
+    assert manifest['contrato.pdf'] == {'hash': first_hash, 'size': len(data)}
+
+    # O digest do manifesto basta: o arquivo não é relido para calcular o hash
+    def no_rehash(path):
+        raise AssertionError('arquivo re-hasheado')
+    monkeypatch.setattr(document_pipeline, 'get_file_hash', no_rehash)
+    assert document_pipeline.get_cached_ocr(file_path, manifest['contrato.pdf']['hash']) == 'Contrato de locação'
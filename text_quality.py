@@ -0,0 +1,113 @@
+import os
+import re
+
+# Palavras funcionais frequentes em português e francês (presentes em quase
+# todo texto real, raras em camadas de texto corrompidas)
+STOPWORDS = frozenset([
+    # Português
+    'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na', 'nos', 'nas',
+    'um', 'uma', 'para', 'por', 'com', 'sem', 'que', 'se', 'ao', 'aos', 'à', 'às', 'pelo', 'pela',
+    'não', 'mais', 'como', 'seu', 'sua', 'ou', 'ser', 'foi', 'são', 'este', 'esta', 'nome',
+    'data', 'número', 'valor', 'total', 'cpf', 'rg', 'endereço',
+    # Francês
+    'le', 'la', 'les', 'l', 'un', 'une', 'des', 'du', 'd', 'et', 'en', 'au', 'aux', 'pour', 'par',
+    'sur', 'dans', 'avec', 'est', 'qui', 'que', 'ne', 'pas', 'il', 'elle', 'vous', 'nous', 'ce',
+    'cette', 'son', 'sa', 'ses', 'votre', 'date', 'nom', 'adresse', 'montant', 'net',
+])
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+VOWELS = set('aeiouyàáâãäéèêëíìîïóòôõöúùûü')
+
+# Caracteres típicos de texto de documento (além de letras e dígitos)
+COMMON_SYMBOLS = set(' \t\n\r.,;:!?\'"()-/%€$ºª°@&+*#=_[]')
+
+# Pesos dos componentes do score (somam 1.0)
+DICTIONARY_WEIGHT = 0.35
+PLAUSIBLE_WEIGHT = 0.25
+CHARACTER_WEIGHT = 0.25
+DENSITY_WEIGHT = 0.15
+
+DICTIONARY_RATE_FULL = 0.15  # Taxa de palavras funcionais que já vale nota máxima
+DENSITY_FULL = 5.0  # Caracteres por polegada² que já valem nota máxima
+
+# Score mínimo para confiar na camada de texto de uma página
+TEXT_LAYER_MIN_SCORE = float(os.environ.get('TEXT_LAYER_MIN_SCORE', 0.6))
+
+
+# Letras isoladas que existem como palavra (as demais indicam texto fragmentado)
+SINGLE_LETTER_WORDS = frozenset(['a', 'e', 'o', 'à', 'é', 'y'])
+
+
+def is_plausible_word(word):
+    """Palavra com vogal e sem sequências longas de consoantes (lixo de OCR não tem)"""
+    if len(word) == 1:
+        return word in SINGLE_LETTER_WORDS
+    if not any(char in VOWELS for char in word):
+        return False
+    consonant_run = 0
+    for char in word:
+        consonant_run = 0 if char in VOWELS else consonant_run + 1
+        if consonant_run > 4:
+            return False
+    return True
+
+
+def score_text_layer(text, page_area_pt2=None):
+    """Nota de 0 a 1 para a qualidade da camada de texto de uma página
+
+    Combina taxa de palavras funcionais (dicionário), proporção de palavras
+    plausíveis, distribuição de classes de caracteres e densidade de glifos
+    por área da página (page_area_pt2 em pontos², 72pt = 1 polegada).
+
+    Retorna dict com 'score', 'passed' e os componentes (para ajuste do limiar).
+    """
+    visible = [char for char in text if not char.isspace()]
+    words = WORD_PATTERN.findall(text.lower())
+
+    if words:
+        # Taxa de dicionário só sobre palavras de 2+ letras (letras soltas de lixo não contam)
+        long_words = [word for word in words if len(word) > 1]
+        dictionary_rate = sum(word in STOPWORDS for word in long_words) / len(long_words) if long_words else 0.0
+        plausible_rate = sum(is_plausible_word(word) for word in words) / len(words)
+    else:
+        dictionary_rate = plausible_rate = 0.0
+
+    if visible:
+        letters = sum(char.isalpha() for char in visible)
+        digits = sum(char.isdigit() for char in visible)
+        # Símbolos fora do repertório comum (inclui '�' e controles de fontes quebradas)
+        odd = sum(not (char.isalnum() or char in COMMON_SYMBOLS) for char in visible)
+        character_score = max(0.0, (letters + 0.5 * digits) / len(visible) - odd / len(visible))
+    else:
+        character_score = 0.0
+
+    if page_area_pt2:
+        density = len(visible) / (page_area_pt2 / (72 * 72))
+        density_score = min(1.0, density / DENSITY_FULL)
+    else:
+        density = None
+        density_score = 1.0 if len(visible) >= 100 else len(visible) / 100
+
+    score = (DICTIONARY_WEIGHT * min(1.0, dictionary_rate / DICTIONARY_RATE_FULL) +
+             PLAUSIBLE_WEIGHT * plausible_rate +
+             CHARACTER_WEIGHT * min(1.0, character_score) +
+             DENSITY_WEIGHT * density_score)
+
+    return {
+        'score': round(score, 3),
+        'passed': score >= TEXT_LAYER_MIN_SCORE,
+        'dictionary_rate': round(dictionary_rate, 3),
+        'plausible_rate': round(plausible_rate, 3),
+        'character_score': round(character_score, 3),
+        'density': round(density, 2) if density is not None else None,
+        'words': len(words),
+    }
+
+
+def format_score(page_number, quality):
+    """Linha de log com os componentes do score (para ajustar TEXT_LAYER_MIN_SCORE)"""
+    verdict = 'camada OK' if quality['passed'] else 'OCR'
+    return (f"  [QUALIDADE] página {page_number}: score={quality['score']:.2f} "
+            f"dicionário={quality['dictionary_rate']:.2f} plausíveis={quality['plausible_rate']:.2f} "
+            f"caracteres={quality['character_score']:.2f} densidade={quality['density']} "
+            f"palavras={quality['words']} → {verdict}")